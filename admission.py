@@ -0,0 +1,338 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Tuple
+
+from utils import ResponseFormatter
+
+# Paths that are never throttled so probes and operators can always get in
+EXEMPT_PREFIXES = ("/health", "/admin/", "/docs", "/openapi.json")
+# Requests holding many uploads: the request itself takes the light lane and
+# the handler admits each upload on the heavy lane (see admit_item)
+PER_ITEM_PREFIXES = ("/api/batch/",)
+
+# The control and client of the request being handled, for admit_item and
+# admit_background
+_request_admission: ContextVar[Optional[tuple]] = ContextVar("request_admission", default=None)
+
+
+class ItemRejected(Exception):
+    """One upload of a per-item request was rate limited or shed"""
+
+    def __init__(self, status_code: int, code: str, message: str, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.retry_after = max(math.ceil(retry_after), 1)
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at rate tokens per second"""
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def take(self, now: float, cost: float = 1.0) -> float:
+        """Consume cost tokens; returns 0 on success or the seconds until enough accrue"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else math.inf
+
+
+class Lane:
+    """
+    A concurrency limit with a FIFO wait queue. Slots are handed directly to
+    the oldest waiter on release, so a request arriving later can never jump
+    ahead of one that is already queued.
+    """
+
+    def __init__(self, name: str, limit: int, queue_timeout: float, max_queue: int,
+                 rate: float, burst: float):
+        self.name = name
+        self.limit = limit
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self.rate = rate
+        self.burst = burst
+        self.active = 0
+        self.waiters: deque = deque()
+        self.counters = {
+            "admitted": 0, "queued": 0, "shed_queue_timeout": 0,
+            "shed_queue_full": 0, "rate_limited": 0
+        }
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+
+    async def acquire(self) -> Optional[str]:
+        """Wait for a slot; returns None when admitted or the reason it was shed"""
+        if self.active < self.limit and not self.waiters:
+            self.active += 1
+            self.counters["admitted"] += 1
+            return None
+
+        if len(self.waiters) >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.counters["queued"] += 1
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # The slot was handed over just as the deadline hit; give it back
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+            self.counters["shed_queue_timeout"] += 1
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                self.waiters.remove(waiter)
+            raise
+        finally:
+            waited = time.monotonic() - start
+            self.queue_wait_total += waited
+            self.queue_wait_max = max(self.queue_wait_max, waited)
+
+        self.counters["admitted"] += 1
+        return None
+
+    def release(self):
+        """Free a slot, handing it straight to the oldest live waiter"""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self) -> Dict[str, object]:
+        queued = self.counters["queued"]
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": len(self.waiters),
+            "queue_timeout_s": self.queue_timeout,
+            **self.counters,
+            "avg_queue_wait_ms": round(self.queue_wait_total / queued * 1000, 2) if queued else 0.0,
+            "max_queue_wait_ms": round(self.queue_wait_max * 1000, 2)
+        }
+
+
+class AdmissionControl:
+    """
+    Admission state shared by the middleware and the metrics endpoint.
+
+    Uploads (POST) go to the heavy lane and everything else to the light lane,
+    each with its own concurrency limit, so cheap lookups keep flowing while
+    parsing and inference are saturated. Each client also gets a token bucket
+    per lane (429 when empty), and a request that cannot get a slot within the
+    lane's queue timeout is shed with 503. Clients are identified by an API
+    key only when it is one of api_keys, so made-up keys cannot mint fresh
+    buckets. State lives in one event loop and is therefore per worker process.
+    """
+
+    def __init__(self, heavy: Lane, light: Lane, trust_forwarded: bool = False,
+                 max_clients: int = 10000, api_keys: Iterable[str] = ()):
+        self.lanes = {"heavy": heavy, "light": light}
+        self.trust_forwarded = trust_forwarded
+        self.max_clients = max_clients
+        self.api_keys = frozenset(api_keys)
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    @classmethod
+    def from_env(cls) -> Optional["AdmissionControl"]:
+        """Build from ADMISSION_* environment variables; ADMISSION_ENABLED=0 disables it"""
+        if os.getenv("ADMISSION_ENABLED", "1") != "1":
+            return None
+        env = os.getenv
+        heavy = Lane(
+            "heavy",
+            limit=int(env("ADMISSION_HEAVY_LIMIT", str(os.cpu_count() or 2))),
+            queue_timeout=float(env("ADMISSION_HEAVY_QUEUE_TIMEOUT", "10")),
+            max_queue=int(env("ADMISSION_HEAVY_MAX_QUEUE", "100")),
+            rate=float(env("ADMISSION_HEAVY_RATE", "2")),
+            burst=float(env("ADMISSION_HEAVY_BURST", "10"))
+        )
+        light = Lane(
+            "light",
+            limit=int(env("ADMISSION_LIGHT_LIMIT", "64")),
+            queue_timeout=float(env("ADMISSION_LIGHT_QUEUE_TIMEOUT", "2")),
+            max_queue=int(env("ADMISSION_LIGHT_MAX_QUEUE", "500")),
+            rate=float(env("ADMISSION_LIGHT_RATE", "50")),
+            burst=float(env("ADMISSION_LIGHT_BURST", "100"))
+        )
+        # Comma-separated keys that identify their holder instead of its address
+        api_keys = [key.strip() for key in env("ADMISSION_API_KEYS", "").split(",") if key.strip()]
+        return cls(heavy, light, trust_forwarded=env("ADMISSION_TRUST_FORWARDED", "0") == "1",
+                   api_keys=api_keys)
+
+    @staticmethod
+    def lane_for(method: str, path: str) -> Optional[str]:
+        """Pick the lane for a request, or None when it bypasses admission"""
+        if path.startswith(EXEMPT_PREFIXES) or method == "OPTIONS":
+            return None
+        if path.startswith(PER_ITEM_PREFIXES):
+            return "light"
+        return "heavy" if method == "POST" else "light"
+
+    def client_id(self, scope) -> str:
+        """Identify the caller by a known API key, else (optionally forwarded) address"""
+        headers = dict(scope.get("headers") or [])
+        api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+        if api_key in self.api_keys:
+            return "key:" + api_key
+        if self.trust_forwarded and b"x-forwarded-for" in headers:
+            return headers[b"x-forwarded-for"].decode("latin-1").split(",")[0].strip()
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    @asynccontextmanager
+    async def item(self, client: str):
+        """
+        Admit one upload of a per-item request on the heavy lane: a token from
+        the client's bucket, waited for up to the lane's queue timeout so a
+        batch is paced at the client's rate, then a heavy slot
+        """
+        lane = self.lanes["heavy"]
+        waited = 0.0
+        while True:
+            retry_after = self.take_token(client, lane)
+            if not retry_after:
+                break
+            if waited + retry_after > lane.queue_timeout:
+                lane.counters["rate_limited"] += 1
+                raise ItemRejected(429, "RATE_LIMITED", "Too many requests, slow down", retry_after)
+            await asyncio.sleep(retry_after)
+            waited += retry_after
+
+        shed_reason = await lane.acquire()
+        if shed_reason is not None:
+            raise ItemRejected(503, "OVERLOADED", f"Server busy ({shed_reason.replace('_', ' ')}), retry shortly", 1)
+        try:
+            yield
+        finally:
+            lane.release()
+
+    def take_token(self, client: str, lane: Lane) -> float:
+        """Charge one request to the client's bucket; returns seconds to wait if empty"""
+        now = time.monotonic()
+        key = (client, lane.name)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(lane.rate, lane.burst, now)
+            self._buckets[key] = bucket
+            # Idle clients' buckets are full anyway, so dropping the oldest is safe
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(now)
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "lanes": {name: lane.metrics() for name, lane in self.lanes.items()},
+            "tracked_clients": len(self._buckets)
+        }
+
+
+@asynccontextmanager
+async def admit_item():
+    """Admit one upload of the current per-item request; a no-op without admission control"""
+    admission = _request_admission.get()
+    if admission is None:
+        yield
+        return
+    control, client = admission
+    async with control.item(client):
+        yield
+
+
+@asynccontextmanager
+async def admit_background():
+    """
+    Hold a heavy slot for server-initiated work on behalf of the current
+    request (a profiler replay); no token is charged to the client. Raises
+    ItemRejected when the lane sheds it; a no-op without admission control
+    """
+    admission = _request_admission.get()
+    if admission is None:
+        yield
+        return
+    lane = admission[0].lanes["heavy"]
+    shed_reason = await lane.acquire()
+    if shed_reason is not None:
+        raise ItemRejected(503, "OVERLOADED", f"Server busy ({shed_reason.replace('_', ' ')})", 1)
+    try:
+        yield
+    finally:
+        lane.release()
+
+
+async def _send_error(send, status: int, code: str, message: str, headers=()):
+    body = json.dumps(ResponseFormatter.format_error_response(message, code)).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode())] + list(headers)
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionControl to every HTTP request"""
+
+    def __init__(self, app, control: AdmissionControl):
+        self.app = app
+        self.control = control
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        lane_name = self.control.lane_for(scope["method"], scope["path"])
+        if lane_name is None:
+            return await self.app(scope, receive, send)
+        lane = self.control.lanes[lane_name]
+        client = self.control.client_id(scope)
+
+        retry_after = self.control.take_token(client, lane)
+        if retry_after:
+            lane.counters["rate_limited"] += 1
+            return await _send_error(
+                send, 429, "RATE_LIMITED", "Too many requests, slow down",
+                [(b"retry-after", str(max(math.ceil(retry_after), 1)).encode())]
+            )
+
+        shed_reason = await lane.acquire()
+        if shed_reason is not None:
+            return await _send_error(
+                send, 503, "OVERLOADED", f"Server busy ({shed_reason.replace('_', ' ')}), retry shortly",
+                [(b"retry-after", b"1")]
+            )
+
+        token = _request_admission.set((self.control, client))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_admission.reset(token)
+            lane.release()
@@ -0,0 +1,119 @@
+"""
+Benchmark compiled improvement rules as the rule count grows.
+
+Usage:
+    python benchmarks/bench_rules.py [--sizes 10,100,1000,5000] [resume.txt ...]
+
+Generates synthetic rule sets (mostly keyword rules, plus regex, count
+threshold and section-scoped ones) and times RuleSet.scan + evaluate on
+each resume against a baseline that scans the text once per rule, as the
+hand-written checks in ResumeImprover used to. Without arguments a
+synthetic resume with section headings is used.
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from rules import RuleSet  # noqa: E402
+
+SECTIONS = {"experience": ["work experience"], "skills": ["technical skills"], "education": []}
+WORDS = ["python", "sql", "docker", "kubernetes", "react", "led", "managed", "budget", "revenue",
+         "customers", "analytics", "pipeline", "latency", "team", "stakeholders", "machine", "learning"]
+
+
+def build_spec(count: int, seed: int = 7):
+    """A rule file with count rules over a vocabulary that grows with it"""
+    rng = random.Random(seed)
+    vocabulary = WORDS + [f"term{i}" for i in range(count * 2)]
+    rules = []
+    for i in range(count):
+        rule = {"id": f"rule_{i}", "category": "content", "title": f"Rule {i}",
+                "description": "Synthetic rule", "example": "Example", "priority": rng.choice(["high", "medium", "low"])}
+        kind = rng.random()
+        if kind < 0.2:
+            rule["pattern"] = rf"\b{rng.choice(vocabulary)}\s+\d+"
+        else:
+            rule["keywords"] = [" ".join(rng.sample(vocabulary, rng.choice((1, 1, 2))))
+                                for _ in range(rng.randint(1, 4))]
+            if kind > 0.9:
+                rule["section"] = rng.choice(list(SECTIONS))
+                rule["min_count"] = rng.randint(1, 3)
+        if rng.random() < 0.3:
+            rule["domains"] = [rng.choice(["Data Science", "Marketing", "Python Developer"])]
+        rules.append(rule)
+    return {"sections": SECTIONS, "rules": rules}
+
+
+def synthetic_resume(words: int = 600, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    lines = ["Jane Doe", "Summary"]
+    for heading in ("Work Experience", "Technical Skills", "Education"):
+        lines.append(heading)
+        for _ in range(words // 30):
+            lines.append(" ".join(rng.choice(WORDS + ["and", "the", "with", "12", "40%"]) for _ in range(10)))
+    return "\n".join(lines)
+
+
+class PerRuleBaseline:
+    """Each rule compiled on its own and run over the whole text"""
+
+    def __init__(self, spec):
+        self.rules = []
+        for rule in spec["rules"]:
+            if "pattern" in rule:
+                regex = re.compile(rule["pattern"], re.IGNORECASE)
+            else:
+                regex = re.compile(r"\b(?:%s)\b" % "|".join(re.escape(k) for k in rule["keywords"]), re.IGNORECASE)
+            self.rules.append((rule, regex))
+
+    def evaluate(self, text: str, domain: str):
+        fired = []
+        for rule, regex in self.rules:
+            if rule.get("domains") and domain not in rule["domains"]:
+                continue
+            if len(regex.findall(text)) < rule.get("min_count", 1):
+                fired.append(rule["id"])
+        return fired
+
+
+def best_time(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("files", nargs="*")
+    parser.add_argument("--sizes", default="10,100,1000,5000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = [Path(path).read_text(errors="ignore") for path in args.files] or [synthetic_resume()]
+    print(f"{len(texts)} resume(s), {sum(len(t) for t in texts) // len(texts)} characters on average\n")
+    print(f"{'rules':>6} {'compile ms':>11} {'compiled ms/resume':>19} {'per-rule ms/resume':>19} {'speedup':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        spec = build_spec(size)
+        start = time.perf_counter()
+        rule_set = RuleSet(spec)
+        compile_seconds = time.perf_counter() - start
+        baseline = PerRuleBaseline(spec)
+
+        compiled = best_time(lambda: [rule_set.evaluate(rule_set.scan(t), "Data Science") for t in texts],
+                             args.repeat) / len(texts)
+        per_rule = best_time(lambda: [baseline.evaluate(t, "Data Science") for t in texts],
+                             args.repeat) / len(texts)
+        print(f"{size:>6} {compile_seconds * 1000:>11.1f} {compiled * 1000:>19.3f} "
+              f"{per_rule * 1000:>19.3f} {per_rule / compiled:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Compare classifier engines on accuracy and throughput.
+
+Usage:
+    python benchmarks/compare_engines.py --data resume_dataset.csv [--train-head]
+        [--engines tfidf,embedding,embedding-int8] [--threads 1,4] [--output report.txt]
+
+Reads a labelled CSV (the training dataset format: cleaned_text and Domains
+columns), holds out a seeded test split and reports for every engine:
+accuracy and macro-F1 on the held-out rows, batch throughput (all test
+documents in one predict call) and concurrent throughput (one document per
+request from --clients threads, which is what the API sees and what the
+embedding engine's dynamic batching is for).
+
+The shipped TF-IDF model was trained on the full dataset, so its held-out
+accuracy is optimistic unless it is retrained on the training split only.
+--train-head fits the embedding head on the training split first.
+"""
+import argparse
+import csv
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from engines import EmbeddingEngine, TfidfLogRegEngine, train_head  # noqa: E402
+from models import load_stop_words  # noqa: E402
+
+
+def load_dataset(path: str, text_column: str, label_column: str):
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [(row[text_column], row[label_column]) for row in csv.DictReader(f)
+                if row.get(text_column) and row.get(label_column)]
+    return rows
+
+
+def split(rows, test_fraction: float, seed: int):
+    """Stratified split so rare domains appear in both halves"""
+    by_label = {}
+    for row in rows:
+        by_label.setdefault(row[1], []).append(row)
+    rng = random.Random(seed)
+    train, test = [], []
+    for label_rows in by_label.values():
+        rng.shuffle(label_rows)
+        cut = max(1, round(len(label_rows) * test_fraction)) if len(label_rows) > 1 else 0
+        test.extend(label_rows[:cut])
+        train.extend(label_rows[cut:])
+    return train, test
+
+
+def macro_f1(expected, predicted) -> float:
+    labels = set(expected)
+    true_positives = Counter(e for e, p in zip(expected, predicted) if e == p)
+    predicted_counts = Counter(predicted)
+    expected_counts = Counter(expected)
+    scores = []
+    for label in labels:
+        tp = true_positives[label]
+        precision = tp / predicted_counts[label] if predicted_counts[label] else 0.0
+        recall = tp / expected_counts[label]
+        scores.append(2 * precision * recall / (precision + recall) if precision + recall else 0.0)
+    return sum(scores) / len(scores)
+
+
+def build_engines(names, threads, args):
+    """Yield (label, engine) for each requested engine and thread count"""
+    for name in names:
+        if name == "tfidf":
+            yield name, TfidfLogRegEngine(args.model, args.vectorizer)
+            continue
+        for thread_count in threads:
+            engine = EmbeddingEngine(
+                model_name=args.embedding_model, head_path=args.head,
+                max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms,
+                threads=thread_count, quantize=name == "embedding-int8"
+            )
+            yield f"{name} (threads={thread_count or 'default'})", engine
+
+
+def benchmark(engine, documents, labels, clients: int):
+    start = time.perf_counter()
+    predictions = [label for label, _ in engine.predict(documents)]
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(lambda document: engine.predict([document]), documents))
+    concurrent_seconds = time.perf_counter() - start
+
+    return {
+        "accuracy": sum(p == e for p, e in zip(predictions, labels)) / len(labels),
+        "macro_f1": macro_f1(labels, predictions),
+        "batch_docs_per_s": len(documents) / batch_seconds,
+        "concurrent_docs_per_s": len(documents) / concurrent_seconds
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", default="resume_dataset.csv")
+    parser.add_argument("--text-column", default="cleaned_text")
+    parser.add_argument("--label-column", default="Domains")
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--engines", default="tfidf,embedding,embedding-int8")
+    parser.add_argument("--threads", default="0", help="Comma-separated torch thread counts (0 = default)")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent single-document callers")
+    parser.add_argument("--train-head", action="store_true", help="Fit the embedding head on the training split")
+    parser.add_argument("--model", default=str(ROOT / "public/models/domain_classifier.pkl"))
+    parser.add_argument("--vectorizer", default=str(ROOT / "public/models/tfidf_vectorizer.pkl"))
+    parser.add_argument("--embedding-model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--head", default=str(ROOT / "public/models/embedding_head.pkl"))
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--output", help="Write the report to this file as well")
+    args = parser.parse_args()
+
+    train, test = split(load_dataset(args.data, args.text_column, args.label_column),
+                        args.test_fraction, args.seed)
+    documents = [text for text, _ in test]
+    labels = [label for _, label in test]
+    # The TF-IDF engine expects ResumeAnalyzer.clean_text output; the dataset
+    # column is already cleaned, so only the bundled stopwords are reapplied
+    stop_words = load_stop_words(str(ROOT / "public/models/stopwords_en.txt"))
+    cleaned = [" ".join(w for w in text.lower().split() if w not in stop_words) for text in documents]
+
+    names = [name.strip() for name in args.engines.split(",") if name.strip()]
+    threads = [int(t) for t in args.threads.split(",")]
+    if args.train_head and any(name.startswith("embedding") for name in names):
+        print(f"🏋️  Training embedding head on {len(train)} documents...")
+        train_head(EmbeddingEngine(model_name=args.embedding_model, head_path=args.head),
+                   [text for text, _ in train], [label for _, label in train])
+
+    lines = [f"Engine comparison on {len(test)} held-out documents "
+             f"({len(train)} train, seed {args.seed}, {args.clients} concurrent clients)", "",
+             f"{'engine':<36} {'accuracy':>9} {'macro-F1':>9} {'batch doc/s':>12} {'concurrent doc/s':>17}"]
+    for label, engine in build_engines(names, threads, args):
+        if not engine.load():
+            lines.append(f"{label:<36} unavailable (see log above)")
+            continue
+        inputs = cleaned if engine.uses_cleaned_text else documents
+        engine.predict(inputs[:8])  # Warm up
+        result = benchmark(engine, inputs, labels, args.clients)
+        engine.close()
+        lines.append(f"{label:<36} {result['accuracy']:>9.3f} {result['macro_f1']:>9.3f} "
+                     f"{result['batch_docs_per_s']:>12.1f} {result['concurrent_docs_per_s']:>17.1f}")
+    lines += ["", "Note: the shipped TF-IDF model may have been trained on these held-out rows."]
+
+    report = "\n".join(lines) + "\n"
+    print(report, end="")
+    if args.output:
+        Path(args.output).write_text(report)
+
+
+if __name__ == "__main__":
+    main()
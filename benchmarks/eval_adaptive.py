@@ -0,0 +1,170 @@
+"""
+Evaluate adaptive truncation (ResumeAnalyzer.predict_domain(adaptive=True))
+against classifying the whole document.
+
+Usage:
+    python benchmarks/eval_adaptive.py [--margins 5,10,20] [--documents 60]
+    python benchmarks/eval_adaptive.py --corpus cvs/ [--labels labels.csv]
+
+With --corpus, every PDF, DOCX and TXT file in the directory is used;
+labels.csv (filename,domain) adds accuracy against known domains. Without
+it, long PDFs are generated: a first page written from the classifier's
+most indicative terms for a random domain, followed by 12-30 pages of
+publications, teaching and other generic academic CV content.
+
+For each margin threshold the report shows agreement with the full-document
+prediction, accuracy where labels are known, latency, and the share of the
+document that was extracted and classified.
+"""
+import argparse
+import csv
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from models import ResumeAnalyzer  # noqa: E402
+
+FILLER = ("publication journal conference proceedings university department lecture course "
+          "teaching assistant seminar committee review editor grant award fellowship thesis "
+          "advisor student workshop volume pages press references invited talk society member").split()
+
+
+def pdf_document(pages):
+    """A minimal PDF with one Helvetica text block per page (pages: lists of lines)"""
+    def escape(line):
+        return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               ("<< /Type /Pages /Kids [%s] /Count %d >>" % (
+                   " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages))).encode(),
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, lines in enumerate(pages):
+        content = ("BT /F1 10 Tf 12 TL 50 750 Td " + " ".join(f"({escape(line)}) '" for line in lines) + " ET").encode()
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def synthetic_corpus(analyzer, count, seed):
+    """[(filename, bytes, domain)] of long CVs whose domain shows on page one"""
+    import numpy as np
+
+    analyzer.load_models()
+    model, vectorizer = analyzer.model, analyzer.vectorizer
+    terms = vectorizer.get_feature_names_out()
+    top_terms = {label: [terms[i] for i in np.argsort(model.coef_[row])[-80:]]
+                 for row, label in enumerate(model.classes_)}
+    rng = random.Random(seed)
+
+    def lines(words, n_lines):
+        return [" ".join(rng.choice(words) for _ in range(12)) for _ in range(n_lines)]
+
+    corpus = []
+    for index in range(count):
+        domain = rng.choice(list(model.classes_))
+        pages = [lines(top_terms[domain] + FILLER, 45)]
+        for _ in range(rng.randint(12, 30)):
+            # Later pages mention the field now and then among academic filler
+            pages.append(lines(FILLER * 6 + top_terms[domain][-20:], 55))
+        corpus.append((f"cv_{index}.pdf", pdf_document(pages), domain))
+    return corpus
+
+
+def load_corpus(directory, labels_path):
+    labels = {}
+    if labels_path:
+        with open(labels_path, newline="", encoding="utf-8") as f:
+            labels = {row[0]: row[1] for row in csv.reader(f) if len(row) >= 2}
+    return [(path.name, path.read_bytes(), labels.get(path.name))
+            for path in sorted(Path(directory).iterdir())
+            if path.suffix.lower() in (".pdf", ".docx", ".txt")]
+
+
+def run(analyzer, corpus, adaptive):
+    results = []
+    for filename, content, _ in corpus:
+        start = time.perf_counter()
+        prediction = analyzer.predict_domain(content, filename, adaptive=adaptive)
+        results.append((prediction, time.perf_counter() - start))
+    return results
+
+
+def summarize(name, corpus, results, reference=None):
+    latencies = sorted(seconds for _, seconds in results)
+    labelled = [(prediction.get("domain"), domain) for (prediction, _), (_, _, domain) in zip(results, corpus) if domain]
+    row = {
+        "name": name,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "accuracy": sum(p == d for p, d in labelled) / len(labelled) if labelled else None,
+        "agreement": None,
+        "used": None
+    }
+    if reference is not None:
+        row["agreement"] = sum(p.get("domain") == r.get("domain")
+                               for (p, _), (r, _) in zip(results, reference)) / len(results)
+        row["used"] = statistics.mean(p["adaptive"]["fraction_used"] for p, _ in results if "adaptive" in p)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="Directory of resumes (default: generate long PDFs)")
+    parser.add_argument("--labels", help="CSV of filename,domain for --corpus")
+    parser.add_argument("--documents", type=int, default=60, help="Generated documents")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--margins", default="5,10,20", help="Comma-separated margin thresholds (points)")
+    parser.add_argument("--pages", type=int, default=1, help="Initial PDF pages")
+    parser.add_argument("--tokens", type=int, default=400, help="Initial words for other formats")
+    parser.add_argument("--output", help="Write the report to this file as well")
+    args = parser.parse_args()
+
+    analyzer = ResumeAnalyzer(model_path=str(ROOT / "public/models/domain_classifier.pkl"),
+                              vectorizer_path=str(ROOT / "public/models/tfidf_vectorizer.pkl"),
+                              skills_path=str(ROOT / "public/models/skill_taxonomy.csv"),
+                              stopwords_path=str(ROOT / "public/models/stopwords_en.txt"),
+                              adaptive_pages=args.pages, adaptive_tokens=args.tokens)
+    corpus = (load_corpus(args.corpus, args.labels) if args.corpus
+              else synthetic_corpus(analyzer, args.documents, args.seed))
+    run(analyzer, corpus[:3], adaptive=False)  # Warm up
+
+    full = run(analyzer, corpus, adaptive=False)
+    rows = [summarize("full document", corpus, full)]
+    for margin in (float(m) for m in args.margins.split(",")):
+        analyzer.adaptive_margin = margin
+        rows.append(summarize(f"adaptive, margin {margin:g}", corpus, run(analyzer, corpus, adaptive=True), full))
+
+    def fmt(value, pattern):
+        return "-" if value is None else pattern.format(value)
+
+    lines = [f"{len(corpus)} documents ({'generated' if not args.corpus else args.corpus}), "
+             f"starting from {args.pages} page(s) / {args.tokens} words", "",
+             f"{'mode':<24} {'mean ms':>9} {'p95 ms':>9} {'accuracy':>9} {'agrees w/ full':>15} {'doc used':>9}"]
+    for row in rows:
+        lines.append(f"{row['name']:<24} {row['mean_ms']:>9.1f} {row['p95_ms']:>9.1f} "
+                     f"{fmt(row['accuracy'], '{:.3f}'):>9} {fmt(row['agreement'], '{:.3f}'):>15} "
+                     f"{fmt(row['used'], '{:.1%}'):>9}")
+    report = "\n".join(lines) + "\n"
+    print(report, end="")
+    if args.output:
+        Path(args.output).write_text(report)
+
+
+if __name__ == "__main__":
+    main()
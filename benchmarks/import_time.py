@@ -0,0 +1,140 @@
+"""
+Profile API startup: per-module import cost and time to first request.
+
+Usage:
+    python benchmarks/import_time.py [--module main] [--top 25] [--serve] [--output report.txt]
+
+Imports the module in a fresh interpreter with `python -X importtime` and
+reports the slowest imports by cumulative and self time, plus totals per
+top-level package. With --serve it also starts uvicorn on a free port and
+measures how long a fresh worker takes to answer /health and to finish
+loading the models in the background.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def profile_imports(module: str):
+    """Return (module, self_us, cumulative_us, depth) rows from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "| imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def time_wall_import(module: str) -> float:
+    """Wall-clock seconds for a fresh interpreter to import the module"""
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(module: str, timeout: float = 60.0):
+    """Start uvicorn and time the first /health answer and background model load"""
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        env={**os.environ, "RESULT_STORE_PATH": ""}
+    )
+    first_response = models_ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as response:
+                    health = json.load(response)
+            except OSError:
+                time.sleep(0.01)
+                continue
+            now = time.perf_counter() - start
+            if first_response is None:
+                first_response = now
+            if health.get("models_loaded", {}).get("resume_analyzer"):
+                models_ready = now
+                break
+            time.sleep(0.01)
+    finally:
+        server.terminate()
+        server.wait()
+    return first_response, models_ready
+
+
+def format_report(module: str, rows, wall: float, top: int, serve_times=None) -> str:
+    lines = [f"Import profile for `import {module}` (Python {sys.version.split()[0]})", ""]
+    lines.append(f"Wall-clock import: {wall * 1000:.0f} ms")
+    if serve_times is not None:
+        first_response, models_ready = serve_times
+        lines.append("Fresh uvicorn worker, first /health response: "
+                     + (f"{first_response * 1000:.0f} ms" if first_response else "timed out"))
+        lines.append("Fresh uvicorn worker, models loaded in background: "
+                     + (f"{models_ready * 1000:.0f} ms" if models_ready else "timed out"))
+    lines.append("")
+
+    lines.append(f"Top {top} imports by cumulative time (ms):")
+    for name, self_us, cumulative_us, depth in sorted(rows, key=lambda r: -r[2])[:top]:
+        lines.append(f"  {cumulative_us / 1000:9.1f}  {'  ' * depth}{name}")
+    lines.append("")
+
+    lines.append(f"Top {top} imports by self time (ms):")
+    for name, self_us, _, _ in sorted(rows, key=lambda r: -r[1])[:top]:
+        lines.append(f"  {self_us / 1000:9.1f}  {name}")
+    lines.append("")
+
+    packages = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        packages[name.split(".")[0]] += self_us
+    lines.append("Self time per top-level package (ms):")
+    for package, total in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {total / 1000:9.1f}  {package}")
+
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--serve", action="store_true", help="Also time a fresh uvicorn worker")
+    parser.add_argument("--output", help="Write the report to this file as well")
+    args = parser.parse_args()
+
+    rows = profile_imports(args.module)
+    wall = time_wall_import(args.module)
+    serve_times = measure_first_request(args.module) if args.serve else None
+    report = format_report(args.module, rows, wall, args.top, serve_times)
+
+    print(report, end="")
+    if args.output:
+        Path(args.output).write_text(report)
+
+
+if __name__ == "__main__":
+    main()
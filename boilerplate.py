@@ -0,0 +1,294 @@
+"""
+Detect verbatim boilerplate from template and sample resumes.
+
+A corpus of such resumes holds tens of millions of distinct word n-grams,
+far too many for a set in every worker. The builder hashes them into a
+Bloom filter sized for a target false-positive rate and writes it to a
+single file; workers memory-map it read-only, so opening it costs one
+header read and every process shares one page-cache copy.
+
+Usage:
+    python boilerplate.py build corpus/ more_samples.txt --fp-rate 0.01
+    python boilerplate.py check resume.pdf
+    python boilerplate.py stats
+
+Corpus inputs are directories (searched recursively) or .txt, .pdf and
+.docx files; text files are read one blank-line separated block at a time.
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import struct
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Words are compared lowercased without punctuation, so copies that only
+# differ in case, bullets or hyphenation still match
+WORD_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+MAGIC = b"RGBLOOM1"
+FORMAT_VERSION = 1
+# magic, format version, n-gram size, hash count, bits, capacity, n-grams inserted, target fp rate, build id
+HEADER = struct.Struct("<8sHHIQQQd16s")
+HEADER_SIZE = 128
+CORPUS_EXTENSIONS = (".txt", ".pdf", ".docx")
+
+
+class BoilerplateIndexError(RuntimeError):
+    """The file is not a boilerplate index this version can read"""
+
+
+def _words(text: str) -> List[str]:
+    return [word.lower() for word in WORD_PATTERN.findall(text)]
+
+
+def _ngrams(words: List[str], size: int) -> List[bytes]:
+    return [" ".join(words[i:i + size]).encode("utf-8") for i in range(len(words) - size + 1)]
+
+
+def _positions(ngrams: List[bytes], hashes: int, bits: int):
+    """
+    Bit positions of each n-gram, shape (len(ngrams), hashes): the two
+    64-bit halves of a BLAKE2b-128 digest combined by double hashing,
+    h1 + i * h2 (mod 2**64, then mod bits)
+    """
+    import numpy as np
+
+    digests = b"".join(hashlib.blake2b(ngram, digest_size=16).digest() for ngram in ngrams)
+    halves = np.frombuffer(digests, dtype="<u8").reshape(-1, 2)
+    h1 = halves[:, :1]
+    h2 = halves[:, 1:] | np.uint64(1)  # An odd step never degenerates to one position
+    return (h1 + np.arange(hashes, dtype=np.uint64) * h2) % np.uint64(bits)
+
+
+def filter_size(capacity: int, fp_rate: float):
+    """(bits, hash count) of a Bloom filter holding capacity items at fp_rate"""
+    bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+    bits = max(64, (bits + 63) // 64 * 64)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+class BoilerplateIndex:
+    """
+    A memory-mapped, read-only Bloom filter of known boilerplate n-grams.
+    Opening one only reads the header; the bits are mapped on first lookup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+            raise BoilerplateIndexError(f"{path} is not a boilerplate index")
+        (_, format_version, self.ngram_size, self.hashes, self.bits, self.capacity,
+         self.inserted, self.fp_rate, build_id) = HEADER.unpack_from(header)
+        if format_version != FORMAT_VERSION:
+            raise BoilerplateIndexError(f"{path} has format version {format_version}, expected {FORMAT_VERSION}")
+        # Identifies this build so stored plagiarism results follow a rebuild
+        self.version = build_id.hex()
+        # Mapped by _mapped(); the app opens the index at import time
+        self._filter = None
+
+    def _mapped(self):
+        """The filter bits, mapped on first use so startup does not import numpy"""
+        if self._filter is None:
+            import numpy as np
+
+            self._filter = np.memmap(self.path, dtype=np.uint8, mode="r", offset=HEADER_SIZE,
+                                     shape=(self.bits // 8,))
+        return self._filter
+
+    def contains(self, ngrams: List[bytes]):
+        """Boolean array: whether each n-gram is (probably) in the corpus"""
+        import numpy as np
+
+        if not ngrams:
+            return np.zeros(0, dtype=bool)
+        positions = _positions(ngrams, self.hashes, self.bits)
+        masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        return ((self._mapped()[positions >> np.uint64(3)] & masks) != 0).all(axis=1)
+
+    def check(self, text: str, min_run: int = 2, max_spans: int = 50) -> Dict[str, Any]:
+        """
+        Slide over the text's words and report the known boilerplate: the
+        fraction of words covered and the character spans. A span needs
+        min_run consecutive matching n-grams, which squares the filter's
+        false-positive rate for min_run=2 so stray hits are not reported
+        """
+        matches = list(WORD_PATTERN.finditer(text))
+        words = [match.group().lower() for match in matches]
+        size = self.ngram_size
+        hits = self.contains(_ngrams(words, size)) if len(words) >= size else []
+
+        # Word ranges [first, last) covered by runs of consecutive hits
+        ranges = []
+        run_start = None
+        for i, hit in enumerate(list(hits) + [False]):
+            if hit and run_start is None:
+                run_start = i
+            elif not hit and run_start is not None:
+                if i - run_start >= min_run:
+                    first, last = run_start, i - 1 + size
+                    if ranges and first <= ranges[-1][1]:
+                        ranges[-1][1] = last
+                    else:
+                        ranges.append([first, last])
+                run_start = None
+
+        covered = sum(last - first for first, last in ranges)
+        spans = []
+        for first, last in ranges[:max_spans]:
+            start, end = matches[first].start(), matches[last - 1].end()
+            spans.append({"start": start, "end": end, "words": last - first, "text": text[start:end]})
+        return {
+            "ngram_size": size,
+            "words": len(words),
+            "boilerplate_words": covered,
+            "boilerplate_fraction": round(covered / len(words), 4) if words else 0.0,
+            "total_spans": len(ranges),
+            "spans": spans
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        # Expected false-positive rate for the number of n-grams actually inserted
+        # (an upper bound: repeated n-grams set no new bits)
+        fill = 1 - math.exp(-self.hashes * self.inserted / self.bits)
+        return {
+            "path": self.path,
+            "version": self.version,
+            "ngram_size": self.ngram_size,
+            "hashes": self.hashes,
+            "size_mb": round(self.bits / 8 / 1024 / 1024, 2),
+            "capacity": self.capacity,
+            "ngrams_inserted": self.inserted,
+            "target_fp_rate": self.fp_rate,
+            "expected_fp_rate": round(fill ** self.hashes, 6)
+        }
+
+
+def build_index(texts, output: str, ngram_size: int = 5, fp_rate: float = 0.01,
+                capacity: Optional[int] = None, batch_size: int = 1 << 18) -> BoilerplateIndex:
+    """
+    Hash every n-gram of the corpus into a new filter file at output.
+
+    texts is a callable returning an iterable of documents; without a
+    capacity it is iterated twice, first to count the n-grams (an upper
+    bound on the distinct ones). The file is written next to output and
+    renamed into place, so readers never see a partial filter.
+    """
+    import numpy as np
+
+    if capacity is None:
+        capacity = sum(max(len(_words(text)) - ngram_size + 1, 0) for text in texts())
+    capacity = max(capacity, 1)
+    bits, hashes = filter_size(capacity, fp_rate)
+
+    tmp_path = f"{output}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.truncate(HEADER_SIZE + bits // 8)
+    bloom = np.memmap(tmp_path, dtype=np.uint8, mode="r+", offset=HEADER_SIZE, shape=(bits // 8,))
+
+    inserted = 0
+    pending: List[bytes] = []
+
+    def flush():
+        positions = _positions(pending, hashes, bits).ravel()
+        masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        np.bitwise_or.at(bloom, positions >> np.uint64(3), masks)
+        pending.clear()
+
+    for text in texts():
+        ngrams = _ngrams(_words(text), ngram_size)
+        pending.extend(ngrams)
+        inserted += len(ngrams)
+        if len(pending) >= batch_size:
+            flush()
+    if pending:
+        flush()
+    bloom.flush()
+    del bloom
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, ngram_size, hashes, bits, capacity, inserted,
+                         fp_rate, uuid.uuid4().bytes)
+    with open(tmp_path, "r+b") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+    os.replace(tmp_path, output)
+    return BoilerplateIndex(output)
+
+
+def read_corpus(sources: Iterable[str]) -> Iterator[str]:
+    """Documents from corpus files and directories"""
+    from extractors import extract_docx_text, extract_pdf_text
+
+    for source in sources:
+        path = Path(source)
+        files = sorted(p for p in path.rglob("*") if p.suffix.lower() in CORPUS_EXTENSIONS) if path.is_dir() else [path]
+        for file in files:
+            suffix = file.suffix.lower()
+            if suffix == ".pdf":
+                yield extract_pdf_text(file.read_bytes())["text"]
+            elif suffix == ".docx":
+                yield extract_docx_text(file.read_bytes())
+            else:
+                block = []
+                with open(file, encoding="utf-8", errors="ignore") as f:
+                    for line in f:
+                        if line.strip():
+                            block.append(line)
+                        elif block:
+                            yield "".join(block)
+                            block = []
+                if block:
+                    yield "".join(block)
+
+
+def load_boilerplate_index(path: str) -> Optional[BoilerplateIndex]:
+    """Open the boilerplate filter, returning None if it has not been built"""
+    try:
+        index = BoilerplateIndex(path)
+        print(f"✅ Boilerplate index loaded ({index.inserted} {index.ngram_size}-grams)")
+        return index
+    except FileNotFoundError:
+        print(f"⚠️  No boilerplate index at {path}; build one with `python boilerplate.py build`")
+        return None
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Build and query the boilerplate n-gram filter")
+    parser.add_argument("command", choices=["build", "check", "stats"])
+    parser.add_argument("sources", nargs="*", help="Corpus files or directories (build) or a resume (check)")
+    parser.add_argument("--index", default=os.getenv("BOILERPLATE_INDEX_PATH", "public/models/boilerplate.bloom"))
+    parser.add_argument("--ngram", type=int, default=5, help="Words per n-gram")
+    parser.add_argument("--fp-rate", type=float, default=0.01, help="Target false-positive rate per n-gram")
+    parser.add_argument("--capacity", type=int, help="Expected n-grams (default: count them in a first pass)")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    if args.command == "build":
+        if not args.sources:
+            parser.error("build needs corpus files or directories")
+        index = build_index(lambda: read_corpus(args.sources), args.index, args.ngram, args.fp_rate, args.capacity)
+        print(f"✅ Built {args.index} in {time.perf_counter() - start_time:.1f}s")
+        result = index.stats()
+    elif args.command == "check":
+        if len(args.sources) != 1:
+            parser.error("check needs one resume file")
+        from models import ResumeAnalyzer
+        file_content = Path(args.sources[0]).read_bytes()
+        extraction = ResumeAnalyzer().extract_text(file_content, os.path.basename(args.sources[0]))
+        if "error" in extraction:
+            raise SystemExit(f"❌ {extraction['error']}")
+        result = BoilerplateIndex(args.index).check(extraction["text"])
+    else:
+        result = BoilerplateIndex(args.index).stats()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
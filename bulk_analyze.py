@@ -0,0 +1,319 @@
+"""
+Offline bulk analysis of resume files.
+
+Walks a directory tree (or reads a manifest with one path per line),
+analyzes every resume in a process pool where each worker loads the models
+once, and writes one row per file to CSV or Parquet in row groups. Progress
+is checkpointed after every row group, so an interrupted run picks up where
+it stopped when started again with the same arguments.
+
+Usage:
+    python bulk_analyze.py resumes/ --output results.csv
+    python bulk_analyze.py manifest.txt --output results_parquet/ --workers 8
+"""
+import argparse
+import csv
+import json
+import os
+import signal
+import sys
+import time
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from utils import FileHandler, TextProcessor
+
+COLUMNS = [
+    ("path", "string"), ("status", "string"), ("error", "string"),
+    ("domain", "string"), ("confidence", "float"), ("skills", "string"),
+    ("improvement_score", "int"), ("suggestion_count", "int"),
+    ("plagiarism_score", "float"), ("overused_phrases", "string"),
+    ("email", "string"), ("phone", "string"), ("experience_years", "int"),
+    ("readability_score", "float"), ("word_count", "int"),
+    ("pages_total", "int"), ("pages_skipped", "int"), ("elapsed_ms", "float")
+]
+FIELDNAMES = [name for name, _ in COLUMNS]
+
+# Analyzers built once per worker process by _init_worker
+_worker = {}
+
+
+def _init_worker(model_path: str, vectorizer_path: str):
+    """Pool initializer: load models once per worker instead of once per file"""
+    # Ctrl-C is handled by the parent, which saves finished rows before exiting
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from models import ResumeAnalyzer, PlagiarismChecker, ResumeImprover
+    from engines import engine_from_env
+
+    analyzer = ResumeAnalyzer(model_path=model_path, vectorizer_path=vectorizer_path,
+                              engine=engine_from_env(model_path, vectorizer_path))
+    analyzer.load_models()
+    _worker["analyzer"] = analyzer
+    _worker["plagiarism"] = PlagiarismChecker(
+        boilerplate_path=os.getenv("BOILERPLATE_INDEX_PATH", "public/models/boilerplate.bloom")
+    )
+    _worker["improver"] = ResumeImprover()
+
+
+def analyze_file(path: str) -> Dict[str, object]:
+    """Run every analyzer on one file and flatten the results into a row"""
+    start_time = time.perf_counter()
+    row = dict.fromkeys(FIELDNAMES)
+    row["path"] = path
+
+    try:
+        file_content = Path(path).read_bytes()
+        filename = os.path.basename(path)
+        validation = FileHandler.validate_file(filename, file_content)
+        if not validation["valid"]:
+            raise ValueError(validation["error"])
+
+        extraction = _worker["analyzer"].extract_text(file_content, filename)
+        if "error" in extraction:
+            raise ValueError(extraction["error"])
+        text = extraction["text"]
+
+        classification = _worker["analyzer"].predict_domain_from_text(text, filename)
+        if "error" in classification:
+            raise ValueError(classification["error"])
+        improvement = _worker["improver"].analyze_resume(text, classification["domain"])
+        plagiarism = _worker["plagiarism"].check_plagiarism(text)
+        contact_info = TextProcessor.extract_contact_info(text)
+        readability = TextProcessor.calculate_readability_score(text)
+
+        row.update(
+            status="ok",
+            domain=str(classification["domain"]),
+            confidence=float(classification["confidence"]),
+            skills="|".join(classification["skills"]),
+            improvement_score=improvement["overall_score"],
+            suggestion_count=len(improvement["suggestions"]),
+            plagiarism_score=plagiarism["overall_score"],
+            overused_phrases="|".join(match["phrase"] for match in plagiarism["matches"]),
+            email=contact_info["email"],
+            phone=contact_info["phone"],
+            experience_years=TextProcessor.extract_experience_years(text),
+            readability_score=float(readability["score"]),
+            word_count=readability.get("word_count"),
+            pages_total=extraction.get("pages_total"),
+            pages_skipped=len(extraction["pages_skipped"]) if "pages_skipped" in extraction else None
+        )
+    except Exception as e:
+        row.update(status="error", error=str(e))
+
+    row["elapsed_ms"] = round((time.perf_counter() - start_time) * 1000, 2)
+    return row
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def list_inputs(source: str, extensions: Set[str]) -> List[str]:
+    """Resume paths under a directory (sorted, recursive) or listed in a manifest"""
+    source_path = Path(source)
+    if source_path.is_dir():
+        paths = []
+        for root, dirs, files in os.walk(source_path):
+            dirs.sort()
+            paths.extend(os.path.join(root, name) for name in sorted(files)
+                         if name.lower().rsplit(".", 1)[-1] in extensions)
+        return paths
+
+    base = source_path.parent
+    paths = []
+    with open(source_path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(line if os.path.isabs(line) else str(base / line))
+    return paths
+
+
+class Checkpoint:
+    """
+    Append-only log of flushed row groups. Each entry records the paths it
+    covered and where the output ended after it, so a resumed run can drop
+    output written after the last entry (a crash mid-flush) and skip every
+    path already recorded.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[dict] = []
+        if os.path.exists(path):
+            valid_bytes = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        self.entries.append(json.loads(line))
+                    except ValueError:
+                        break
+                    valid_bytes += len(line)
+            # Drop a torn last line from an interrupted write so appends stay parseable
+            os.truncate(path, valid_bytes)
+
+    def done_paths(self) -> Set[str]:
+        return {path for entry in self.entries for path in entry["paths"]}
+
+    def append(self, entry: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries.append(entry)
+
+
+class CsvSink:
+    """Appends row groups to one CSV file, truncating anything not checkpointed"""
+
+    def __init__(self, path: str, checkpoint: Checkpoint):
+        self.path = path
+        offset = checkpoint.entries[-1]["offset"] if checkpoint.entries else 0
+        exists = os.path.exists(path)
+        self.file = open(path, "r+" if exists else "w", newline="", encoding="utf-8")
+        self.file.truncate(offset)
+        self.file.seek(offset)
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDNAMES)
+        if offset == 0:
+            self.writer.writeheader()
+
+    def write(self, rows: List[dict]) -> dict:
+        self.writer.writerows(rows)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """
+    Writes each row group as its own Parquet file in an output directory.
+    A file is complete (footer written) before it is renamed into place, so
+    an interruption never leaves a corrupt dataset; files written after the
+    last checkpoint entry are removed on resume.
+    """
+
+    def __init__(self, directory: str, checkpoint: Checkpoint):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("❌ Parquet output requires pyarrow (pip install pyarrow); use a .csv output instead")
+
+        self.pa, self.pq = pa, pq
+        types = {"string": pa.string(), "float": pa.float64(), "int": pa.int64()}
+        self.schema = pa.schema([(name, types[kind]) for name, kind in COLUMNS])
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        recorded = {entry["part"] for entry in checkpoint.entries}
+        for part in self.directory.glob("part-*.parquet"):
+            if part.name not in recorded:
+                part.unlink()
+        self.next_part = len(checkpoint.entries)
+
+    def write(self, rows: List[dict]) -> dict:
+        name = f"part-{self.next_part:05d}.parquet"
+        table = self.pa.Table.from_pylist(rows, schema=self.schema)
+        tmp_path = self.directory / (name + ".tmp")
+        self.pq.write_table(table, tmp_path)
+        os.replace(tmp_path, self.directory / name)
+        self.next_part += 1
+        return {"part": name}
+
+    def close(self):
+        pass
+
+
+def run(args) -> int:
+    extensions = {ext.strip().lower().lstrip(".") for ext in args.extensions.split(",")}
+    output_format = args.format or ("csv" if args.output.lower().endswith(".csv") else "parquet")
+    checkpoint_path = args.checkpoint or args.output.rstrip("/") + ".checkpoint"
+
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = Checkpoint(checkpoint_path)
+    if args.restart and output_format == "csv" and os.path.exists(args.output):
+        os.remove(args.output)
+
+    paths = list_inputs(args.source, extensions)
+    done = checkpoint.done_paths()
+    todo = [path for path in paths if path not in done]
+    print(f"📂 {len(paths)} files found, {len(paths) - len(todo)} already done, {len(todo)} to process")
+
+    # Opening the sink also discards output written after the last checkpoint
+    sink = CsvSink(args.output, checkpoint) if output_format == "csv" else ParquetSink(args.output, checkpoint)
+    if not todo:
+        sink.close()
+        return 0
+    workers = args.workers or os.cpu_count() or 1
+    buffer: List[dict] = []
+    processed = failed = 0
+    start_time = last_report = time.time()
+
+    def flush():
+        if buffer:
+            position = sink.write(buffer)
+            checkpoint.append({"paths": [row["path"] for row in buffer], "rows": len(buffer), **position})
+            buffer.clear()
+
+    def report(final=False):
+        elapsed = max(time.time() - start_time, 1e-9)
+        rate = processed / elapsed
+        remaining = (len(todo) - processed) / rate if rate else float("inf")
+        print(f"{'✅' if final else '⏳'} {processed}/{len(todo)} files, {failed} failed, "
+              f"{rate:.1f} files/s, elapsed {elapsed:.0f}s" + ("" if final else f", ETA {remaining:.0f}s"))
+
+    pool = Pool(workers, initializer=_init_worker, initargs=(args.model, args.vectorizer))
+    # Schedulers stop jobs with SIGTERM; treat it like Ctrl-C (set after the
+    # workers are forked so pool.terminate() still kills them)
+    signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        for row in pool.imap_unordered(analyze_file, todo, chunksize=args.chunksize):
+            buffer.append(row)
+            processed += 1
+            failed += row["status"] != "ok"
+            if len(buffer) >= args.row_group:
+                flush()
+            if time.time() - last_report >= args.progress_interval:
+                report()
+                last_report = time.time()
+        pool.close()
+    except KeyboardInterrupt:
+        print("🛑 Interrupted, saving completed results; run again to resume")
+        pool.terminate()
+    finally:
+        # Rows already computed are complete, so they are kept either way
+        flush()
+        sink.close()
+        pool.join()
+
+    report(final=True)
+    return 0
+
+
+def parse_args(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Analyze a directory or manifest of resumes offline")
+    parser.add_argument("source", help="Directory to walk, or a manifest file with one path per line")
+    parser.add_argument("--output", required=True,
+                        help="CSV file (*.csv) or directory of Parquet row-group files")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Override the format implied by --output")
+    parser.add_argument("--workers", type=int, default=0, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--chunksize", type=int, default=16, help="Files sent to a worker per dispatch")
+    parser.add_argument("--row-group", type=int, default=1000,
+                        help="Rows written (and checkpointed) per row group")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    parser.add_argument("--extensions", default="pdf,docx,txt", help="File types to pick up from a directory")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument("--model", default="public/models/domain_classifier.pkl")
+    parser.add_argument("--vectorizer", default="public/models/tfidf_vectorizer.pkl")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
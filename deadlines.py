@@ -0,0 +1,338 @@
+"""
+Per-request deadlines with cooperative cancellation.
+
+The DeadlineMiddleware gives every API request a Deadline (from the
+X-Request-Timeout header, in seconds, or a per-path default) and keeps it in
+a context variable, which asyncio tasks and asyncio.to_thread workers
+inherit. Pipeline stages call check() on entry (profiling.stage does this
+for every stage), and long loops such as PDF pages or batch items call it
+between iterations, so work stops soon after the deadline passes or the
+client disconnects instead of running to completion for nobody.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Union
+
+# Process-wide counters of abandoned work, reported by DeadlinePolicy.metrics
+counters = {"checks_failed": 0}
+stage_counters: Dict[str, int] = {}
+_counter_lock = threading.Lock()
+
+
+class DeadlineExceeded(BaseException):
+    """
+    Raised by a cooperative check once the request's deadline has passed or
+    its client has disconnected. Like asyncio.CancelledError it derives from
+    BaseException, so the analyzers' `except Exception` fallbacks do not turn
+    abandoned work into an error result.
+    """
+
+    def __init__(self, reason: str, stage: Optional[str] = None):
+        super().__init__(f"Request {reason}" + (f" before stage '{stage}'" if stage else ""))
+        self.reason = reason
+        self.stage = stage
+
+
+def _count_abandoned(stage: Optional[str]):
+    with _counter_lock:
+        counters["checks_failed"] += 1
+        if stage:
+            stage_counters[stage] = stage_counters.get(stage, 0) + 1
+
+
+class Deadline:
+    """The time budget of one request plus the stages it completed"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        # "expired" or "disconnected" once the work should be abandoned
+        self.reason: Optional[str] = None
+        self.abandoned_stage: Optional[str] = None
+        self.completed: List[str] = []
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def abandoned(self) -> bool:
+        if self.reason is None and time.monotonic() >= self.expires_at:
+            self.reason = "expired"
+        return self.reason is not None
+
+    def cancel(self, reason: str):
+        if self.reason is None:
+            self.reason = reason
+
+    def check(self, stage: Optional[str] = None):
+        if self.abandoned():
+            if self.abandoned_stage is None:
+                self.abandoned_stage = stage
+            _count_abandoned(stage)
+            raise DeadlineExceeded(self.reason, stage)
+
+    def stage_completed(self, stage: str):
+        self.completed.append(stage)
+
+
+class SharedDeadline:
+    """
+    Deadline of work shared by several requests (see SingleFlight): it
+    lasts as long as the longest-lived request waiting on it and is only
+    abandoned once every one of them has been. A request without a
+    deadline makes the shared work unbounded.
+    """
+
+    def __init__(self):
+        self.members: List[Deadline] = []
+        self.unbounded = False
+
+    def join(self, deadline: Optional["AnyDeadline"]):
+        if deadline is None:
+            self.unbounded = True
+        elif isinstance(deadline, SharedDeadline):
+            self.unbounded = self.unbounded or deadline.unbounded
+            self.members.extend(deadline.members)
+        else:
+            self.members.append(deadline)
+
+    def remaining(self) -> Optional[float]:
+        if self.unbounded or not self.members:
+            return None
+        return max(member.remaining() for member in self.members)
+
+    def abandoned(self) -> bool:
+        if self.unbounded or not self.members:
+            return False
+        return all(member.abandoned() for member in self.members)
+
+    def check(self, stage: Optional[str] = None):
+        if self.abandoned():
+            for member in self.members:
+                if member.abandoned_stage is None:
+                    member.abandoned_stage = stage
+            _count_abandoned(stage)
+            raise DeadlineExceeded(self.members[-1].reason, stage)
+
+    def stage_completed(self, stage: str):
+        for member in self.members:
+            member.completed.append(stage)
+
+
+AnyDeadline = Union[Deadline, SharedDeadline]
+_current: ContextVar[Optional[AnyDeadline]] = ContextVar("deadline", default=None)
+
+
+def current() -> Optional[AnyDeadline]:
+    return _current.get()
+
+
+def check(stage: Optional[str] = None):
+    """Raise DeadlineExceeded if the current request's work should stop"""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request, or None without a deadline"""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+@contextmanager
+def use(deadline: Optional[AnyDeadline]):
+    """Run the enclosed block under the given deadline (None removes it)"""
+    token = _current.set(deadline)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+class DeadlinePolicy:
+    """Timeouts per request and the metrics of expired and cancelled requests"""
+
+    HEADER = b"x-request-timeout"
+
+    def __init__(self, default_timeout: float = 30.0, max_timeout: float = 120.0,
+                 path_timeouts: Optional[Dict[str, float]] = None, paths=("/api/",),
+                 grace: float = 1.0):
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+        # Longest prefix first so the most specific default wins
+        self.path_timeouts = sorted((path_timeouts or {}).items(), key=lambda item: -len(item[0]))
+        self.paths = tuple(paths)
+        self.grace = grace
+        self.counters = {"requests": 0, "completed": 0, "expired": 0, "disconnected": 0,
+                         "expired_after_response_start": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["DeadlinePolicy"]:
+        """Build from REQUEST_TIMEOUT_* environment variables; REQUEST_DEADLINES=0 disables it"""
+        if os.getenv("REQUEST_DEADLINES", "1") != "1":
+            return None
+        env = os.getenv
+        return cls(
+            default_timeout=float(env("REQUEST_TIMEOUT_DEFAULT", "30")),
+            max_timeout=float(env("REQUEST_TIMEOUT_MAX", "600")),
+            path_timeouts={"/api/batch/": float(env("REQUEST_TIMEOUT_BATCH", "600"))}
+        )
+
+    def timeout_for(self, scope) -> Optional[float]:
+        """The request's time budget, or None when the path is not covered"""
+        path = scope["path"]
+        if not path.startswith(self.paths):
+            return None
+        for header, value in scope.get("headers") or []:
+            if header == self.HEADER:
+                try:
+                    requested = float(value.decode("latin-1"))
+                except ValueError:
+                    break
+                if requested > 0:
+                    return min(requested, self.max_timeout)
+                break
+        for prefix, timeout in self.path_timeouts:
+            if path.startswith(prefix):
+                return timeout
+        return self.default_timeout
+
+    def metrics(self) -> Dict[str, object]:
+        with _counter_lock:
+            abandoned_stages = dict(stage_counters)
+            checks_failed = counters["checks_failed"]
+        return {
+            "default_timeout_s": self.default_timeout,
+            "max_timeout_s": self.max_timeout,
+            **self.counters,
+            "abandoned_checks": checks_failed,
+            "abandoned_at_stage": abandoned_stages
+        }
+
+
+class _DisconnectWatcher:
+    """
+    Wraps ASGI receive. Once the request body has been read, a background
+    task waits for http.disconnect; later receive calls by the app (e.g. a
+    streaming response listening for disconnects) share that task's result.
+    """
+
+    def __init__(self, receive, on_disconnect):
+        self._receive = receive
+        self._on_disconnect = on_disconnect
+        self._task: Optional[asyncio.Future] = None
+
+    async def receive(self):
+        if self._task is not None:
+            return await asyncio.shield(self._task)
+        message = await self._receive()
+        if message["type"] == "http.disconnect":
+            self._on_disconnect()
+        elif not message.get("more_body", False):
+            self._task = asyncio.ensure_future(self._watch())
+        return message
+
+    async def _watch(self):
+        message = await self._receive()
+        if message["type"] == "http.disconnect":
+            self._on_disconnect()
+        return message
+
+    def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+
+class DeadlineMiddleware:
+    """
+    ASGI middleware enforcing a DeadlinePolicy. At the deadline the
+    cooperative checks start failing; a request still running `grace`
+    seconds later (or as soon as its client disconnects) has its task
+    cancelled. Expired requests that have not started a response get a 504
+    listing the stages that completed.
+    """
+
+    def __init__(self, app, policy: DeadlinePolicy):
+        self.app = app
+        self.policy = policy
+
+    async def __call__(self, scope, receive, send):
+        timeout = self.policy.timeout_for(scope) if scope["type"] == "http" else None
+        if timeout is None:
+            return await self.app(scope, receive, send)
+
+        policy = self.policy
+        policy.counters["requests"] += 1
+        deadline = Deadline(timeout)
+        abandon = asyncio.Event()
+        response = {"started": False, "complete": False}
+
+        def on_disconnect():
+            # Servers also report a disconnect once the response is complete
+            if not response["complete"]:
+                deadline.cancel("disconnected")
+                abandon.set()
+
+        async def tracking_send(message):
+            if message["type"] == "http.response.start":
+                response["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                response["complete"] = True
+            await send(message)
+
+        watcher = _DisconnectWatcher(receive, on_disconnect)
+        with use(deadline):
+            app_task = asyncio.ensure_future(self.app(scope, watcher.receive, tracking_send))
+        timer = asyncio.get_running_loop().call_later(timeout + policy.grace, abandon.set)
+        abandon_task = asyncio.ensure_future(abandon.wait())
+        try:
+            await asyncio.wait({app_task, abandon_task}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            app_task.cancel()
+            raise
+        finally:
+            timer.cancel()
+            abandon_task.cancel()
+            watcher.stop()
+
+        if not app_task.done():
+            deadline.cancel("expired")
+            app_task.cancel()
+        try:
+            await app_task
+        except (asyncio.CancelledError, DeadlineExceeded):
+            pass
+
+        if deadline.reason is None:
+            policy.counters["completed"] += 1
+            return
+        policy.counters[deadline.reason] += 1
+        if deadline.reason == "expired":
+            if response["started"]:
+                policy.counters["expired_after_response_start"] += 1
+            else:
+                await self._send_timeout(send, deadline)
+
+    @staticmethod
+    async def _send_timeout(send, deadline: Deadline):
+        # utils imports profiling, which imports this module
+        from utils import ResponseFormatter
+
+        body = ResponseFormatter.format_error_response(
+            f"Request exceeded its {deadline.timeout:g}s deadline", "DEADLINE_EXCEEDED"
+        )
+        body["completed_stages"] = deadline.completed
+        body["abandoned_stage"] = deadline.abandoned_stage
+        payload = json.dumps(body).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 504,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(payload)).encode())]
+        })
+        await send({"type": "http.response.body", "body": payload})
@@ -0,0 +1,395 @@
+"""
+Pluggable domain classifier backends used by ResumeAnalyzer.
+
+Every engine takes a list of documents and returns (label, confidence)
+pairs with confidence in percent. Models load lazily on first use, and
+heavy libraries are only imported by the engine that needs them.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import List, Optional, Sequence, Tuple
+
+import deadlines
+from profiling import stage
+from result_store import fingerprint, file_fingerprint
+
+Prediction = Tuple[str, float]
+# (label, confidence, margin): margin is the gap in percentage points between
+# the two most likely classes, or None when the model has no probabilities
+RankedPrediction = Tuple[str, float, Optional[float]]
+
+
+def _with_margins(classes, probabilities) -> List[RankedPrediction]:
+    """Top class, its probability and its lead over the runner-up, all in percent"""
+    import numpy as np
+
+    probabilities = np.asarray(probabilities) * 100
+    best = probabilities.argmax(axis=1)
+    if probabilities.shape[1] > 1:
+        top_two = np.partition(probabilities, -2, axis=1)[:, -2:]
+        margins = top_two[:, 1] - top_two[:, 0]
+    else:
+        margins = probabilities[:, 0]
+    return [(classes[i], probabilities[row, i], margins[row]) for row, i in enumerate(best)]
+
+
+class ClassifierEngine:
+    """Base class: thread-safe lazy loading plus the predict() contract"""
+
+    name = "base"
+    # Whether predict() expects ResumeAnalyzer.clean_text output or raw text
+    uses_cleaned_text = True
+
+    def __init__(self):
+        self.loaded = False
+        self.available = False
+        self._load_lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        """Identifies the model artifacts so stored results are invalidated on change"""
+        raise NotImplementedError
+
+    def load(self) -> bool:
+        """Load the models once; returns whether the engine can predict"""
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.available = self._load()
+                    self.loaded = True
+        return self.available
+
+    def _load(self) -> bool:
+        raise NotImplementedError
+
+    def predict(self, documents: Sequence[str]) -> List[Prediction]:
+        raise NotImplementedError
+
+    def predict_margins(self, documents: Sequence[str]) -> List[RankedPrediction]:
+        """Like predict, plus how far ahead of the runner-up each label is"""
+        return [(label, confidence, None) for label, confidence in self.predict(documents)]
+
+    def close(self):
+        """Release threads or other resources held by the engine"""
+
+
+class TfidfLogRegEngine(ClassifierEngine):
+    """The trained TF-IDF vectorizer and logistic regression classifier"""
+
+    name = "tfidf"
+
+    def __init__(self, model_path: str = "public/models/domain_classifier.pkl",
+                 vectorizer_path: str = "public/models/tfidf_vectorizer.pkl"):
+        super().__init__()
+        self.model_path = model_path
+        self.vectorizer_path = vectorizer_path
+        self.model = None
+        self.vectorizer = None
+        self._version = fingerprint(self.name, file_fingerprint(model_path, vectorizer_path))
+        # Identifies the vocabulary the vectors index into (see feature_store.py)
+        self.feature_space = file_fingerprint(vectorizer_path)
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+    def _load(self) -> bool:
+        import joblib
+        try:
+            self.model = joblib.load(self.model_path)
+            self.vectorizer = joblib.load(self.vectorizer_path)
+            print("✅ Models loaded successfully!")
+            return True
+        except Exception as e:
+            # A missing, truncated or incompatible pickle leaves the analyzer
+            # on its fallback prediction instead of failing every request
+            print(f"❌ Error loading models: {e}")
+            self.model = None
+            self.vectorizer = None
+            return False
+
+    def transform(self, documents: Sequence[str]):
+        with stage("vectorize"):
+            return self.vectorizer.transform(documents)
+
+    def predict_vectors(self, vectors) -> List[Prediction]:
+        """Classify rows that are already TF-IDF weighted"""
+        with stage("predict"):
+            labels = self.model.predict(vectors)
+            if hasattr(self.model, 'predict_proba'):
+                confidences = self.model.predict_proba(vectors).max(axis=1) * 100
+            else:
+                confidences = [85.0] * len(labels)  # Default confidence
+        return list(zip(labels, confidences))
+
+    def predict(self, documents: Sequence[str]) -> List[Prediction]:
+        return self.predict_vectors(self.transform(documents))
+
+    def predict_margins(self, documents: Sequence[str]) -> List[RankedPrediction]:
+        return self.predict_vector_margins(self.transform(documents))
+
+    def predict_vector_margins(self, vectors) -> List[RankedPrediction]:
+        if not hasattr(self.model, 'predict_proba'):
+            return [(label, confidence, None) for label, confidence in self.predict_vectors(vectors)]
+        with stage("predict"):
+            probabilities = self.model.predict_proba(vectors)
+        return _with_margins(self.model.classes_, probabilities)
+
+
+class _Request:
+    __slots__ = ("text", "future", "deadline")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.future = Future()
+        # The batcher thread does not inherit the caller's context
+        self.deadline = deadlines.current()
+
+
+class EmbeddingEngine(ClassifierEngine):
+    """
+    Sentence-transformers encoder with a linear (logistic regression) head.
+
+    Requests from concurrent callers are queued and a batching thread
+    groups them: it waits at most max_wait_ms after the first request or
+    until max_batch_size requests are queued. Each batch is split into
+    token-length buckets so short resumes are not padded to the length of
+    the longest one. threads caps torch's intra-op threads, and quantize
+    applies int8 dynamic quantization to the encoder's linear layers. If the
+    encoder or head cannot be loaded, predictions are served by the fallback
+    engine (if any) instead.
+    """
+
+    name = "embedding"
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 head_path: str = "public/models/embedding_head.pkl",
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, threads: int = 0,
+                 quantize: bool = False, max_seq_length: int = 256,
+                 bucket_edges: Sequence[int] = (64, 128), fallback: Optional[ClassifierEngine] = None):
+        super().__init__()
+        self.fallback = fallback
+        # The fallback engine once loading failed; predictions are delegated to it
+        self.delegate: Optional[ClassifierEngine] = None
+        self.model_name = model_name
+        self.head_path = head_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.threads = threads
+        self.quantize = quantize
+        self.max_seq_length = max_seq_length
+        self.bucket_edges = sorted(edge for edge in bucket_edges if edge < max_seq_length)
+        self.encoder = None
+        self.head = None
+        self._queue: Optional[queue.Queue] = None
+        self._batcher_pid = None
+        self._batcher_lock = threading.Lock()
+        self.stats = {"batches": 0, "documents": 0}
+
+    @property
+    def version(self) -> str:
+        version = fingerprint(self.name, self.model_name, file_fingerprint(self.head_path),
+                              self.quantize, self.max_seq_length)
+        # Fallback predictions must not be stored as the encoder's
+        if self.delegate is not None:
+            return fingerprint(version, self.delegate.version)
+        return version
+
+    @property
+    def uses_cleaned_text(self) -> bool:
+        return self.delegate.uses_cleaned_text if self.delegate is not None else False
+
+    def _load(self) -> bool:
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            return self._fall_back(f"Embedding engine needs torch and sentence-transformers: {e}")
+
+        # A missing or corrupt download, an offline hub or a failed
+        # quantization must not leave the service without a classifier
+        try:
+            if self.threads:
+                torch.set_num_threads(self.threads)
+            encoder = SentenceTransformer(self.model_name, device="cpu")
+            encoder.max_seq_length = self.max_seq_length
+            encoder.eval()
+            if self.quantize:
+                encoder = torch.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+        except Exception as e:
+            return self._fall_back(f"Embedding model {self.model_name} failed to load: {e}")
+        self.encoder = encoder
+
+        try:
+            import joblib
+            self.head = joblib.load(self.head_path)
+        except FileNotFoundError:
+            # The encoder alone is enough to train a head with train_head()
+            return self._fall_back(f"No classifier head at {self.head_path}; train one with engines.train_head")
+        except Exception as e:
+            return self._fall_back(f"Classifier head {self.head_path} failed to load: {e}")
+
+        print(f"✅ Embedding engine loaded ({self.model_name}{', int8' if self.quantize else ''})")
+        return True
+
+    def _fall_back(self, reason: str) -> bool:
+        """Log why the encoder is unusable and serve the fallback engine instead"""
+        if self.fallback is None:
+            print(f"❌ {reason}")
+            return False
+        print(f"⚠️  {reason}; falling back to the {self.fallback.name} engine")
+        if not self.fallback.load():
+            return False
+        self.delegate = self.fallback
+        return True
+
+    def embed(self, documents: Sequence[str]):
+        """Normalized embeddings, encoded per token-length bucket"""
+        import numpy as np
+
+        tokenizer = self.encoder.tokenizer
+        lengths = tokenizer(list(documents), truncation=True, max_length=self.max_seq_length,
+                            return_length=True)["length"]
+        buckets = {}
+        for index, length in enumerate(lengths):
+            bucket = next((edge for edge in self.bucket_edges if length <= edge), self.max_seq_length)
+            buckets.setdefault(bucket, []).append(index)
+
+        embeddings = None
+        for indices in buckets.values():
+            vectors = self.encoder.encode([documents[i] for i in indices], batch_size=len(indices),
+                                          convert_to_numpy=True, normalize_embeddings=True)
+            if embeddings is None:
+                embeddings = np.zeros((len(documents), vectors.shape[1]), dtype=vectors.dtype)
+            embeddings[indices] = vectors
+        return embeddings
+
+    def _classify(self, documents: Sequence[str]) -> List[RankedPrediction]:
+        with stage("embed"):
+            embeddings = self.embed(documents)
+        with stage("predict"):
+            probabilities = self.head.predict_proba(embeddings)
+        return _with_margins(self.head.classes_, probabilities)
+
+    def _ensure_batcher(self) -> queue.Queue:
+        """Start the batching thread, again in each forked worker (threads do not survive fork)"""
+        if self._batcher_pid != os.getpid():
+            with self._batcher_lock:
+                if self._batcher_pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._batch_loop, args=(self._queue,),
+                                     name="embedding-batcher", daemon=True).start()
+                    self._batcher_pid = os.getpid()
+        return self._queue
+
+    def _batch_loop(self, requests: queue.Queue):
+        while True:
+            request = requests.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    request = requests.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if request is None:
+                    requests.put(None)  # Finish this batch, then stop
+                    break
+                batch.append(request)
+
+            # Requests whose caller has given up are not encoded
+            live = []
+            for r in batch:
+                if r.deadline is not None and r.deadline.abandoned():
+                    r.future.set_exception(deadlines.DeadlineExceeded(r.deadline.reason or "expired", "embed"))
+                else:
+                    live.append(r)
+            batch = live
+            if not batch:
+                continue
+
+            try:
+                predictions = self._classify([r.text for r in batch])
+            except Exception as e:
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+            self.stats["batches"] += 1
+            self.stats["documents"] += len(batch)
+            for r, prediction in zip(batch, predictions):
+                r.future.set_result(prediction)
+
+    def predict(self, documents: Sequence[str]) -> List[Prediction]:
+        if self.delegate is not None:
+            return self.delegate.predict(documents)
+        return [(label, confidence) for label, confidence, _ in self.predict_margins(documents)]
+
+    def predict_margins(self, documents: Sequence[str]) -> List[RankedPrediction]:
+        if self.delegate is not None:
+            return self.delegate.predict_margins(documents)
+        requests = self._ensure_batcher()
+        pending = [_Request(document) for document in documents]
+        for request in pending:
+            requests.put(request)
+        results = []
+        for request in pending:
+            try:
+                results.append(request.future.result(timeout=deadlines.remaining()))
+            except FutureTimeout:
+                deadlines.check("embed")
+                raise
+        return results
+
+    def close(self):
+        if self._queue is not None and self._batcher_pid == os.getpid():
+            self._queue.put(None)
+            self._batcher_pid = None
+        if self.fallback is not None:
+            self.fallback.close()
+
+
+def train_head(engine: EmbeddingEngine, documents: Sequence[str], labels: Sequence[str],
+               output_path: Optional[str] = None):
+    """Fit the logistic regression head on embeddings and save it for the engine"""
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+
+    engine.load()
+    if engine.encoder is None:
+        raise RuntimeError("Embedding encoder could not be loaded")
+    head = LogisticRegression(max_iter=1000, class_weight="balanced")
+    head.fit(engine.embed(list(documents)), list(labels))
+    joblib.dump(head, output_path or engine.head_path)
+
+    # Serve the new head straight away
+    engine.head = head
+    engine.delegate = None
+    engine.available = True
+    return head
+
+
+def engine_from_env(model_path: str, vectorizer_path: str) -> ClassifierEngine:
+    """Build the engine selected by CLASSIFIER_ENGINE (tfidf or embedding)"""
+    kind = os.getenv("CLASSIFIER_ENGINE", "tfidf")
+    if kind == "tfidf":
+        return TfidfLogRegEngine(model_path, vectorizer_path)
+    if kind == "embedding":
+        return EmbeddingEngine(
+            model_name=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2"),
+            head_path=os.getenv("EMBEDDING_HEAD_PATH", "public/models/embedding_head.pkl"),
+            max_batch_size=int(os.getenv("EMBEDDING_MAX_BATCH", "32")),
+            max_wait_ms=float(os.getenv("EMBEDDING_MAX_WAIT_MS", "5")),
+            threads=int(os.getenv("EMBEDDING_THREADS", "0")),
+            quantize=os.getenv("EMBEDDING_QUANTIZE", "0") == "1",
+            # Serves requests if the encoder cannot be loaded
+            fallback=TfidfLogRegEngine(model_path, vectorizer_path)
+        )
+    raise ValueError(f"Unknown CLASSIFIER_ENGINE: {kind}")
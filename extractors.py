@@ -0,0 +1,286 @@
+import math
+import signal
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import wait
+from io import BytesIO
+from lxml.etree import iterparse, XMLSyntaxError
+
+import deadlines
+from profiling import stage
+
+# WordprocessingML namespaces
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_NS = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+# Bump when extraction output changes so stored results are recomputed
+EXTRACTOR_VERSION = 1
+
+# Upper bound on extracted characters so a decompression bomb cannot grow memory
+MAX_TEXT_CHARS = 2_000_000
+
+# Elements emitted as whitespace to keep words from different runs/cells apart
+_BREAK_TAGS = {W_NS + "br", W_NS + "cr", W_NS + "p"}
+_TAB_TAGS = {W_NS + "tab", W_NS + "tc"}
+
+# Only these elements are surfaced to Python; everything else stays in libxml2
+_STREAM_TAGS = tuple(_BREAK_TAGS | _TAB_TAGS | {
+    W_NS + "t", W_NS + "tbl", MC_NS + "Choice", MC_NS + "Fallback"
+})
+
+
+# PDF limits: no single upload may hold a CPU longer than the document budget
+PDF_PAGE_TIMEOUT = 5.0
+PDF_DOCUMENT_TIMEOUT = 20.0
+PDF_MIN_PAGES_PER_SHARD = 4
+
+
+class DocxExtractionError(Exception):
+    """Raised when a DOCX file cannot be parsed by the streaming extractor"""
+
+
+def _docx_part_names(archive: zipfile.ZipFile) -> list:
+    """Return the XML parts that carry text, in reading order"""
+    names = archive.namelist()
+    if "word/document.xml" not in names:
+        raise DocxExtractionError("word/document.xml not found")
+
+    headers = sorted(n for n in names if n.startswith("word/header") and n.endswith(".xml"))
+    footers = sorted(n for n in names if n.startswith("word/footer") and n.endswith(".xml"))
+    return headers + ["word/document.xml"] + footers
+
+
+def _stream_part_text(stream, pieces: list, budget: int) -> int:
+    """Append text runs from one XML part to pieces, returning the remaining budget"""
+    # Text boxes and shapes are stored twice (mc:Choice and mc:Fallback); the
+    # fallback copy is dropped by rewinding to where its mc:Choice ended
+    choice_marks = []
+
+    for _, elem in iterparse(stream, events=("end",), tag=_STREAM_TAGS):
+        tag = elem.tag
+
+        if tag == W_NS + "t":
+            text = elem.text
+            if text:
+                pieces.append(text)
+                budget -= len(text)
+        elif tag in _TAB_TAGS:
+            pieces.append("\t")
+        elif tag in _BREAK_TAGS:
+            pieces.append("\n")
+            # Drop finished paragraphs so memory stays bounded
+            elem.clear()
+        elif tag == W_NS + "tbl":
+            elem.clear()
+        elif tag == MC_NS + "Choice":
+            choice_marks.append(len(pieces))
+        elif tag == MC_NS + "Fallback" and choice_marks:
+            mark = choice_marks.pop()
+            budget += sum(len(piece) for piece in pieces[mark:])
+            del pieces[mark:]
+            elem.clear()
+
+        if budget <= 0:
+            break
+
+    return budget
+
+
+def extract_docx_text(file_bytes: bytes, max_chars: int = MAX_TEXT_CHARS) -> str:
+    """
+    Extract text from a DOCX file by stream-parsing its XML parts.
+
+    Reads body paragraphs, tables, text boxes, headers and footers without
+    building a python-docx object model. Raises DocxExtractionError for
+    files that are not valid DOCX archives.
+    """
+    try:
+        with stage("docx_stream"), zipfile.ZipFile(BytesIO(file_bytes)) as archive:
+            pieces = []
+            budget = max_chars
+            for name in _docx_part_names(archive):
+                deadlines.check("docx_stream")
+                with archive.open(name) as stream:
+                    budget = _stream_part_text(stream, pieces, budget)
+                pieces.append("\n")
+                if budget <= 0:
+                    break
+    except (zipfile.BadZipFile, XMLSyntaxError, KeyError, EOFError, zlib.error,
+            ValueError, RuntimeError, NotImplementedError) as e:
+        # Corrupt deflate streams raise zlib.error, unsupported compression
+        # methods NotImplementedError, encrypted members RuntimeError
+        raise DocxExtractionError(str(e)) from e
+
+    return "".join(pieces)[:max_chars]
+
+
+class PageTimeout(Exception):
+    """Raised inside a PDF worker when a single page exceeds its time limit"""
+
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+
+def _page_alarm_available() -> bool:
+    """SIGALRM can only be armed from the main thread of a process"""
+    return hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+
+
+def _extract_pages(reader, page_numbers, page_timeout: float, deadline: float) -> tuple:
+    """
+    Extract pages from an open reader, each under a SIGALRM limit when possible.
+
+    Off the main thread no alarm can be armed, so only the document deadline
+    is checked between pages. Returns ({page_number: text}, [skipped page records]).
+    """
+    texts = {}
+    skipped = []
+    timed = _page_alarm_available()
+    previous_handler = signal.signal(signal.SIGALRM, _raise_page_timeout) if timed else None
+
+    try:
+        for page_number in page_numbers:
+            deadlines.check("pdf_pages")
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                skipped.append({"page": page_number + 1, "reason": "document_timeout"})
+                continue
+
+            limited_by_page = page_timeout < remaining
+            if timed:
+                signal.setitimer(signal.ITIMER_REAL, page_timeout if limited_by_page else remaining)
+            try:
+                texts[page_number] = reader.pages[page_number].extract_text() or ""
+            except PageTimeout:
+                reason = "page_timeout" if limited_by_page else "document_timeout"
+                skipped.append({"page": page_number + 1, "reason": reason})
+            except Exception as e:
+                skipped.append({"page": page_number + 1, "reason": f"error: {e}"})
+            finally:
+                if timed:
+                    signal.setitimer(signal.ITIMER_REAL, 0)
+    finally:
+        if timed:
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    return texts, skipped
+
+
+def _extract_pdf_pages(file_bytes: bytes, page_numbers: list, page_timeout: float,
+                       deadline: float) -> tuple:
+    """Worker entry point: extract a shard of pages, each under a SIGALRM limit"""
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+    return _extract_pages(reader, page_numbers, page_timeout, deadline)
+
+
+def extract_pdf_text(file_bytes: bytes, executor=None, workers: int = 1,
+                     page_timeout: float = PDF_PAGE_TIMEOUT,
+                     document_timeout: float = PDF_DOCUMENT_TIMEOUT,
+                     min_pages_per_shard: int = PDF_MIN_PAGES_PER_SHARD) -> dict:
+    """
+    Extract text from a PDF, skipping pages that exceed the time limits.
+
+    With a process pool executor (of `workers` processes), pages are sharded
+    across workers and every page runs under a hard per-page timeout, so a
+    pathological page cannot pin a CPU. Without one pages are read serially;
+    the per-page timeout then only applies on the main thread (CLI and bulk
+    runs), since request threads cannot arm SIGALRM. Skipped pages are
+    reported and the partial text is still returned.
+    """
+    import PyPDF2
+
+    with stage("pdf_open"):
+        reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+        pages_total = len(reader.pages)
+    # The request's own deadline (if sooner) also bounds the document
+    request_remaining = deadlines.remaining()
+    if request_remaining is not None:
+        document_timeout = max(min(document_timeout, request_remaining), 0.0)
+    deadline = time.time() + document_timeout
+    texts = {}
+    skipped = []
+
+    if executor is None:
+        with stage("pdf_pages"):
+            texts, skipped = _extract_pages(reader, range(pages_total), page_timeout, deadline)
+    else:
+        shard_size = max(min_pages_per_shard, math.ceil(pages_total / max(workers, 1)))
+        futures = {}
+        for start in range(0, pages_total, shard_size):
+            shard = list(range(start, min(start + shard_size, pages_total)))
+            future = executor.submit(_extract_pdf_pages, file_bytes, shard, page_timeout, deadline)
+            futures[future] = shard
+
+        # Workers stop on their own at the deadline; the grace period only
+        # covers process scheduling and result transfer. Waiting in slices
+        # lets a disconnected client release shards that have not started
+        wait_until = time.time() + document_timeout + 1.0
+        not_done = set(futures)
+        while not_done:
+            timeout = min(wait_until - time.time(), 0.25)
+            if timeout <= 0:
+                break
+            _, not_done = wait(not_done, timeout=timeout)
+            try:
+                deadlines.check("pdf_pages")
+            except deadlines.DeadlineExceeded:
+                for future in not_done:
+                    future.cancel()
+                raise
+        done = set(futures) - not_done
+
+        for future in done:
+            try:
+                shard_texts, shard_skipped = future.result()
+                texts.update(shard_texts)
+                skipped.extend(shard_skipped)
+            except Exception as e:
+                skipped.extend({"page": n + 1, "reason": f"error: {e}"} for n in futures[future])
+        for future in not_done:
+            future.cancel()
+            skipped.extend({"page": n + 1, "reason": "document_timeout"} for n in futures[future])
+
+    skipped.sort(key=lambda record: record["page"])
+
+    return {
+        "text": " ".join(texts[n] for n in sorted(texts)) + " ",
+        "pages_total": pages_total,
+        "pages_extracted": len(texts),
+        "pages_skipped": skipped
+    }
+
+
+def iter_pdf_pages(file_bytes: bytes, document_timeout: float = PDF_DOCUMENT_TIMEOUT,
+                   page_timeout: float = PDF_PAGE_TIMEOUT):
+    """
+    Open a PDF for lazy, serial extraction by callers that may stop early.
+
+    Returns (pages_total, pages), where pages yields (text, skipped) for each
+    page in order: skipped is None, or a record like those in
+    extract_pdf_text's pages_skipped (with empty text). Pages that are never
+    requested are never parsed. The per-page timeout applies on the main
+    thread only, as in extract_pdf_text's serial mode.
+    """
+    import PyPDF2
+
+    with stage("pdf_open"):
+        reader = PyPDF2.PdfReader(BytesIO(file_bytes))
+        pages_total = len(reader.pages)
+    request_remaining = deadlines.remaining()
+    if request_remaining is not None:
+        document_timeout = max(min(document_timeout, request_remaining), 0.0)
+    deadline = time.time() + document_timeout
+
+    def pages():
+        for page_number in range(pages_total):
+            # Not held across the yield, so only extraction is timed
+            with stage("pdf_pages"):
+                texts, skipped = _extract_pages(reader, [page_number], page_timeout, deadline)
+            yield texts.get(page_number, ""), (skipped[0] if skipped else None)
+
+    return pages_total, pages()
@@ -0,0 +1,527 @@
+"""
+Append-only store of the TF-IDF vectors of every classified resume.
+
+Each prediction the TF-IDF engine makes is queued with its vector, domain,
+confidence and model version, and a background thread in each worker
+appends the queue to that process's open segment once per flush interval,
+so requests never wait on disk. A segment is a directory of raw CSR arrays
+(indptr.i32, indices.i32, data.f32) plus one JSON line of metadata per row.
+The arrays are only ever extended, and segment.json is rewritten after
+each append with the committed row and value counts, so readers
+memory-map any segment (open or sealed) without locks and never see a
+partial row.
+
+Segments are sealed once they reach segment_rows or seal_interval seconds
+of age. Compaction merges small sealed segments into larger ones and seals
+segments left open by workers that died; training streams the rows
+straight from the mapped arrays, without re-extracting any resume.
+
+The store keeps every row until it is deleted, so it is off unless
+FEATURE_STORE_PATH is set. The recorded domains are the serving model's
+own predictions, not reviewed labels; see train.
+
+Usage:
+    python feature_store.py stats
+    python feature_store.py compact [--target-rows 500000]
+    python feature_store.py train --output retrained_classifier.pkl --pseudo-labels [--min-confidence 30]
+"""
+import argparse
+import fcntl
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+SEGMENT_META = "segment.json"
+ROWS = "rows.jsonl"
+# File name and dtype of each CSR array; a 32-bit indptr keeps scipy from
+# copying the mapped arrays to widen the index type
+ARRAYS = (("indptr", "indptr.i32", "<i4"), ("indices", "indices.i32", "<i4"), ("data", "data.f32", "<f4"))
+# Most stored values one segment can hold with a 32-bit indptr
+MAX_SEGMENT_NNZ = 2 ** 31 - 1
+
+
+class FeatureStoreError(RuntimeError):
+    """The store has no rows in the requested feature space"""
+
+
+def _write_json(path: Path, value: Dict[str, Any]):
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+    os.replace(tmp_path, path)
+
+
+def _map(path: Path, dtype: str, length: int):
+    import numpy as np
+
+    if length == 0:
+        return np.zeros(0, dtype=dtype)  # Empty files cannot be mapped
+    return np.memmap(path, dtype=dtype, mode="r", shape=(length,))
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, owned by someone else
+    return True
+
+
+class Segment:
+    """A memory-mapped CSR view of the committed rows of one segment"""
+
+    def __init__(self, directory: Path):
+        from scipy.sparse import csr_matrix
+
+        self.directory = directory
+        self.name = directory.name
+        with open(directory / SEGMENT_META, encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.rows, self.nnz = self.meta["rows"], self.meta["nnz"]
+        lengths = {"indptr": self.rows + 1, "indices": self.nnz, "data": self.nnz}
+        arrays = {name: _map(directory / filename, dtype, lengths[name]) for name, filename, dtype in ARRAYS}
+        self.matrix = csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                                 shape=(self.rows, self.meta["n_features"]), copy=False)
+
+    @property
+    def feature_space(self) -> str:
+        return self.meta["feature_space"]
+
+    @property
+    def sealed(self) -> bool:
+        return self.meta["sealed"]
+
+    def metadata(self) -> List[Dict[str, Any]]:
+        """Domain, confidence, model version and time of each committed row"""
+        rows = []
+        with open(self.directory / ROWS, encoding="utf-8") as f:
+            for line in f:
+                if len(rows) == self.rows:
+                    break
+                rows.append(json.loads(line))
+        return rows
+
+
+class _OpenSegment:
+    """The segment this process is appending to"""
+
+    def __init__(self, directory: Path, n_features: int, feature_space: str):
+        directory.mkdir(parents=True)
+        self.directory = directory
+        self.files = {name: open(directory / filename, "ab") for name, filename, _ in ARRAYS}
+        self.files["rows"] = open(directory / ROWS, "ab")
+        self.files["indptr"].write((0).to_bytes(4, "little"))
+        self.files["indptr"].flush()
+        now = time.time()
+        self.meta = {
+            "rows": 0, "nnz": 0, "n_features": n_features, "feature_space": feature_space,
+            "pid": os.getpid(), "created": now, "updated": now, "sealed": False
+        }
+        _write_json(directory / SEGMENT_META, self.meta)
+
+    def accepts(self, item: tuple, max_rows: int) -> bool:
+        return (self.meta["n_features"] == item[2] and self.meta["feature_space"] == item[3]
+                and self.meta["rows"] < max_rows and self.meta["nnz"] + len(item[0]) <= MAX_SEGMENT_NNZ)
+
+    def append(self, items: List[tuple]):
+        import numpy as np
+
+        lengths = np.fromiter((len(item[0]) for item in items), dtype=np.int64, count=len(items))
+        indptr = self.meta["nnz"] + np.cumsum(lengths)
+        # Arrays first, then the counts that make the new rows visible
+        self.files["indices"].write(np.concatenate([item[0] for item in items]).astype("<i4").tobytes())
+        self.files["data"].write(np.concatenate([item[1] for item in items]).astype("<f4").tobytes())
+        self.files["indptr"].write(indptr.astype("<i4").tobytes())
+        self.files["rows"].write("".join(json.dumps(item[4]) + "\n" for item in items).encode("utf-8"))
+        for f in self.files.values():
+            f.flush()
+        self.meta["rows"] += len(items)
+        self.meta["nnz"] = int(indptr[-1])
+        self.meta["updated"] = time.time()
+        _write_json(self.directory / SEGMENT_META, self.meta)
+
+    def seal(self):
+        for f in self.files.values():
+            f.close()
+        self.meta["sealed"] = True
+        _write_json(self.directory / SEGMENT_META, self.meta)
+
+
+class FeatureStore:
+    """
+    Append-only, segmented CSR store of TF-IDF vectors and their predictions.
+
+    append() only queues rows; each process runs its own writer thread and
+    open segment (segment names carry the pid), so pre-forked workers never
+    share a file. Rows are dropped rather than delaying a request when the
+    queue is full.
+    """
+
+    def __init__(self, path: str, segment_rows: int = 50000, seal_interval: float = 3600.0,
+                 flush_interval: float = 1.0, max_pending: int = 10000,
+                 compact_segments: int = 32, compact_rows: int = 500000):
+        self.path = Path(path)
+        self.segment_rows = segment_rows
+        self.seal_interval = seal_interval
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        # A compaction starts once this many small sealed segments pile up
+        self.compact_segments = compact_segments
+        self.compact_rows = compact_rows
+        self.counters = {"queued": 0, "dropped": 0, "written": 0, "write_errors": 0, "sealed": 0}
+        self._queue: Optional[queue.Queue] = None
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid = None
+        self._writer_lock = threading.Lock()
+        self._compactor: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["FeatureStore"]:
+        """Build a store from FEATURE_STORE_* environment variables; off unless FEATURE_STORE_PATH is set"""
+        path = os.getenv("FEATURE_STORE_PATH", "")
+        if not path:
+            return None
+        return cls(path,
+                   segment_rows=int(os.getenv("FEATURE_STORE_SEGMENT_ROWS", "50000")),
+                   seal_interval=float(os.getenv("FEATURE_STORE_SEAL_INTERVAL", "3600")),
+                   flush_interval=float(os.getenv("FEATURE_STORE_FLUSH_INTERVAL", "1")))
+
+    # Writing
+
+    def append(self, vectors, predictions: Sequence[Tuple[str, float]], model_version: str, feature_space: str):
+        """Queue TF-IDF rows with their (domain, confidence) predictions; never blocks"""
+        import numpy as np
+
+        requests = self._ensure_writer()
+        vectors = vectors.tocsr()
+        now = round(time.time(), 3)
+        for row, (domain, confidence) in enumerate(predictions):
+            start, end = vectors.indptr[row], vectors.indptr[row + 1]
+            item = (np.array(vectors.indices[start:end], dtype=np.int32),
+                    np.array(vectors.data[start:end], dtype=np.float32),
+                    vectors.shape[1], feature_space,
+                    {"t": now, "domain": str(domain), "confidence": round(float(confidence), 2),
+                     "model_version": model_version})
+            try:
+                requests.put_nowait(item)
+                self.counters["queued"] += 1
+            except queue.Full:
+                self.counters["dropped"] += 1
+
+    def _ensure_writer(self) -> queue.Queue:
+        """Start the writer thread, again in each forked worker (threads do not survive fork)"""
+        if self._writer_pid != os.getpid():
+            with self._writer_lock:
+                if self._writer_pid != os.getpid():
+                    self._queue = queue.Queue(maxsize=self.max_pending)
+                    self._writer = threading.Thread(target=self._write_loop, args=(self._queue,),
+                                                    name="feature-store-writer", daemon=True)
+                    self._writer.start()
+                    self._writer_pid = os.getpid()
+        return self._queue
+
+    def _write_loop(self, requests: queue.Queue):
+        segment: Optional[_OpenSegment] = None
+        stopping = False
+        while not stopping:
+            # Collect one flush interval's worth of rows
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                try:
+                    item = requests.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                run: List[tuple] = []
+                for item in batch:
+                    if segment is not None and not segment.accepts(item, self.segment_rows - len(run)):
+                        if run:
+                            segment.append(run)
+                            run = []
+                        segment = self._seal(segment)
+                    if segment is None:
+                        segment = _OpenSegment(self.path / f"seg-{time.time_ns():016x}-{os.getpid()}",
+                                               item[2], item[3])
+                    run.append(item)
+                if run:
+                    segment.append(run)
+                self.counters["written"] += len(batch)
+                if segment is not None and (stopping or time.time() - segment.meta["created"] >= self.seal_interval):
+                    segment = self._seal(segment)
+            except OSError as e:
+                # The open segment keeps its committed rows; later rows start a new one
+                self.counters["write_errors"] += len(batch)
+                print(f"Feature store write failed: {e}")
+                segment = None
+
+    def _seal(self, segment: _OpenSegment) -> None:
+        segment.seal()
+        self.counters["sealed"] += 1
+        # Compaction reads and rewrites whole segments, so it runs in its own
+        # thread and the writer keeps draining the queue meanwhile
+        with self._writer_lock:
+            if self._compactor is None or not self._compactor.is_alive():
+                self._compactor = threading.Thread(target=self._compact_if_fragmented,
+                                                   name="feature-store-compactor", daemon=True)
+                self._compactor.start()
+        return None
+
+    def _compact_if_fragmented(self):
+        try:
+            small = [s for s in self._segments() if s.sealed and s.rows < self.compact_rows // 2]
+            if len(small) >= self.compact_segments:
+                self.compact(wait=False)
+        except Exception as e:
+            print(f"Feature store compaction failed: {e}")
+
+    def close(self, timeout: float = 10.0):
+        """Write out queued rows, seal this process's segment and finish any compaction"""
+        if self._queue is not None and self._writer_pid == os.getpid():
+            self._queue.put(None)
+            self._writer.join(timeout)
+            self._writer_pid = None
+        if self._compactor is not None:
+            self._compactor.join(timeout)
+
+    # Reading
+
+    def _segments(self) -> List[Segment]:
+        """Every segment with committed rows, oldest first"""
+        if not self.path.is_dir():
+            return []
+        segments = []
+        for directory in sorted(self.path.glob("seg-*")):
+            try:
+                segments.append(Segment(directory))
+            except (OSError, ValueError, KeyError):
+                continue  # Being created, or removed by a compaction
+        return segments
+
+    def segments(self, feature_space: Optional[str] = None) -> List[Segment]:
+        """Segments in one feature space (default: all), skipping ones a compaction has merged"""
+        segments = self._segments()
+        merged = {name for segment in segments for name in segment.meta.get("sources", [])}
+        return [s for s in segments if s.name not in merged
+                and (feature_space is None or s.feature_space == feature_space)]
+
+    def iter_batches(self, feature_space: str, batch_rows: int = 10000,
+                     min_confidence: float = 0.0) -> Iterator[Tuple[Any, List[Dict[str, Any]]]]:
+        """
+        Stream (CSR rows, row metadata) batches of one feature space. Rows are
+        sliced from the mapped segments, so memory use follows batch_rows
+        rather than the size of the store
+        """
+        import numpy as np
+
+        segments = self.segments(feature_space)
+        if not segments:
+            raise FeatureStoreError(f"No stored vectors for feature space {feature_space}")
+        for segment in segments:
+            metadata = segment.metadata()
+            for start in range(0, segment.rows, batch_rows):
+                rows = metadata[start:start + batch_rows]
+                keep = np.fromiter((row["confidence"] >= min_confidence for row in rows), dtype=bool, count=len(rows))
+                if not keep.any():
+                    continue
+                matrix = segment.matrix[start:start + len(rows)]
+                yield matrix[keep], [row for row, kept in zip(rows, keep) if kept]
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self.segments()
+        feature_spaces: Dict[str, int] = {}
+        for segment in segments:
+            feature_spaces[segment.feature_space] = feature_spaces.get(segment.feature_space, 0) + segment.rows
+        return {
+            "path": str(self.path),
+            "segments": len(segments),
+            "open_segments": sum(not s.sealed for s in segments),
+            "rows": sum(s.rows for s in segments),
+            "stored_values": sum(s.nnz for s in segments),
+            "bytes": sum(f.stat().st_size for s in segments for f in s.directory.iterdir()),
+            "rows_by_feature_space": feature_spaces,
+            "this_worker": dict(self.counters)
+        }
+
+    # Compaction
+
+    @contextmanager
+    def _compaction_lock(self, wait: bool):
+        """At most one compaction at a time across processes; yields False when busy"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / ".compact.lock", "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _recover_abandoned(self, segments: List[Segment]) -> List[Segment]:
+        """Seal open segments whose writer is gone, trimming anything past the committed counts"""
+        recovered = []
+        for segment in segments:
+            meta = segment.meta
+            if meta["sealed"] or (_process_alive(meta["pid"])
+                                  and time.time() - meta["updated"] < 2 * self.seal_interval):
+                recovered.append(segment)
+                continue
+            sizes = {"indptr": (meta["rows"] + 1) * 4, "indices": meta["nnz"] * 4, "data": meta["nnz"] * 4}
+            for name, filename, _ in ARRAYS:
+                os.truncate(segment.directory / filename, sizes[name])
+            with open(segment.directory / ROWS, "r+b") as f:
+                f.seek(sum(len(line) for _, line in zip(range(meta["rows"]), f)))
+                f.truncate()
+            _write_json(segment.directory / SEGMENT_META, {**meta, "sealed": True})
+            recovered.append(Segment(segment.directory))
+        return recovered
+
+    def compact(self, target_rows: Optional[int] = None, wait: bool = True) -> Dict[str, Any]:
+        """
+        Merge consecutive small sealed segments of the same feature space into
+        segments of up to target_rows rows. Merged segments list their sources,
+        which are deleted afterwards; readers that mapped them keep working
+        """
+        import scipy.sparse as sp
+
+        target_rows = target_rows or self.compact_rows
+        with self._compaction_lock(wait) as locked:
+            if not locked:
+                return {"compacted": False, "reason": "another compaction is running"}
+            segments = self._recover_abandoned(self.segments())
+
+            # Runs of adjacent sealed segments that can share an output segment
+            groups: List[List[Segment]] = []
+            for segment in segments:
+                if not segment.sealed or segment.rows >= target_rows:
+                    groups.append([])
+                    continue
+                group = groups[-1] if groups else None
+                if (not group or group[0].feature_space != segment.feature_space
+                        or group[0].meta["n_features"] != segment.meta["n_features"]
+                        or sum(s.rows for s in group) + segment.rows > target_rows
+                        or sum(s.nnz for s in group) + segment.nnz > MAX_SEGMENT_NNZ):
+                    group = []
+                    groups.append(group)
+                group.append(segment)
+
+            merged = removed = 0
+            for group in groups:
+                if len(group) < 2:
+                    continue
+                matrix = sp.vstack([s.matrix for s in group], format="csr")
+                # Named after the oldest source so segments stay in arrival order
+                name = f"seg-{group[0].name.split('-')[1]}-m{time.time_ns():x}"
+                tmp_dir = self.path / f".{name}.tmp"
+                tmp_dir.mkdir()
+                arrays = {"indptr": matrix.indptr, "indices": matrix.indices, "data": matrix.data}
+                for array_name, filename, dtype in ARRAYS:
+                    arrays[array_name].astype(dtype).tofile(tmp_dir / filename)
+                with open(tmp_dir / ROWS, "w", encoding="utf-8") as f:
+                    for segment in group:
+                        f.writelines(json.dumps(row) + "\n" for row in segment.metadata())
+                _write_json(tmp_dir / SEGMENT_META, {
+                    **{key: group[0].meta[key] for key in ("n_features", "feature_space")},
+                    "rows": matrix.shape[0], "nnz": int(matrix.nnz), "pid": os.getpid(),
+                    "created": group[0].meta["created"], "updated": time.time(), "sealed": True,
+                    "sources": [s.name for s in group]
+                })
+                os.replace(tmp_dir, self.path / name)
+                for segment in group:
+                    shutil.rmtree(segment.directory, ignore_errors=True)
+                merged += 1
+                removed += len(group)
+        return {"compacted": True, "segments_written": merged, "segments_merged": removed, **self.stats()}
+
+
+def train(store: FeatureStore, vectorizer_path: str, output: str, min_confidence: float = 0.0,
+          epochs: int = 3, batch_rows: int = 10000, pseudo_labels: bool = False):
+    """
+    Fit a logistic-loss linear classifier on the stored rows of the current
+    vectorizer, streaming batches through partial_fit so the store never has
+    to fit in memory.
+
+    The only labels the store has are the domains the serving model
+    predicted, so the result learns to agree with that model, mistakes
+    included: it suits moving to new training settings, not correcting the
+    model. Callers must acknowledge this with pseudo_labels=True.
+    min_confidence keeps only predictions the model was reasonably sure of
+    """
+    import joblib
+    import numpy as np
+    from sklearn.linear_model import SGDClassifier
+
+    from result_store import file_fingerprint
+
+    if not pseudo_labels:
+        raise FeatureStoreError("Stored domains are the model's own predictions; pass pseudo_labels=True to train on them")
+    if epochs < 1:
+        raise ValueError(f"epochs must be at least 1, got {epochs}")
+
+    feature_space = file_fingerprint(vectorizer_path)
+    classes = sorted({row["domain"] for segment in store.segments(feature_space)
+                      for row in segment.metadata() if row["confidence"] >= min_confidence})
+    if not classes:
+        raise FeatureStoreError(f"No stored vectors for the vectorizer at {vectorizer_path}")
+    model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=0)
+    for epoch in range(epochs):
+        rows = 0
+        for matrix, metadata in store.iter_batches(feature_space, batch_rows, min_confidence):
+            model.partial_fit(matrix, np.array([row["domain"] for row in metadata]), classes=classes)
+            rows += len(metadata)
+        print(f"📚 Epoch {epoch + 1}/{epochs}: {rows} rows")
+    joblib.dump(model, output)
+    return {"output": output, "rows": rows, "classes": len(classes), "epochs": epochs,
+            "feature_space": feature_space}
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Inspect, compact and train from the TF-IDF feature store")
+    parser.add_argument("command", choices=["stats", "compact", "train"])
+    parser.add_argument("--path", default=os.getenv("FEATURE_STORE_PATH", "cache/features"))
+    parser.add_argument("--target-rows", type=int, default=500000, help="Rows per compacted segment")
+    parser.add_argument("--vectorizer", default="public/models/tfidf_vectorizer.pkl")
+    parser.add_argument("--output", help="Where train writes the classifier")
+    parser.add_argument("--min-confidence", type=float, default=0.0, help="Skip rows predicted below this (percent)")
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--pseudo-labels", action="store_true",
+                        help="Train on the served predictions, the only labels the store has")
+    args = parser.parse_args(argv)
+
+    store = FeatureStore(args.path)
+    start_time = time.perf_counter()
+    if args.command == "compact":
+        result = store.compact(args.target_rows)
+    elif args.command == "train":
+        if not args.output:
+            parser.error("train needs --output")
+        if not args.pseudo_labels:
+            parser.error("the stored domains are the model's own predictions; pass --pseudo-labels to train on them")
+        if args.epochs < 1:
+            parser.error("--epochs must be at least 1")
+        result = train(store, args.vectorizer, args.output, args.min_confidence, args.epochs,
+                       pseudo_labels=True)
+    else:
+        result = store.stats()
+    result["seconds"] = round(time.perf_counter() - start_time, 2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
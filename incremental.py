@@ -0,0 +1,298 @@
+import hashlib
+import os
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from profiling import stage
+
+
+def paragraph_fingerprint(paragraph: str) -> bytes:
+    """128-bit content hash identifying a paragraph across revisions"""
+    return hashlib.blake2b(paragraph.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+class ParagraphState:
+    """Intermediate results for one paragraph, reused while its text is unchanged"""
+    __slots__ = ("cleaned_length", "tokens", "term_counts", "phrases")
+
+    def __init__(self, cleaned_length: int, tokens: Tuple[str, ...], term_counts: Counter, phrases: frozenset):
+        self.cleaned_length = cleaned_length
+        self.tokens = tokens
+        self.term_counts = term_counts
+        self.phrases = phrases
+
+
+class DocumentState:
+    """Latest revision of one client document plus its running aggregates"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.text_hash: Optional[bytes] = None
+        self.revision = 0
+        self.fingerprints: List[bytes] = []
+        self.paragraphs: Dict[bytes, ParagraphState] = {}
+        self.junction_keys: List[tuple] = []
+        self.junctions: Dict[tuple, ParagraphState] = {}
+        self.cleaned_chars = 0
+        self.cleaned_lines = 0
+        self.term_counts: Counter = Counter()
+        self.phrase_counts: Counter = Counter()
+        self.info: Dict[str, Any] = {}
+
+
+class IncrementalAnalyzer:
+    """
+    Re-analyzes revised resumes by recomputing only changed paragraphs.
+
+    Documents are identified by a client-supplied id. Each line of the
+    extracted text is a paragraph, fingerprinted by content; its cleaned
+    tokens, TF-IDF term counts and overused phrase matches are kept per
+    fingerprint. A new revision subtracts the paragraphs that disappeared
+    from the document-level counts and adds the new ones. Term n-grams that
+    span a line break are tracked the same way, keyed by the tokens around
+    the break, so the resulting vector and scores are identical to a full
+    recompute. Improvement rules are scanned over the whole revision: a
+    pattern can span any number of lines, so no per-line split of its
+    matches is exact, and the single scan costs well under a millisecond.
+    """
+
+    def __init__(self, resume_analyzer, plagiarism_checker, resume_improver, max_documents: int = 1000):
+        self.resume_analyzer = resume_analyzer
+        self.plagiarism_checker = plagiarism_checker
+        self.resume_improver = resume_improver
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[str, DocumentState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._supported: Optional[bool] = None
+
+    @classmethod
+    def from_env(cls, resume_analyzer, plagiarism_checker, resume_improver) -> "IncrementalAnalyzer":
+        """Build an analyzer sized by INCREMENTAL_MAX_DOCUMENTS"""
+        return cls(resume_analyzer, plagiarism_checker, resume_improver,
+                   max_documents=int(os.getenv("INCREMENTAL_MAX_DOCUMENTS", "1000")))
+
+    def _prepare(self) -> bool:
+        """Inspect the vectorizer on first use (loading the models) and cache its analysis steps"""
+        if self._supported is None:
+            vectorizer = self.resume_analyzer.vectorizer
+            supported = (
+                vectorizer is not None
+                and self.resume_analyzer.model is not None
+                and getattr(vectorizer, "analyzer", None) == "word"
+                and getattr(vectorizer, "input", "content") == "content"
+                and (hasattr(vectorizer, "idf_") or not vectorizer.use_idf)
+                and hasattr(vectorizer, "vocabulary_")
+            )
+            if supported:
+                self._preprocess = vectorizer.build_preprocessor()
+                self._tokenize = vectorizer.build_tokenizer()
+                self._stop_words = vectorizer.get_stop_words() or frozenset()
+                self._vocabulary = vectorizer.vocabulary_
+                self._min_n, self._max_n = vectorizer.ngram_range
+            else:
+                print("⚠️  Vectorizer does not support incremental updates, revisions are fully recomputed")
+            self._supported = supported
+        return self._supported
+
+    def _document(self, document_id: str) -> DocumentState:
+        """Fetch or create a document, evicting the least recently revised"""
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is None:
+                document = DocumentState()
+                self._documents[document_id] = document
+                while len(self._documents) > self.max_documents:
+                    self._documents.popitem(last=False)
+            else:
+                self._documents.move_to_end(document_id)
+            return document
+
+    def _ngram_counts(self, tokens, starts_before: int = 0) -> Counter:
+        """
+        Vocabulary column counts of the n-grams in tokens; with starts_before,
+        only n-grams starting before that index and ending after it
+        """
+        counts = Counter()
+        vocabulary = self._vocabulary
+        for n in range(self._min_n, self._max_n + 1):
+            if starts_before:
+                starts = range(max(starts_before - n + 1, 0), min(starts_before, len(tokens) - n + 1))
+            else:
+                starts = range(len(tokens) - n + 1)
+            for i in starts:
+                column = vocabulary.get(" ".join(tokens[i:i + n]))
+                if column is not None:
+                    counts[column] += 1
+        return counts
+
+    def _analyze_paragraph(self, paragraph: str) -> ParagraphState:
+        """Compute everything a paragraph contributes on its own"""
+        # clean_text maps each line independently (its patterns never cross
+        # whitespace), so the cleaned document is the non-empty lines joined
+        cleaned = self.resume_analyzer.clean_text(paragraph)
+        if self._prepare():
+            tokens = tuple(t for t in self._tokenize(self._preprocess(cleaned)) if t not in self._stop_words)
+            term_counts = self._ngram_counts(tokens)
+        else:
+            tokens, term_counts = (), Counter()
+        return ParagraphState(
+            cleaned_length=len(cleaned),
+            tokens=tokens,
+            term_counts=term_counts,
+            # Overused phrases contain no line breaks, so they match within a line
+            phrases=frozenset(self.plagiarism_checker.find_phrases(paragraph))
+        )
+
+    def _analyze_junction(self, key: tuple) -> ParagraphState:
+        """Compute the n-grams that span a line break"""
+        before, after = key
+        return ParagraphState(0, (), self._ngram_counts(before + after, len(before)), frozenset())
+
+    def _junction_keys(self, document: DocumentState) -> List[tuple]:
+        """
+        Keys of every line break an n-gram could span: the last tokens before
+        and the first after it (token-less lines are skipped)
+        """
+        keys = []
+        carry: Tuple[str, ...] = ()
+        if self._max_n < 2:
+            return keys
+        for fingerprint in document.fingerprints:
+            state = document.paragraphs[fingerprint]
+            if state.tokens:
+                if carry:
+                    keys.append((carry, state.tokens[:self._max_n - 1]))
+                carry = (carry + state.tokens)[-(self._max_n - 1):]
+        return keys
+
+    def _apply(self, document: DocumentState, state: ParagraphState, sign: int):
+        """Add (sign=1) or remove (sign=-1) one occurrence of a paragraph or junction"""
+        if state.cleaned_length:
+            document.cleaned_chars += sign * state.cleaned_length
+            document.cleaned_lines += sign
+        for counter, items in ((document.term_counts, state.term_counts.items()),
+                               (document.phrase_counts, ((p, 1) for p in state.phrases))):
+            for key, count in items:
+                counter[key] += sign * count
+                if not counter[key]:
+                    del counter[key]
+
+    def _update(self, document: DocumentState, states: Dict[Any, ParagraphState],
+                old_keys: List[Any], new_keys: List[Any]):
+        """Apply the multiset difference between two revisions' keys to the aggregates"""
+        old = Counter(old_keys)
+        new = Counter(new_keys)
+        for key in old.keys() | new.keys():
+            delta = new[key] - old[key]
+            for _ in range(abs(delta)):
+                self._apply(document, states[key], 1 if delta > 0 else -1)
+            if not new[key]:
+                del states[key]
+
+    def _revise(self, document_id: str, document: DocumentState, text: str):
+        """Bring a document's state up to date with text; a no-op for the same text"""
+        text_hash = paragraph_fingerprint(text)
+        if document.text_hash == text_hash:
+            return
+
+        with stage("incremental_update"):
+            lines = text.split("\n")
+            fingerprints = [paragraph_fingerprint(line) for line in lines]
+
+            recomputed = 0
+            for fingerprint, line in zip(fingerprints, lines):
+                if fingerprint not in document.paragraphs:
+                    document.paragraphs[fingerprint] = self._analyze_paragraph(line)
+                    recomputed += 1
+            old_fingerprints, document.fingerprints = document.fingerprints, fingerprints
+
+            junction_keys = self._junction_keys(document)
+            for key in junction_keys:
+                if key not in document.junctions:
+                    document.junctions[key] = self._analyze_junction(key)
+
+            self._update(document, document.paragraphs, old_fingerprints, fingerprints)
+            self._update(document, document.junctions, document.junction_keys, junction_keys)
+            document.junction_keys = junction_keys
+
+            document.text_hash = text_hash
+            document.revision += 1
+            document.info = {
+                "document_id": document_id,
+                "revision": document.revision,
+                "paragraphs_total": len(lines),
+                "paragraphs_recomputed": recomputed,
+                "paragraphs_reused": len(lines) - recomputed
+            }
+
+    def classify(self, document_id: str, text: str, filename: str = "") -> Dict[str, Any]:
+        """Incremental equivalent of ResumeAnalyzer.predict_domain_from_text"""
+        if not self._prepare():
+            return self.resume_analyzer.predict_domain_from_text(text, filename)
+
+        document = self._document(document_id)
+        with document.lock:
+            self._revise(document_id, document, text)
+            if not document.cleaned_lines:
+                return {"error": "No valid text found after processing"}
+            # Non-empty cleaned lines are joined by single spaces
+            processed_text_length = document.cleaned_chars + document.cleaned_lines - 1
+            term_counts = dict(document.term_counts)
+
+        try:
+            with stage("vectorize"):
+                text_vector = self._tfidf_vector(term_counts)
+            return self.resume_analyzer.predict_from_vector(text, text_vector, processed_text_length)
+        except Exception as e:
+            print(f"Error during prediction: {e}")
+            return {"error": f"Prediction failed: {str(e)}"}
+
+    def _tfidf_vector(self, term_counts: Dict[int, int]):
+        """Turn column counts into the same weighted row the vectorizer would produce"""
+        import numpy as np
+        from scipy.sparse import csr_matrix
+        from sklearn.preprocessing import normalize
+
+        vectorizer = self.resume_analyzer.vectorizer
+        columns = sorted(term_counts)
+        values = [1 if vectorizer.binary else term_counts[c] for c in columns]
+        counts = csr_matrix(
+            (np.asarray(values, dtype=vectorizer.dtype), np.asarray(columns, dtype=np.int32),
+             np.asarray([0, len(columns)], dtype=np.int32)),
+            shape=(1, len(self._vocabulary))
+        )
+        # TfidfVectorizer's weighting through its public attributes: sublinear tf, idf_, row norm
+        if vectorizer.sublinear_tf:
+            counts.data = 1 + np.log(counts.data)
+        if vectorizer.use_idf:
+            counts.data *= vectorizer.idf_[counts.indices]
+        return normalize(counts, norm=vectorizer.norm, copy=False) if vectorizer.norm else counts
+
+    def check_plagiarism(self, document_id: str, text: str) -> Dict[str, Any]:
+        """Incremental equivalent of PlagiarismChecker.check_plagiarism"""
+        if not text:
+            return {"error": "No text provided"}
+
+        document = self._document(document_id)
+        with document.lock:
+            self._revise(document_id, document, text)
+            phrases = set(document.phrase_counts)
+        # Boilerplate spans run across lines; the filter check is cheap enough to redo
+        return self.plagiarism_checker.build_result(phrases, self.plagiarism_checker.check_boilerplate(text))
+
+    def analyze_resume(self, document_id: str, text: str, domain: str = "General") -> Dict[str, Any]:
+        """Incremental equivalent of ResumeImprover.analyze_resume"""
+        if not text:
+            return {"error": "No text provided"}
+
+        document = self._document(document_id)
+        with document.lock:
+            self._revise(document_id, document, text)
+        return self.resume_improver.build_result(self.resume_improver.detect_signals(text), domain)
+
+    def revision_info(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Paragraph reuse statistics of the document's latest revision"""
+        with self._lock:
+            document = self._documents.get(document_id)
+        return dict(document.info) if document is not None and document.info else None
@@ -0,0 +1,407 @@
+"""
+Rank job postings against resumes by TF-IDF cosine similarity.
+
+Postings are vectorized with the classifier's TfidfVectorizer, L2-normalized
+and stored as CSR matrices on disk, so scoring a batch of resumes is one
+sparse matrix product per segment followed by an argpartition top-k.
+
+Usage:
+    python job_matcher.py build postings.jsonl            # (re)build the index
+    python job_matcher.py add new_postings.csv            # append a segment
+    python job_matcher.py compact                         # merge segments
+    python job_matcher.py search resume.txt --top-k 10
+
+Postings files are JSONL or CSV with at least `id` and `description`;
+every other field (title, company, location, url, ...) is returned with
+the match.
+"""
+import argparse
+import csv
+import fcntl
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+from result_store import file_fingerprint
+
+MANIFEST = "manifest.json"
+ARRAYS = ("data", "indices", "indptr")
+
+
+class JobIndexError(RuntimeError):
+    """The index is missing, or was built with a different vectorizer"""
+
+
+class Segment:
+    """One immutable block of postings: a memory-mapped CSR matrix plus metadata"""
+
+    def __init__(self, directory: Path, vocabulary_size: int):
+        import numpy as np
+        from scipy.sparse import csr_matrix
+
+        self.name = directory.name
+        # Raw .npy files (unlike .npz archives) can be memory-mapped, so
+        # every worker process shares one page-cache copy of the matrix
+        data, indices, indptr = (np.load(directory / f"{name}.npy", mmap_mode="r") for name in ARRAYS)
+        self.matrix = csr_matrix((data, indices, indptr), shape=(len(indptr) - 1, vocabulary_size), copy=False)
+        with open(directory / "postings.jsonl", encoding="utf-8") as f:
+            self.postings = [json.loads(line) for line in f]
+        self.live = np.ones(len(self.postings), dtype=bool)
+        self.all_live = True
+
+
+class JobIndex:
+    """
+    Segmented on-disk index of job postings.
+
+    The index directory holds manifest.json and one subdirectory per
+    segment. Adding postings writes a new segment and atomically swaps the
+    manifest, so nothing already indexed is re-vectorized; a posting whose
+    id is indexed again supersedes the older row, which is masked at query
+    time until compact() rewrites the live rows into a single segment.
+    Readers notice a changed manifest on their next query and map only the
+    new segments. Segments a manifest no longer lists are deleted only after
+    retire_seconds, so a reader that read the old manifest can still map them.
+    """
+
+    def __init__(self, path: str, analyzer, vectorizer_path: str = "public/models/tfidf_vectorizer.pkl",
+                 max_segments: int = 16, retire_seconds: float = 300.0):
+        self.path = Path(path)
+        self.analyzer = analyzer
+        self.vectorizer_path = vectorizer_path
+        self.max_segments = max_segments
+        self.retire_seconds = retire_seconds
+        self.segments: List[Segment] = []
+        self.generation = None
+        self._manifest_stat = None
+        self._vectorizer_version = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, analyzer) -> "JobIndex":
+        return cls(os.getenv("JOB_INDEX_PATH", "public/models/job_index"), analyzer,
+                   max_segments=int(os.getenv("JOB_INDEX_MAX_SEGMENTS", "16")),
+                   retire_seconds=float(os.getenv("JOB_INDEX_RETIRE_SECONDS", "300")))
+
+    @property
+    def vectorizer(self):
+        vectorizer = self.analyzer.vectorizer
+        if vectorizer is None:
+            raise JobIndexError("Job matching needs the TF-IDF vectorizer")
+        return vectorizer
+
+    @property
+    def vectorizer_version(self) -> str:
+        if self._vectorizer_version is None:
+            self._vectorizer_version = file_fingerprint(self.vectorizer_path)
+        return self._vectorizer_version
+
+    def vectorize(self, texts: Sequence[str], chunk_size: int = 2000):
+        """Cleaned, TF-IDF weighted and L2-normalized float32 rows"""
+        import scipy.sparse as sp
+        from sklearn.preprocessing import normalize
+
+        chunks = []
+        for start in range(0, len(texts), chunk_size):
+            cleaned = [self.analyzer.clean_text(text) for text in texts[start:start + chunk_size]]
+            chunks.append(self.vectorizer.transform(cleaned).astype("float32"))
+        matrix = sp.vstack(chunks, format="csr") if len(chunks) > 1 else chunks[0].tocsr()
+        matrix = normalize(matrix, norm="l2", copy=False)
+        matrix.sort_indices()
+        return matrix
+
+    # Reading
+
+    def _read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path / MANIFEST, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Pick up segments written since the last query (one stat call when unchanged)"""
+        try:
+            stat = os.stat(self.path / MANIFEST)
+            stat_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        except FileNotFoundError:
+            stat_key = None
+        if stat_key == self._manifest_stat:
+            return
+
+        with self._lock:
+            if stat_key == self._manifest_stat:
+                return
+            try:
+                self._load(self._read_manifest())
+            except FileNotFoundError:
+                # A slow reader can outlive the retirement grace period of a
+                # segment; the current manifest no longer lists it
+                self._load(self._read_manifest())
+            self._manifest_stat = stat_key
+
+    def _load(self, manifest: Optional[Dict[str, Any]]):
+        if manifest is None:
+            self.segments, self.generation = [], None
+            return
+        if manifest["vectorizer"] != self.vectorizer_version:
+            raise JobIndexError("Job index was built with a different vectorizer; rebuild it")
+        loaded = {segment.name: segment for segment in self.segments}
+        self.segments = [
+            loaded.get(name) or Segment(self.path / name, manifest["vocabulary_size"])
+            for name in manifest["segments"]
+        ]
+        self._mask_superseded()
+        self.generation = manifest["generation"]
+
+    def _mask_superseded(self):
+        """Only the newest row for each posting id is live"""
+        import numpy as np
+
+        seen = set()
+        for segment in reversed(self.segments):
+            live = np.ones(len(segment.postings), dtype=bool)
+            for row in range(len(segment.postings) - 1, -1, -1):
+                posting_id = segment.postings[row]["id"]
+                live[row] = posting_id not in seen
+                seen.add(posting_id)
+            # Replaced rather than updated in place so searches in flight see a consistent mask
+            segment.live = live
+            segment.all_live = bool(live.all())
+
+    def stats(self) -> Dict[str, Any]:
+        self.refresh()
+        return {
+            "path": str(self.path),
+            "generation": self.generation,
+            "segments": [{"name": s.name, "rows": len(s.postings), "live": int(s.live.sum()),
+                          "nnz": int(s.matrix.nnz)} for s in self.segments],
+            "postings": sum(int(s.live.sum()) for s in self.segments)
+        }
+
+    def search(self, texts: Sequence[str], top_k: int = 10) -> List[List[Dict[str, Any]]]:
+        """Top-k postings by cosine similarity for each resume text"""
+        self.refresh()
+        segments = self.segments
+        if not segments:
+            raise JobIndexError("Job index is empty or has not been built")
+        queries = self.vectorize(texts)
+        results = []
+        # Bound the dense score block (rows x queries) to about 64 MB
+        largest = max(segment.matrix.shape[0] for segment in segments)
+        step = max(1, (1 << 24) // max(largest, 1))
+        for start in range(0, queries.shape[0], step):
+            results.extend(self._search_block(segments, queries[start:start + step], top_k))
+        return results
+
+    def _search_block(self, segments: List[Segment], queries, top_k: int):
+        import numpy as np
+
+        # Queries are few, so they are densified: sparse x dense is several
+        # times faster than a sparse x sparse product and yields dense scores
+        query_columns = np.ascontiguousarray(queries.T.toarray())
+        candidate_scores, candidate_rows, candidate_segments = [], [], []
+        for segment_number, segment in enumerate(segments):
+            rows = segment.matrix.shape[0]
+            if rows == 0:
+                continue
+            # One row of scores per query keeps the top-k selection contiguous
+            scores = np.ascontiguousarray((segment.matrix @ query_columns).T)
+            if not segment.all_live:
+                scores[:, ~segment.live] = -1.0
+            k = min(top_k, rows)
+            if k < rows:
+                best = np.argpartition(scores, rows - k, axis=1)[:, rows - k:]
+            else:
+                best = np.broadcast_to(np.arange(rows), scores.shape)
+            candidate_scores.append(np.take_along_axis(scores, best, axis=1))
+            candidate_rows.append(best)
+            candidate_segments.append(np.full(k, segment_number))
+
+        # Each segment contributed at most top_k candidates per query; merge them
+        scores = np.concatenate(candidate_scores, axis=1)
+        rows = np.concatenate(candidate_rows, axis=1)
+        segment_numbers = np.concatenate(candidate_segments)
+        block = []
+        for query in range(scores.shape[0]):
+            row_scores = scores[query]
+            matches = []
+            for position in np.argsort(-row_scores, kind="stable")[:top_k]:
+                score = float(row_scores[position])
+                if score <= 0:
+                    break
+                posting = segments[segment_numbers[position]].postings[rows[query, position]]
+                matches.append({**posting, "score": round(score, 4)})
+            block.append(matches)
+        return block
+
+    # Writing
+
+    @contextmanager
+    def _writer(self):
+        """Serialize writers across processes"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write_segment(self, matrix, postings: List[Dict[str, Any]]) -> str:
+        import numpy as np
+
+        name = f"seg-{time.time_ns():x}"
+        tmp_dir = self.path / f".{name}.tmp"
+        tmp_dir.mkdir()
+        for array_name in ARRAYS:
+            np.save(tmp_dir / f"{array_name}.npy", np.ascontiguousarray(getattr(matrix, array_name)))
+        with open(tmp_dir / "postings.jsonl", "w", encoding="utf-8") as f:
+            for posting in postings:
+                f.write(json.dumps(posting, ensure_ascii=False) + "\n")
+        os.replace(tmp_dir, self.path / name)
+        return name
+
+    def _write_manifest(self, segment_names: List[str], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        now = time.time()
+        # When each dropped segment left the manifest, for _remove_unreferenced
+        retired = dict(previous.get("retired", {})) if previous else {}
+        for name in (previous["segments"] if previous else []):
+            retired.setdefault(name, now)
+        manifest = {
+            "generation": (previous["generation"] + 1) if previous else 1,
+            "vectorizer": self.vectorizer_version,
+            "vocabulary_size": len(self.vectorizer.vocabulary_),
+            "segments": segment_names,
+            "retired": {name: at for name, at in retired.items()
+                        if name not in segment_names and now - at <= self.retire_seconds}
+        }
+        tmp_path = self.path / (MANIFEST + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path / MANIFEST)
+        return manifest
+
+    def _remove_unreferenced(self, manifest: Dict[str, Any]):
+        """
+        Delete segments retired for longer than retire_seconds (processes that
+        mapped them keep working). Directories the manifest does not know
+        about, e.g. left by a crashed writer, age from their mtime
+        """
+        now = time.time()
+        keep = set(manifest["segments"])
+        retired = manifest.get("retired", {})
+        for entry in self.path.iterdir():
+            if not entry.is_dir() or entry.name in keep:
+                continue
+            try:
+                since = retired.get(entry.name, entry.stat().st_mtime)
+            except FileNotFoundError:
+                continue
+            if now - since > self.retire_seconds:
+                shutil.rmtree(entry, ignore_errors=True)
+
+    @staticmethod
+    def _split(postings: Iterable[Dict[str, Any]]):
+        descriptions, metadata = [], []
+        for posting in postings:
+            posting = dict(posting)
+            descriptions.append(posting.pop("description", "") or "")
+            posting["id"] = str(posting["id"])
+            metadata.append(posting)
+        return descriptions, metadata
+
+    def add(self, postings: Iterable[Dict[str, Any]], replace: bool = False) -> Dict[str, Any]:
+        """Index postings as a new segment (or as the whole index with replace=True)"""
+        descriptions, metadata = self._split(postings)
+        with self._writer():
+            previous = self._read_manifest()
+            if previous and previous["vectorizer"] != self.vectorizer_version and not replace:
+                raise JobIndexError("Job index was built with a different vectorizer; rebuild it")
+            names = [] if replace or not previous else list(previous["segments"])
+            if metadata:
+                names.append(self._write_segment(self.vectorize(descriptions), metadata))
+            self._remove_unreferenced(self._write_manifest(names, previous))
+            compact = len(names) > self.max_segments
+        if compact:
+            self.compact()
+        return self.stats()
+
+    def compact(self) -> Dict[str, Any]:
+        """Rewrite all live rows into one segment, dropping superseded postings"""
+        import scipy.sparse as sp
+
+        with self._writer():
+            self._manifest_stat = None
+            self.refresh()
+            previous = self._read_manifest()
+            if previous is None or (len(self.segments) <= 1 and all(s.all_live for s in self.segments)):
+                return self.stats()
+            matrices = [segment.matrix[segment.live] for segment in self.segments]
+            postings = [posting for segment in self.segments
+                        for posting, live in zip(segment.postings, segment.live) if live]
+            matrix = sp.vstack(matrices, format="csr")
+            names = [self._write_segment(matrix, postings)]
+            self._remove_unreferenced(self._write_manifest(names, previous))
+        return self.stats()
+
+
+def read_postings(path: str) -> List[Dict[str, Any]]:
+    """Load postings from a JSONL or CSV file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            csv.field_size_limit(sys.maxsize)
+            postings = list(csv.DictReader(f))
+        else:
+            postings = [json.loads(line) for line in f if line.strip()]
+    missing = [i for i, posting in enumerate(postings) if not posting.get("id")]
+    if missing:
+        raise ValueError(f"{len(missing)} postings have no id (first at row {missing[0] + 1})")
+    return postings
+
+
+def main(argv: Optional[Iterable[str]] = None):
+    parser = argparse.ArgumentParser(description="Build, update and query the job posting index")
+    parser.add_argument("command", choices=["build", "add", "compact", "search", "stats"])
+    parser.add_argument("source", nargs="?", help="Postings file (build/add) or resume file (search)")
+    parser.add_argument("--index", default=os.getenv("JOB_INDEX_PATH", "public/models/job_index"))
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--vectorizer", default="public/models/tfidf_vectorizer.pkl")
+    args = parser.parse_args(argv)
+
+    from models import ResumeAnalyzer
+    analyzer = ResumeAnalyzer(vectorizer_path=args.vectorizer)
+    index = JobIndex(args.index, analyzer, vectorizer_path=args.vectorizer)
+
+    start_time = time.perf_counter()
+    if args.command in ("build", "add"):
+        if not args.source:
+            parser.error(f"{args.command} needs a postings file")
+        postings = read_postings(args.source)
+        result = index.add(postings, replace=args.command == "build")
+        print(f"✅ Indexed {len(postings)} postings in {time.perf_counter() - start_time:.1f}s")
+    elif args.command == "compact":
+        result = index.compact()
+    elif args.command == "search":
+        if not args.source:
+            parser.error("search needs a resume file")
+        file_content = Path(args.source).read_bytes()
+        extraction = analyzer.extract_text(file_content, os.path.basename(args.source))
+        if "error" in extraction:
+            raise SystemExit(f"❌ {extraction['error']}")
+        result = index.search([extraction["text"]], args.top_k)[0]
+    else:
+        result = index.stats()
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
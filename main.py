@@ -1,10 +1,15 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Query, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
+from starlette.exceptions import HTTPException as StarletteHTTPException
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
+import os
 import time
 import asyncio
+import itertools
+import threading
 from pathlib import Path
 
 # Import our custom modules
@@ -13,6 +18,18 @@ from utils import (
     FileHandler, TextProcessor, ResponseFormatter, 
     CompanyMatcher, Logger, clean_filename
 )
+from profiling import memory_profiler, stage, request_profiler, RequestProfilerMiddleware
+from result_store import ResultStore, content_hash, fingerprint
+from extractors import EXTRACTOR_VERSION
+from incremental import IncrementalAnalyzer
+from admission import AdmissionControl, AdmissionMiddleware, ItemRejected, admit_item
+from singleflight import SingleFlight
+from engines import engine_from_env
+from feature_store import FeatureStore
+from monitoring import PredictionMonitor
+from job_matcher import JobIndex, JobIndexError
+import deadlines
+from deadlines import DeadlinePolicy, DeadlineMiddleware
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -21,6 +38,25 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Sampled cProfile capture plus background replays of slow requests
+# (SLOW_PROFILE_*). Added first, i.e. innermost, so replays are admitted on
+# the heavy lane of the request they repeat
+app.add_middleware(RequestProfilerMiddleware, profiler=request_profiler)
+
+# Admission control: separate heavy (upload) and light lanes, per-client
+# token buckets and queue deadlines (ADMISSION_ENABLED=0 disables it).
+# Added before CORS so shed responses still carry CORS headers
+admission_control = AdmissionControl.from_env()
+if admission_control:
+    app.add_middleware(AdmissionMiddleware, control=admission_control)
+
+# Per-request deadlines (X-Request-Timeout header or REQUEST_TIMEOUT_*
+# defaults): stages stop at the deadline or when the client disconnects.
+# Outside admission so time spent queued counts against the deadline
+deadline_policy = DeadlinePolicy.from_env()
+if deadline_policy:
+    app.add_middleware(DeadlineMiddleware, policy=deadline_policy)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -30,19 +66,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request memory accounting (MEMORY_PROFILE=1)
+if memory_profiler.enabled:
+    @app.middleware("http")
+    async def profile_request_memory(request: Request, call_next):
+        with memory_profiler.request():
+            return await call_next(request)
+
 # Initialize analyzers
-resume_analyzer = ResumeAnalyzer()
-plagiarism_checker = PlagiarismChecker()
+# PDF_WORKERS shards PDF pages across a process pool with per-page timeouts; request
+# threads cannot arm SIGALRM, so PDF_WORKERS=0 leaves pages without a hard limit
+# CLASSIFIER_ENGINE picks the domain classifier backend (tfidf or embedding)
+# With FEATURE_STORE_PATH set, every classified TF-IDF vector is appended to the feature store for retraining
+feature_store = FeatureStore.from_env()
+# Sliding-window drift and quality sketches of predictions (PREDICTION_MONITOR=0 disables)
+prediction_monitor = PredictionMonitor.from_env()
+resume_analyzer = ResumeAnalyzer(
+    pdf_workers=int(os.getenv("PDF_WORKERS", "2")),
+    pdf_page_timeout=float(os.getenv("PDF_PAGE_TIMEOUT", "5")),
+    pdf_document_timeout=float(os.getenv("PDF_DOCUMENT_TIMEOUT", "20")),
+    engine=engine_from_env("public/models/domain_classifier.pkl", "public/models/tfidf_vectorizer.pkl"),
+    feature_store=feature_store,
+    monitor=prediction_monitor
+)
+# Boilerplate n-gram filter shared by all workers via mmap; build with `python boilerplate.py build`
+plagiarism_checker = PlagiarismChecker(
+    boilerplate_path=os.getenv("BOILERPLATE_INDEX_PATH", "public/models/boilerplate.bloom")
+)
 resume_improver = ResumeImprover()
 company_matcher = CompanyMatcher()
+# Open job postings ranked against resumes; build with `python job_matcher.py build`
+job_index = JobIndex.from_env(resume_analyzer)
+
+# Revisions sent with an X-Document-Id header only recompute changed paragraphs
+incremental_analyzer = IncrementalAnalyzer.from_env(resume_analyzer, plagiarism_checker, resume_improver)
+
+# Persistent results keyed by upload hash + analyzer version (RESULT_STORE_PATH="" disables)
+result_store = ResultStore.from_env()
+# The classification version is read per request (see analyzer_version)
+ANALYZER_VERSIONS = {
+    "extraction": fingerprint(EXTRACTOR_VERSION),
+    "improvement": resume_improver.version,
+    "plagiarism": plagiarism_checker.version,
+    "text_fields": fingerprint(TextProcessor.VERSION)
+}
+
+# Batch uploads: files analyzed concurrently per request, and the largest batch accepted
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+
+# Identical uploads arriving together share one extraction and one run of
+# each analyzer instead of repeating the work per request
+single_flight = SingleFlight()
 
 # Pydantic models for request/response
 class AnalysisResponse(BaseModel):
     domain: str
     confidence: float
     skills: List[str]
-    contact_info: Optional[Dict[str, str]] = None
+    contact_info: Optional[Dict[str, Optional[str]]] = None
     readability: Optional[Dict[str, Any]] = None
+    extraction: Optional[Dict[str, Any]] = None
+    revision: Optional[Dict[str, Any]] = None
     processing_time: Optional[float] = None
 
 class ImprovementResponse(BaseModel):
@@ -55,12 +140,193 @@ class PlagiarismResponse(BaseModel):
     matches: List[Dict[str, Any]]
     total_matches: int
     recommendations: List[str]
+    boilerplate: Optional[Dict[str, Any]] = None
 
 class CompanyResponse(BaseModel):
     companies: List[Dict[str, Any]]
     total_count: int
     domain: str
 
+class JobMatchResponse(BaseModel):
+    matches: List[Dict[str, Any]]
+    total_postings: int
+    index_generation: Optional[int] = None
+    processing_time: float
+
+class FullReportResponse(BaseModel):
+    filename: str
+    classification: Dict[str, Any]
+    improvement: Dict[str, Any]
+    plagiarism: Dict[str, Any]
+    contact_info: Dict[str, Optional[str]]
+    education: List[Dict[str, str]]
+    experience_years: Optional[int] = None
+    readability: Dict[str, Any]
+    companies: List[Dict[str, Any]]
+    extraction: Dict[str, Any]
+    stage_timings: Dict[str, float]
+    cached_stages: List[str] = []
+    coalesced_stages: List[str] = []
+    revision: Optional[Dict[str, Any]] = None
+    processing_time: float
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read and validate an uploaded file, raising 400 on invalid input"""
+    memory_profiler.set_file_type(file.filename.lower().split('.')[-1])
+    with stage("upload_read"):
+        file_content = await file.read()
+    request_profiler.annotate(file_type=file.filename.lower().split('.')[-1], file_size=len(file_content))
+    validation_result = FileHandler.validate_file(file.filename, file_content)
+    
+    if not validation_result["valid"]:
+        raise HTTPException(status_code=400, detail=validation_result["error"])
+    
+    return file_content
+
+async def extract_upload_text(file_content: bytes, filename: str) -> Dict[str, Any]:
+    """
+    Extract text from an upload off the event loop, raising 422 on failure.
+    Returns the text plus extraction metadata such as skipped PDF pages.
+    """
+    extraction = await asyncio.to_thread(resume_analyzer.extract_text, file_content, filename)
+    if "pages_total" in extraction:
+        request_profiler.annotate(pages=extraction["pages_total"], pages_skipped=len(extraction["pages_skipped"]))
+    
+    if "error" in extraction:
+        raise HTTPException(status_code=422, detail=extraction["error"])
+    
+    return extraction
+
+def run_stage(stage_name: str, func, *args):
+    """Run func as a named pipeline stage"""
+    with stage(stage_name):
+        return func(*args)
+
+async def timed(timings: Dict[str, float], stage_name: str, func, *args):
+    """Run a blocking analyzer in a worker thread and record its duration"""
+    start_time = time.time()
+    try:
+        return await asyncio.to_thread(run_stage, stage_name, func, *args)
+    finally:
+        timings[stage_name] = round(time.time() - start_time, 4)
+
+def analyzer_version(analyzer: str) -> str:
+    """Version stored results of an analyzer are keyed on"""
+    if analyzer == "classification":
+        # Changes when the engine falls back to another one on load
+        return resume_analyzer.model_version
+    return ANALYZER_VERSIONS[analyzer]
+
+class UploadAnalysis:
+    """
+    Analyses of one upload, computed lazily: text is extracted at most once
+    and only if some analyzer result is missing from the result store.
+    Concurrent requests for the same upload join each other's in-flight
+    extraction, and its analyzer runs when they also share the filename and
+    document id (analyzers may read both, e.g. incremental revisions).
+    """
+    
+    def __init__(self, file_content: bytes, filename: str, timings: Optional[Dict[str, float]] = None,
+                 document_id: Optional[str] = None):
+        self.file_content = file_content
+        self.filename = filename
+        self.document_id = document_id
+        self.timings = timings if timings is not None else {}
+        self.file_hash = content_hash(file_content)
+        self.extension = filename.lower().split('.')[-1]
+        self.cached_stages: List[str] = []
+        self.coalesced_stages: List[str] = []
+        self._stored: Dict[str, Any] = {}
+        self._looked_up = set()
+        self._new_results: Dict[str, Any] = {}
+        self._extraction_task = None
+        # A profiler replay of a slow request must redo the work, not reuse it
+        self.bypass = request_profiler.replaying()
+    
+    def _key(self, analyzer: str, *params) -> str:
+        return ResultStore.make_key(self.file_hash, analyzer, analyzer_version(analyzer), *params)
+    
+    async def prefetch(self, *requests):
+        """Look up several (analyzer, *params) results in a single store query"""
+        if not result_store or self.bypass:
+            return
+        keys = [self._key(*request) for request in requests]
+        # SQLite may wait on a busy writer; keep that off the event loop
+        self._stored.update(await asyncio.to_thread(result_store.get_many, keys))
+        self._looked_up.update(keys)
+    
+    async def _lookup(self, key: str):
+        if result_store and not self.bypass and key not in self._looked_up:
+            self._stored.update(await asyncio.to_thread(result_store.get_many, [key]))
+            self._looked_up.add(key)
+        return self._stored.get(key)
+    
+    async def _extract(self) -> Dict[str, Any]:
+        start_time = time.time()
+        extraction = await extract_upload_text(self.file_content, self.filename)
+        self.timings["extraction"] = round(time.time() - start_time, 4)
+        return extraction
+    
+    async def text(self) -> str:
+        """Extracted text, shared by every analyzer of this upload"""
+        if self._extraction_task is None:
+            self._extraction_task = asyncio.ensure_future(
+                self._coalesce(("extraction", self.extension, self.file_hash), self._extract)
+            )
+        extraction, _ = await self._extraction_task
+        return extraction["text"]
+    
+    def _extraction_result(self) -> Dict[str, Any]:
+        return self._extraction_task.result()[0]
+    
+    async def extraction(self) -> Dict[str, Any]:
+        """Extraction metadata (page counts, skipped pages) without the text"""
+        key = self._key("extraction")
+        stored = await self._lookup(key)
+        if stored is not None:
+            return stored
+        await self.text()
+        metadata = {k: v for k, v in self._extraction_result().items() if k != "text"}
+        self._new_results[key] = metadata
+        return metadata
+    
+    async def run(self, analyzer: str, compute, *params):
+        """Return a stored result or compute it from the text in a worker thread"""
+        key = self._key(analyzer, *params)
+        stored = await self._lookup(key)
+        if stored is not None:
+            self.cached_stages.append(analyzer)
+            return stored
+        
+        result, shared = await self._coalesce(
+            (self.extension, self.filename, self.document_id, key), self._compute, analyzer, compute
+        )
+        if shared:
+            # The request that did the work also stores the result
+            self.coalesced_stages.append(analyzer)
+        elif "error" not in result:
+            # Keyed again: loading the engine may have changed its version
+            self._new_results[self._key(analyzer, *params)] = result
+        return result
+    
+    async def _coalesce(self, key, func, *args):
+        """Join identical in-flight work, except when replaying under the profiler"""
+        if self.bypass:
+            return await func(*args), False
+        return await single_flight.do(key, func, *args)
+    
+    async def _compute(self, analyzer: str, compute):
+        text = await self.text()
+        return await timed(self.timings, analyzer, compute, text)
+    
+    async def save(self):
+        """Persist newly computed results; partial extractions are never stored"""
+        if not result_store or self.bypass or not self._new_results:
+            return
+        if self._extraction_task is not None and self._extraction_result().get("pages_skipped"):
+            return
+        await asyncio.to_thread(result_store.put_many, self._new_results)
+
 # Health check endpoint
 @app.get("/")
 async def root():
@@ -72,7 +338,10 @@ async def root():
             "analyze": "/api/analyze-resume",
             "improve": "/api/improve-resume", 
             "plagiarism": "/api/check-plagiarism",
-            "companies": "/api/companies/{domain}"
+            "full_report": "/api/full-report",
+            "batch_analyze": "/api/batch/analyze",
+            "companies": "/api/companies/{domain}",
+            "job_match": "/api/jobs/match"
         }
     }
 
@@ -83,14 +352,50 @@ async def health_check():
         "status": "healthy",
         "timestamp": time.time(),
         "models_loaded": {
-            "resume_analyzer": resume_analyzer.model is not None,
+            "resume_analyzer": resume_analyzer.models_ready,
             "plagiarism_checker": True,
             "resume_improver": True
-        }
+        },
+        "classifier_engine": resume_analyzer.engine.name
+    }
+
+async def analyze_content(file_content: bytes, filename: str,
+                          document_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Classify a validated upload and extract its contact and readability
+    fields, raising 422 when no text or prediction can be produced
+    """
+    # Stored results skip parsing entirely; otherwise text is extracted once
+    analysis = UploadAnalysis(file_content, filename, document_id=document_id)
+    await analysis.prefetch(("extraction",), ("classification",), ("text_fields",))
+    
+    # Analyze resume
+    analysis_result = await analysis.run(
+        "classification",
+        lambda text: classify_text(text, filename, document_id)
+    )
+    
+    if "error" in analysis_result:
+        raise HTTPException(status_code=422, detail=analysis_result["error"])
+    
+    # Extract additional information
+    fields = await analysis.run("text_fields", extract_text_fields)
+    extraction = await analysis.extraction()
+    await analysis.save()
+    
+    return {
+        "domain": analysis_result["domain"],
+        "confidence": analysis_result["confidence"],
+        "skills": analysis_result["skills"],
+        "contact_info": fields["contact_info"],
+        "readability": fields["readability"],
+        "extraction": extraction,
+        "revision": incremental_analyzer.revision_info(document_id) if document_id else None
     }
 
 @app.post("/api/analyze-resume", response_model=AnalysisResponse)
-async def analyze_resume(file: UploadFile = File(...)):
+async def analyze_resume(file: UploadFile = File(...),
+                         x_document_id: Optional[str] = Header(None)):
     """
     Analyze uploaded resume and classify domain with skills extraction
     """
@@ -98,11 +403,7 @@ async def analyze_resume(file: UploadFile = File(...)):
     
     try:
         # Validate file
-        file_content = await file.read()
-        validation_result = FileHandler.validate_file(file.filename, file_content)
-        
-        if not validation_result["valid"]:
-            raise HTTPException(status_code=400, detail=validation_result["error"])
+        file_content = await read_upload(file)
         
         Logger.log_analysis(
             filename=file.filename,
@@ -111,22 +412,7 @@ async def analyze_resume(file: UploadFile = File(...)):
             processing_time=0
         )
         
-        # Analyze resume
-        analysis_result = resume_analyzer.predict_domain(file_content, file.filename)
-        
-        if "error" in analysis_result:
-            raise HTTPException(status_code=422, detail=analysis_result["error"])
-        
-        # Extract additional information
-        if "extracted_text_length" in analysis_result and analysis_result["extracted_text_length"] > 0:
-            # For demo, we'll simulate text extraction for additional features
-            # In production, you'd extract the actual text here
-            sample_text = "Sample resume text for demonstration"
-            contact_info = TextProcessor.extract_contact_info(sample_text)
-            readability = TextProcessor.calculate_readability_score(sample_text)
-        else:
-            contact_info = None
-            readability = None
+        analysis_result = await analyze_content(file_content, file.filename, x_document_id)
         
         processing_time = time.time() - start_time
         
@@ -138,14 +424,7 @@ async def analyze_resume(file: UploadFile = File(...)):
             processing_time=processing_time
         )
         
-        return AnalysisResponse(
-            domain=analysis_result["domain"],
-            confidence=analysis_result["confidence"],
-            skills=analysis_result["skills"],
-            contact_info=contact_info,
-            readability=readability,
-            processing_time=processing_time
-        )
+        return AnalysisResponse(**analysis_result, processing_time=processing_time)
         
     except HTTPException:
         raise
@@ -160,27 +439,18 @@ async def improve_resume(file: UploadFile = File(...), domain: Optional[str] = N
     """
     try:
         # Validate file
-        file_content = await file.read()
-        validation_result = FileHandler.validate_file(file.filename, file_content)
-        
-        if not validation_result["valid"]:
-            raise HTTPException(status_code=400, detail=validation_result["error"])
-        
-        # For demo purposes, we'll use sample text
-        # In production, extract actual text from the file
-        sample_text = """
-        John Doe
-        Software Developer
-        I am a results-driven professional with excellent communication skills.
-        I work well under pressure and am a team player.
-        """
+        file_content = await read_upload(file)
+        analysis = UploadAnalysis(file_content, file.filename)
         
         if domain is None:
             # Get domain from previous analysis or use default
             domain = "Software Engineering"
         
         # Analyze and get improvement suggestions
-        improvement_result = resume_improver.analyze_resume(sample_text, domain)
+        improvement_result = await analysis.run(
+            "improvement", lambda text: resume_improver.analyze_resume(text, domain), domain
+        )
+        await analysis.save()
         
         if "error" in improvement_result:
             raise HTTPException(status_code=422, detail=improvement_result["error"])
@@ -204,22 +474,12 @@ async def check_plagiarism(file: UploadFile = File(...)):
     """
     try:
         # Validate file
-        file_content = await file.read()
-        validation_result = FileHandler.validate_file(file.filename, file_content)
-        
-        if not validation_result["valid"]:
-            raise HTTPException(status_code=400, detail=validation_result["error"])
-        
-        # For demo purposes, we'll use sample text
-        # In production, extract actual text from the file
-        sample_text = """
-        I am a results-driven professional with excellent communication skills.
-        I have a proven track record and am detail-oriented individual.
-        I work well under pressure and am self-motivated team player.
-        """
+        file_content = await read_upload(file)
+        analysis = UploadAnalysis(file_content, file.filename)
         
         # Check for plagiarism
-        plagiarism_result = plagiarism_checker.check_plagiarism(sample_text)
+        plagiarism_result = await analysis.run("plagiarism", plagiarism_checker.check_plagiarism)
+        await analysis.save()
         
         if "error" in plagiarism_result:
             raise HTTPException(status_code=422, detail=plagiarism_result["error"])
@@ -228,7 +488,8 @@ async def check_plagiarism(file: UploadFile = File(...)):
             overall_score=plagiarism_result["overall_score"],
             matches=plagiarism_result["matches"],
             total_matches=plagiarism_result["total_matches"],
-            recommendations=plagiarism_result["recommendations"]
+            recommendations=plagiarism_result["recommendations"],
+            boilerplate=plagiarism_result.get("boilerplate")
         )
         
     except HTTPException:
@@ -237,14 +498,241 @@ async def check_plagiarism(file: UploadFile = File(...)):
         Logger.log_error(f"Plagiarism check failed: {str(e)}", {"filename": file.filename})
         raise HTTPException(status_code=500, detail=f"Plagiarism check failed: {str(e)}")
 
+@app.post("/api/full-report", response_model=FullReportResponse)
+async def full_report(file: UploadFile = File(...), domain: Optional[str] = None,
+                      x_document_id: Optional[str] = Header(None)):
+    """
+    Run every analyzer on a single upload: the file is validated and parsed
+    once, then classification, improvement, plagiarism, field extraction and
+    company matching run concurrently on the extracted text. Revisions of a
+    document sent with the same X-Document-Id only recompute changed paragraphs
+    """
+    start_time = time.time()
+    timings: Dict[str, float] = {}
+    
+    try:
+        file_content = await read_upload(file)
+        analysis = UploadAnalysis(file_content, file.filename, timings, x_document_id)
+        
+        # One store query answers repeat uploads before any parsing happens
+        await analysis.prefetch(("extraction",), ("classification",), ("plagiarism",), ("text_fields",),
+                          *([("improvement", domain)] if domain else []))
+        
+        async def classify_and_match():
+            # Improvement and company lookup need the domain, so they chain
+            # after classification while the independent analyzers run alongside
+            classification = await analysis.run(
+                "classification",
+                lambda text: classify_text(text, file.filename, x_document_id)
+            )
+            if "error" in classification:
+                raise HTTPException(status_code=422, detail=classification["error"])
+            
+            resolved_domain = domain or classification["domain"]
+            improvement, companies = await asyncio.gather(
+                analysis.run("improvement",
+                             lambda text: improve_text(text, resolved_domain, x_document_id),
+                             resolved_domain),
+                timed(timings, "companies", company_matcher.get_matching_companies,
+                      resolved_domain, classification["skills"])
+            )
+            return classification, improvement, companies
+        
+        (classification, improvement, companies), plagiarism, fields = await asyncio.gather(
+            classify_and_match(),
+            analysis.run("plagiarism", lambda text: check_text_plagiarism(text, x_document_id)),
+            analysis.run("text_fields", extract_text_fields)
+        )
+        extraction = await analysis.extraction()
+        
+        for result in (improvement, plagiarism):
+            if "error" in result:
+                raise HTTPException(status_code=422, detail=result["error"])
+        
+        await analysis.save()
+        processing_time = time.time() - start_time
+        
+        Logger.log_analysis(
+            filename=file.filename,
+            domain=classification["domain"],
+            confidence=classification["confidence"],
+            processing_time=processing_time
+        )
+        
+        return FullReportResponse(
+            filename=file.filename,
+            classification=classification,
+            improvement=improvement,
+            plagiarism=plagiarism,
+            companies=companies,
+            extraction=extraction,
+            stage_timings=timings,
+            cached_stages=analysis.cached_stages,
+            coalesced_stages=analysis.coalesced_stages,
+            revision=incremental_analyzer.revision_info(x_document_id) if x_document_id else None,
+            processing_time=processing_time,
+            **fields
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        Logger.log_error(f"Full report failed: {str(e)}", {"filename": file.filename})
+        raise HTTPException(status_code=500, detail=f"Full report failed: {str(e)}")
+
+async def analyze_batch_item(index: int, file) -> Dict[str, Any]:
+    """Analyze one file of a batch; a failure becomes an error record, not a failed batch"""
+    record = {"type": "result", "index": index, "filename": file.filename}
+    try:
+        # Each file is admitted like a single upload, so a batch costs what its files would
+        async with admit_item():
+            file_content = await read_upload(file)
+            record["result"] = await analyze_content(file_content, file.filename)
+        record["status"] = "ok"
+    except ItemRejected as e:
+        record.update(status="error", status_code=e.status_code, error=e.message, retry_after=e.retry_after)
+    except HTTPException as e:
+        record.update(status="error", status_code=e.status_code, error=e.detail)
+    except deadlines.DeadlineExceeded as e:
+        record.update(status="abandoned", reason=e.reason, stage=e.stage)
+    except Exception as e:
+        Logger.log_error(f"Batch item failed: {str(e)}", {"filename": file.filename})
+        record.update(status="error", status_code=500, error=f"Analysis failed: {str(e)}")
+    finally:
+        await file.close()
+    return record
+
+async def iter_batch_results(files: list):
+    """
+    Yield batch records in completion order followed by a summary record.
+    At most BATCH_CONCURRENCY files are read and analyzed at a time, so memory
+    does not grow with the batch size. Once the request's deadline passes no
+    new files are started, and the summary counts the abandoned ones
+    """
+    start_time = time.time()
+    summary = {"type": "summary", "total": len(files), "succeeded": 0, "failed": 0,
+               "abandoned": 0, "domains": {}}
+    queue = enumerate(files)
+    pending = set()
+    started = 0
+    deadline = deadlines.current()
+    try:
+        while True:
+            if deadline is None or not deadline.abandoned():
+                for index, file in itertools.islice(queue, BATCH_CONCURRENCY - len(pending)):
+                    pending.add(asyncio.ensure_future(analyze_batch_item(index, file)))
+                    started += 1
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                record = task.result()
+                if record["status"] == "ok":
+                    summary["succeeded"] += 1
+                    domain = str(record["result"]["domain"])
+                    summary["domains"][domain] = summary["domains"].get(domain, 0) + 1
+                elif record["status"] == "abandoned":
+                    summary["abandoned"] += 1
+                else:
+                    summary["failed"] += 1
+                yield record
+    finally:
+        # A client that disconnects mid-stream stops the remaining work
+        for task in pending:
+            task.cancel()
+    
+    summary["abandoned"] += len(files) - started
+    if deadline is not None and deadline.reason:
+        summary["deadline"] = deadline.reason
+    summary["processing_time"] = round(time.time() - start_time, 4)
+    yield summary
+
+BATCH_REQUEST_SCHEMA = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["files"],
+            "properties": {"files": {"type": "array", "items": {"type": "string", "format": "binary"}}}
+        }}}
+    }
+}
+
+@app.post("/api/batch/analyze", openapi_extra=BATCH_REQUEST_SCHEMA)
+async def batch_analyze(request: Request):
+    """
+    Analyze many resumes (multipart field `files`) in one request. With
+    `Accept: application/x-ndjson` each result is streamed as one line as
+    soon as it is ready and a summary line comes last; otherwise a single
+    JSON document lists results in upload order
+    """
+    # The form is parsed here rather than through File() parameters, which
+    # FastAPI closes as soon as the handler returns, before a stream is sent
+    try:
+        form = await request.form(max_files=BATCH_MAX_FILES)
+    except StarletteHTTPException as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    files = [value for value in form.getlist("files") if not isinstance(value, str)]
+    if not files:
+        await form.close()
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    records = iter_batch_results(files)
+    if "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(
+            (ResponseFormatter.to_json_line(record) async for record in records),
+            media_type="application/x-ndjson",
+            background=BackgroundTask(form.close)
+        )
+    
+    results = []
+    try:
+        async for record in records:
+            if record["type"] == "summary":
+                summary = record
+            else:
+                results.append(record)
+    finally:
+        await form.close()
+    results.sort(key=lambda record: record["index"])
+    return {"results": results, "summary": summary}
+
+def classify_text(text: str, filename: str, document_id: Optional[str] = None) -> Dict[str, Any]:
+    """Classify resume text, incrementally when it is a revision of a known document"""
+    if document_id:
+        return incremental_analyzer.classify(document_id, text, filename)
+    return resume_analyzer.predict_domain_from_text(text, filename)
+
+def improve_text(text: str, domain: str, document_id: Optional[str] = None) -> Dict[str, Any]:
+    """Improvement suggestions, incrementally when a document id is given"""
+    if document_id:
+        return incremental_analyzer.analyze_resume(document_id, text, domain)
+    return resume_improver.analyze_resume(text, domain)
+
+def check_text_plagiarism(text: str, document_id: Optional[str] = None) -> Dict[str, Any]:
+    """Overused phrase check, incrementally when a document id is given"""
+    if document_id:
+        return incremental_analyzer.check_plagiarism(document_id, text)
+    return plagiarism_checker.check_plagiarism(text)
+
+def extract_text_fields(text: str) -> Dict[str, Any]:
+    """Run all TextProcessor extractors over the resume text"""
+    return {
+        "contact_info": TextProcessor.extract_contact_info(text),
+        "education": TextProcessor.extract_education(text),
+        "experience_years": TextProcessor.extract_experience_years(text),
+        "readability": TextProcessor.calculate_readability_score(text)
+    }
+
 @app.get("/api/companies/{domain}", response_model=CompanyResponse)
-async def get_companies_by_domain(domain: str, limit: Optional[int] = 10):
+async def get_companies_by_domain(domain: str, limit: Optional[int] = 10,
+                                  skills: Optional[List[str]] = Query(None)):
     """
-    Get companies that hire for specific domain
+    Get companies that hire for specific domain, ranked by the given skills
     """
     try:
         # Get matching companies
-        companies = company_matcher.get_matching_companies(domain)
+        companies = company_matcher.get_matching_companies(domain, skills)
         
         # Apply limit
         if limit:
@@ -260,6 +748,34 @@ async def get_companies_by_domain(domain: str, limit: Optional[int] = 10):
         Logger.log_error(f"Company matching failed: {str(e)}", {"domain": domain})
         raise HTTPException(status_code=500, detail=f"Company matching failed: {str(e)}")
 
+@app.post("/api/jobs/match", response_model=JobMatchResponse)
+async def match_jobs(file: UploadFile = File(...), top_k: int = Query(10, ge=1, le=100)):
+    """
+    Rank open job postings against the resume by TF-IDF cosine similarity
+    """
+    start_time = time.time()
+    try:
+        file_content = await read_upload(file)
+        analysis = UploadAnalysis(file_content, file.filename)
+        text = await analysis.text()
+        
+        results = await asyncio.to_thread(run_stage, "job_match", job_index.search, [text], top_k)
+        
+        return JobMatchResponse(
+            matches=results[0],
+            total_postings=job_index.stats()["postings"],
+            index_generation=job_index.generation,
+            processing_time=time.time() - start_time
+        )
+        
+    except HTTPException:
+        raise
+    except JobIndexError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        Logger.log_error(f"Job matching failed: {str(e)}", {"filename": file.filename})
+        raise HTTPException(status_code=500, detail=f"Job matching failed: {str(e)}")
+
 @app.get("/api/domains")
 async def get_available_domains():
     """
@@ -276,6 +792,100 @@ async def get_available_domains():
         ]
     }
 
+@app.get("/admin/memory-profile")
+async def get_memory_profile():
+    """
+    Per-stage peak/net allocation by file type and the top allocation sites
+    of recent over-threshold requests (requires MEMORY_PROFILE=1)
+    """
+    return memory_profiler.summary()
+
+@app.get("/admin/profiles")
+async def list_request_profiles(limit: int = Query(50, ge=1, le=1000)):
+    """
+    Recent sampled and slow-request profiles (newest first) with their
+    file type, size, page count and stage timings
+    """
+    profiles = await asyncio.to_thread(request_profiler.store.list, limit)
+    return {"profiler": request_profiler.metrics(), "profiles": profiles}
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_request_profile(profile_id: str):
+    """
+    Metadata and the top functions by cumulative time of one profile
+    """
+    metadata = await asyncio.to_thread(request_profiler.store.get, profile_id)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return metadata
+
+@app.get("/admin/profiles/{profile_id}/download")
+async def download_request_profile(profile_id: str):
+    """
+    The raw pstats file, for `python -m pstats` or snakeviz
+    """
+    path = request_profiler.store.profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+@app.get("/admin/single-flight")
+async def get_single_flight_metrics():
+    """
+    How many analyzer runs and extractions were shared between concurrent identical uploads
+    """
+    return single_flight.metrics()
+
+@app.get("/admin/job-index")
+async def get_job_index_stats():
+    """
+    Segments, live postings and generation of the job posting index
+    """
+    try:
+        return await asyncio.to_thread(job_index.stats)
+    except JobIndexError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/admin/feature-store")
+async def get_feature_store_stats():
+    """
+    Segments and rows in the TF-IDF feature store, and this worker's queued,
+    written and dropped rows
+    """
+    if not feature_store:
+        return {"enabled": False}
+    return {"enabled": True, **await asyncio.to_thread(feature_store.stats)}
+
+@app.get("/admin/monitoring")
+async def get_prediction_monitoring():
+    """
+    Domain mix, confidence quantiles, fallback/error/extraction failure rates
+    and top out-of-vocabulary terms for this worker's current and previous
+    windows, with the deltas between them
+    """
+    if not prediction_monitor:
+        return {"enabled": False}
+    return {"enabled": True, **prediction_monitor.snapshot()}
+
+@app.get("/admin/deadlines")
+async def get_deadline_metrics():
+    """
+    Completed, expired and disconnected requests, and the stages where
+    abandoned work stopped
+    """
+    if not deadline_policy:
+        return {"enabled": False}
+    return {"enabled": True, **deadline_policy.metrics()}
+
+@app.get("/admin/admission")
+async def get_admission_metrics():
+    """
+    Admitted, queued, shed and rate-limited counts per lane for this worker
+    """
+    if not admission_control:
+        return {"enabled": False}
+    return {"enabled": True, **admission_control.metrics()}
+
 # Background task for logging (example)
 async def log_usage_stats(endpoint: str, processing_time: float):
     """Background task to log usage statistics"""
@@ -302,16 +912,22 @@ async def general_exception_handler(request, exc):
 @app.on_event("startup")
 async def startup_event():
     print("🚀 Resume Analyzer API started successfully!")
-    print("📊 Models loaded:", {
-        "resume_analyzer": resume_analyzer.model is not None,
-        "plagiarism_checker": True,
-        "resume_improver": True
-    })
+    if memory_profiler.enabled:
+        # The baseline must include the models so reports show per-request growth
+        resume_analyzer.load_models()
+        memory_profiler.take_baseline()
+    elif not resume_analyzer.models_loaded and os.getenv("PRELOAD_MODELS", "1") == "1":
+        # Serve requests right away; the first classification waits for this
+        threading.Thread(target=resume_analyzer.load_models, name="model-warmup", daemon=True).start()
+        print("⏳ Loading models in the background...")
 
 # Shutdown event  
 @app.on_event("shutdown")
 async def shutdown_event():
     print("🛑 Resume Analyzer API shutting down...")
+    resume_analyzer.shutdown()
+    if feature_store:
+        feature_store.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -324,7 +940,10 @@ if __name__ == "__main__":
     print("  - POST /api/analyze-resume")
     print("  - POST /api/improve-resume") 
     print("  - POST /api/check-plagiarism")
+    print("  - POST /api/full-report")
+    print("  - POST /api/batch/analyze")
     print("  - GET /api/companies/{domain}")
+    print("  - POST /api/jobs/match")
     print("  - GET /api/domains")
     print("  - GET /health")
     
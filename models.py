@@ -1,48 +1,129 @@
-import joblib
-import pandas as pd
-import PyPDF2
-import docx
 from io import BytesIO
 import re
-import nltk
-from nltk.corpus import stopwords
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from extractors import (
+    extract_docx_text, extract_pdf_text, iter_pdf_pages, DocxExtractionError,
+    PDF_PAGE_TIMEOUT, PDF_DOCUMENT_TIMEOUT
+)
+from skills import load_skill_extractor
+from rules import RuleSet, load_rule_set
+from boilerplate import load_boilerplate_index
+from engines import TfidfLogRegEngine
+from profiling import stage, request_profiler
+from result_store import fingerprint, file_fingerprint
 
-# Download required NLTK data
-try:
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('stopwords')
+# Heavy libraries (joblib/sklearn, python-docx, multiprocessing) are imported
+# on first use so a fresh worker can start serving in well under a second
+
+def load_stop_words(path="public/models/stopwords_en.txt"):
+    """Read the bundled English stopword list (the NLTK list), one word per line"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return frozenset(line.strip() for line in f if line.strip())
+    except OSError as e:
+        print(f"❌ Error loading stopwords: {e}")
+        return frozenset()
 
 class ResumeAnalyzer:
     def __init__(self, model_path="public/models/domain_classifier.pkl", 
-                 vectorizer_path="public/models/tfidf_vectorizer.pkl"):
+                 vectorizer_path="public/models/tfidf_vectorizer.pkl",
+                 skills_path="public/models/skill_taxonomy.csv",
+                 stopwords_path="public/models/stopwords_en.txt",
+                 pdf_workers=0, pdf_page_timeout=PDF_PAGE_TIMEOUT,
+                 pdf_document_timeout=PDF_DOCUMENT_TIMEOUT, engine=None,
+                 adaptive_margin=10.0, adaptive_pages=1, adaptive_tokens=400, feature_store=None,
+                 monitor=None):
         """Initialize the Resume Analyzer with trained models"""
-        try:
-            self.model = joblib.load(model_path)
-            self.vectorizer = joblib.load(vectorizer_path)
-            print("✅ Models loaded successfully!")
-        except FileNotFoundError as e:
-            print(f"❌ Error loading models: {e}")
-            self.model = None
-            self.vectorizer = None
+        # pdf_workers > 0 enables parallel PDF extraction with hard per-page timeouts;
+        # serial extraction can only time pages out on the main thread
+        self.pdf_workers = pdf_workers
+        self.pdf_page_timeout = pdf_page_timeout
+        self.pdf_document_timeout = pdf_document_timeout
+        # predict_domain(adaptive=True) starts from this many PDF pages (or
+        # words for other formats) and stops once the top class leads the
+        # runner-up by adaptive_margin percentage points
+        self.adaptive_margin = adaptive_margin
+        self.adaptive_pages = adaptive_pages
+        self.adaptive_tokens = adaptive_tokens
+        self._pdf_executor = None
+        self.skill_extractor = load_skill_extractor(skills_path)
+        self.stop_words = load_stop_words(stopwords_path)
+        
+        # The domain classifier is pluggable (see engines.py); models are
+        # loaded on first use (or by a warm-up thread) since importing the
+        # ML libraries dominates startup time
+        self.engine = engine or TfidfLogRegEngine(model_path, vectorizer_path)
+        self._data_version = file_fingerprint(skills_path, stopwords_path)
+        # Optional FeatureStore that keeps every TF-IDF vector classified, for retraining
+        self.feature_store = feature_store
+        # Optional PredictionMonitor fed with every extraction and prediction
+        self.monitor = monitor
+    
+    def load_models(self):
+        """Load the classifier once; safe to call from any thread"""
+        self.engine.load()
+    
+    @property
+    def models_loaded(self):
+        return self.engine.loaded
+    
+    @property
+    def model(self):
+        """The TF-IDF engine's classifier, or None for other engines"""
+        self.load_models()
+        return getattr(self.engine, "model", None)
+    
+    @property
+    def vectorizer(self):
+        """The TF-IDF engine's vectorizer, or None for other engines"""
+        self.load_models()
+        return getattr(self.engine, "vectorizer", None)
+    
+    @property
+    def models_ready(self):
+        """True once the models are loaded, without triggering a load"""
+        return self.engine.loaded and self.engine.available
     
     def extract_text_from_pdf(self, file_bytes):
         """Extract text from PDF file"""
+        return self.extract_pdf(file_bytes)["text"]
+    
+    def extract_pdf(self, file_bytes):
+        """Extract PDF text along with page counts and any skipped pages"""
         try:
-            pdf_reader = PyPDF2.PdfReader(BytesIO(file_bytes))
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + " "
-            return text
+            return extract_pdf_text(
+                file_bytes,
+                executor=self._get_pdf_executor(),
+                workers=self.pdf_workers,
+                page_timeout=self.pdf_page_timeout,
+                document_timeout=self.pdf_document_timeout
+            )
         except Exception as e:
             print(f"Error extracting PDF text: {e}")
-            return ""
+            return {"text": "", "pages_total": 0, "pages_extracted": 0, "pages_skipped": []}
+    
+    def _get_pdf_executor(self):
+        """Lazily start the PDF worker pool when parallel extraction is enabled"""
+        if self.pdf_workers and self._pdf_executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._pdf_executor = ProcessPoolExecutor(max_workers=self.pdf_workers)
+        return self._pdf_executor
+    
+    def shutdown(self):
+        """Release the PDF worker pool and any engine resources"""
+        if self._pdf_executor is not None:
+            self._pdf_executor.shutdown(wait=False, cancel_futures=True)
+            self._pdf_executor = None
+        self.engine.close()
     
     def extract_text_from_docx(self, file_bytes):
         """Extract text from DOCX file"""
         try:
+            return extract_docx_text(file_bytes)
+        except DocxExtractionError as e:
+            print(f"Streaming DOCX extraction failed, falling back to python-docx: {e}")
+
+        try:
+            import docx
             doc = docx.Document(BytesIO(file_bytes))
             text = " ".join([para.text for para in doc.paragraphs])
             return text
@@ -71,69 +152,270 @@ class ResumeAnalyzer:
         text = ' '.join(text.split())
         
         # Remove stopwords
-        try:
-            stop_words = set(stopwords.words('english'))
-            words = text.split()
-            text = " ".join([word for word in words if word not in stop_words])
-        except:
-            pass
+        stop_words = self.stop_words
+        text = " ".join([word for word in text.split() if word not in stop_words])
         
         return text
     
-    def predict_domain(self, file_content, filename):
-        """Predict domain from resume content"""
-        if not self.model or not self.vectorizer:
-            return self._fallback_prediction(filename)
-        
-        # Extract text based on file type
+    def extract_text(self, file_content, filename):
+        """Extract raw text from an uploaded file based on its extension"""
         file_extension = filename.lower().split('.')[-1]
+        metadata = {}
         
-        if file_extension == 'pdf':
-            text = self.extract_text_from_pdf(file_content)
-        elif file_extension in ['docx', 'doc']:
-            text = self.extract_text_from_docx(file_content)
-        elif file_extension == 'txt':
-            text = file_content.decode('utf-8', errors='ignore')
-        else:
+        if file_extension not in ['pdf', 'docx', 'doc', 'txt']:
+            self._record_extraction(file_extension, False)
             return {"error": "Unsupported file format"}
         
+        with stage(f"extract_{file_extension}"):
+            if file_extension == 'pdf':
+                pdf_result = self.extract_pdf(file_content)
+                text = pdf_result.pop("text")
+                metadata = pdf_result
+            elif file_extension in ['docx', 'doc']:
+                text = self.extract_text_from_docx(file_content)
+            else:
+                text = file_content.decode('utf-8', errors='ignore')
+        
         if not text.strip():
+            self._record_extraction(file_extension, False)
             return {"error": "Could not extract text from file"}
         
+        self._record_extraction(file_extension, True)
+        return {"text": text, "file_type": file_extension, **metadata}
+    
+    @property
+    def model_version(self):
+        """Stored results are keyed on this, so retraining (or an engine falling back) invalidates them"""
+        if self.engine.loaded and not self.engine.available:
+            # Filename guesses from _fallback_prediction
+            return fingerprint(self.engine.version, self._data_version, "unavailable")
+        return fingerprint(self.engine.version, self._data_version)
+    
+    def predict_domain(self, file_content, filename, adaptive=False):
+        """
+        Predict domain from resume content. With adaptive=True only as much
+        of a long resume is extracted and classified as it takes to be sure
+        (see predict_domain_adaptive)
+        """
+        if not self.engine.load():
+            return self._monitored(self._fallback_prediction(filename), fallback=True)
+        
+        if adaptive:
+            return self.predict_domain_adaptive(file_content, filename)
+        
+        extraction = self.extract_text(file_content, filename)
+        if "error" in extraction:
+            return extraction
+        
+        return self.predict_domain_from_text(extraction["text"], filename)
+    
+    def predict_domain_from_text(self, text, filename=""):
+        """Predict domain from already extracted resume text"""
+        if not self.engine.load():
+            return self._monitored(self._fallback_prediction(filename), fallback=True)
+        
         # Clean the text
-        cleaned_text = self.clean_text(text)
+        with stage("clean"):
+            cleaned_text = self.clean_text(text)
         
         if not cleaned_text.strip():
-            return {"error": "No valid text found after processing"}
+            return self._monitored({"error": "No valid text found after processing"})
         
         try:
-            # Vectorize the text
-            text_vector = self.vectorizer.transform([cleaned_text])
-            
-            # Predict domain
-            predicted_domain = self.model.predict(text_vector)[0]
-            
-            # Get confidence score
-            if hasattr(self.model, 'predict_proba'):
-                confidence = self.model.predict_proba(text_vector).max() * 100
+            document = cleaned_text if self.engine.uses_cleaned_text else text
+            if self._records_features():
+                vectors = self.engine.transform([document])
+                predictions = self.engine.predict_vectors(vectors)
+                self.record_features(vectors, predictions)
             else:
-                confidence = 85.0  # Default confidence
-            
-            # Get relevant skills based on domain
-            skills = self._get_skills_for_domain(predicted_domain)
+                predictions = self.engine.predict([document])
+            predicted_domain, confidence = predictions[0]
             
-            return {
-                "domain": predicted_domain,
-                "confidence": round(confidence, 2),
-                "skills": skills,
-                "extracted_text_length": len(text),
-                "processed_text_length": len(cleaned_text)
-            }
+            result = self.build_prediction(text, predicted_domain, confidence, len(cleaned_text))
+            return self._monitored(result, cleaned_text)
             
+        except Exception as e:
+            print(f"Error during prediction: {e}")
+            return self._monitored({"error": f"Prediction failed: {str(e)}"})
+    
+    def predict_domain_adaptive(self, file_content, filename):
+        """
+        Classify a growing prefix of the resume: the first adaptive_pages PDF
+        pages (extracted lazily) or adaptive_tokens words, doubling until the
+        top two classes are adaptive_margin points apart or the document ends.
+        The result's "adaptive" entry reports how much of the document was used
+        """
+        if not self.engine.load():
+            return self._monitored(self._fallback_prediction(filename), fallback=True)
+        
+        file_extension = filename.lower().split('.')[-1]
+        skipped = []
+        if file_extension == 'pdf':
+            try:
+                total, pages = iter_pdf_pages(file_content, self.pdf_document_timeout,
+                                              self.pdf_page_timeout)
+            except Exception as e:
+                print(f"Error extracting PDF text: {e}")
+                self._record_extraction(file_extension, False)
+                return {"error": "Could not extract text from file"}
+            unit, step = "pages", self.adaptive_pages
+            chunks = pages
+        else:
+            extraction = self.extract_text(file_content, filename)
+            if "error" in extraction:
+                return extraction
+            words = extraction["text"].split()
+            total, unit, step = len(words), "tokens", self.adaptive_tokens
+            chunks = ((" ".join(words[i:i + step]), None) for i in range(0, len(words), step))
+        
+        # clean_text works word by word, so cleaning each chunk and joining
+        # the results equals cleaning the whole prefix
+        raw_parts, cleaned_parts = [], []
+        used = classified = steps = 0
+        target = step
+        prediction = vectors = None
+        try:
+            for raw, skip in chunks:
+                if skip:
+                    skipped.append(skip)
+                raw_parts.append(raw)
+                with stage("clean"):
+                    cleaned = self.clean_text(raw)
+                if cleaned:
+                    cleaned_parts.append(cleaned)
+                used += 1 if unit == "pages" else len(raw.split())
+                if used < target or not cleaned_parts:
+                    continue
+                
+                prediction = self._predict_prefix(raw_parts, cleaned_parts)
+                if isinstance(prediction, dict):
+                    return self._monitored(prediction)
+                prediction, vectors = prediction
+                classified, steps = used, steps + 1
+                margin = prediction[2]
+                if margin is not None and margin >= self.adaptive_margin:
+                    break
+                # Without probabilities there is nothing to stop on: go to the end
+                target = used * 2 if margin is not None else float("inf")
+        finally:
+            # Stops lazy PDF extraction on every exit, including early returns
+            chunks.close()
+        
+        if unit == "pages":
+            self._record_extraction(file_extension, bool("".join(raw_parts).strip()))
+        if not "".join(raw_parts).strip():
+            return {"error": "Could not extract text from file"}
+        if not cleaned_parts:
+            return self._monitored({"error": "No valid text found after processing"})
+        if classified != used:
+            # The document ended before the next prefix size
+            prediction = self._predict_prefix(raw_parts, cleaned_parts)
+            if isinstance(prediction, dict):
+                return self._monitored(prediction)
+            prediction, vectors = prediction
+            steps += 1
+        
+        predicted_domain, confidence, margin = prediction
+        if vectors is not None:
+            self.record_features(vectors, [(predicted_domain, confidence)])
+        text = " ".join(raw_parts)
+        result = self.build_prediction(text, predicted_domain, confidence, len(" ".join(cleaned_parts)))
+        result["adaptive"] = {
+            "unit": unit,
+            "used": used,
+            "total": total,
+            "fraction_used": round(used / total, 3) if total else 1.0,
+            "steps": steps,
+            "margin": None if margin is None else round(float(margin), 2),
+            "stopped_early": used < total
+        }
+        if unit == "pages":
+            result["adaptive"]["pages_skipped"] = skipped
+        return self._monitored(result, " ".join(cleaned_parts))
+    
+    def _predict_prefix(self, raw_parts, cleaned_parts):
+        """
+        ((label, confidence, margin), TF-IDF rows or None) for a document
+        prefix, or an error dict
+        """
+        try:
+            document = " ".join(cleaned_parts) if self.engine.uses_cleaned_text else " ".join(raw_parts)
+            if self._records_features():
+                vectors = self.engine.transform([document])
+                return self.engine.predict_vector_margins(vectors)[0], vectors
+            return self.engine.predict_margins([document])[0], None
         except Exception as e:
             print(f"Error during prediction: {e}")
             return {"error": f"Prediction failed: {str(e)}"}
     
+    def predict_from_vector(self, text, text_vector, processed_text_length):
+        """Classify an already vectorized resume (TF-IDF engine) and extract its skills"""
+        predictions = self.engine.predict_vectors(text_vector)
+        self.record_features(text_vector, predictions)
+        predicted_domain, confidence = predictions[0]
+        return self._monitored(self.build_prediction(text, predicted_domain, confidence, processed_text_length))
+    
+    def _record_extraction(self, file_type, ok):
+        if self.monitor is not None and not request_profiler.replaying():
+            self.monitor.record_extraction(file_type, ok)
+    
+    def _monitored(self, result, cleaned_text=None, fallback=False):
+        """Feed a prediction result to the monitor, if one is attached, and return it"""
+        # A profiler replay repeats a prediction that was already counted
+        if self.monitor is not None and not request_profiler.replaying():
+            oov_terms, tokens = self._out_of_vocabulary(cleaned_text)
+            self.monitor.record_prediction(result, fallback, oov_terms, tokens)
+        return result
+    
+    def _out_of_vocabulary(self, cleaned_text):
+        """(words the TF-IDF vocabulary lacks, words checked) for drift monitoring"""
+        vectorizer = getattr(self.engine, "vectorizer", None)
+        if not cleaned_text or vectorizer is None:
+            return (), 0
+        # The vectorizer ignores single letters and its own stop words
+        vocabulary = vectorizer.vocabulary_
+        ignored = vectorizer.get_stop_words() or ()
+        words = [word for word in cleaned_text.split() if len(word) > 1 and word not in ignored]
+        return [word for word in words if word not in vocabulary], len(words)
+    
+    def _records_features(self):
+        # Only the TF-IDF engine produces vectors worth keeping
+        return self.feature_store is not None and hasattr(self.engine, "predict_vector_margins")
+    
+    def record_features(self, vectors, predictions):
+        """Queue classified TF-IDF rows for the feature store, if one is attached"""
+        # A profiler replay repeats rows that were already queued
+        if self._records_features() and not request_profiler.replaying():
+            self.feature_store.append(vectors, predictions, self.engine.version, self.engine.feature_space)
+    
+    def build_prediction(self, text, predicted_domain, confidence, processed_text_length):
+        """Combine a domain prediction with the skills found in the resume"""
+        # Skills come from the resume itself; the domain list only fills
+        # in when no taxonomy is available
+        domain_skills = self._get_skills_for_domain(predicted_domain)
+        with stage("skills"):
+            skill_counts = self.extract_skills(text)
+        if self.skill_extractor is not None:
+            skills = [entry["skill"] for entry in skill_counts]
+        else:
+            skills = domain_skills
+        
+        return {
+            "domain": predicted_domain,
+            "confidence": round(float(confidence), 2),
+            "skills": skills,
+            "skill_counts": skill_counts,
+            "recommended_skills": [s for s in domain_skills if s not in skills],
+            "extracted_text_length": len(text),
+            "processed_text_length": processed_text_length
+        }
+    
+    def extract_skills(self, text):
+        """Extract canonical skills with occurrence counts from resume text"""
+        if self.skill_extractor is None:
+            return []
+        return self.skill_extractor.extract(text)
+    
     def _fallback_prediction(self, filename):
         """Fallback prediction when models are not available"""
         filename_lower = filename.lower()
@@ -200,7 +482,10 @@ class ResumeAnalyzer:
 class PlagiarismChecker:
     """Simple plagiarism checker for resumes"""
     
-    def __init__(self):
+    # Bump when the scoring logic changes so stored results are recomputed
+    RULES_VERSION = 1
+    
+    def __init__(self, boilerplate_path=None):
         self.common_phrases = [
             "results-driven professional",
             "detail-oriented individual", 
@@ -210,17 +495,36 @@ class PlagiarismChecker:
             "self-motivated",
             "work well under pressure"
         ]
+        # Optional Bloom filter of n-grams from template resumes (boilerplate.py)
+        self.boilerplate = load_boilerplate_index(boilerplate_path) if boilerplate_path else None
+        extra = [self.boilerplate.version] if self.boilerplate is not None else []
+        self.version = fingerprint(self.RULES_VERSION, self.common_phrases, *extra)
     
     def check_plagiarism(self, text, threshold=0.3):
         """Check for common overused phrases in resumes"""
         if not text:
             return {"error": "No text provided"}
         
+        return self.build_result(self.find_phrases(text), self.check_boilerplate(text))
+    
+    def check_boilerplate(self, text):
+        """Spans of known template text, or None without a boilerplate index"""
+        if self.boilerplate is None:
+            return None
+        with stage("boilerplate"):
+            return self.boilerplate.check(text)
+    
+    def find_phrases(self, text):
+        """Return the set of common phrases present in text"""
         text_lower = text.lower()
+        return {phrase for phrase in self.common_phrases if phrase in text_lower}
+    
+    def build_result(self, found_phrases, boilerplate=None):
+        """Score a set of matched phrases and any boilerplate check result"""
         matches = []
         
         for phrase in self.common_phrases:
-            if phrase in text_lower:
+            if phrase in found_phrases:
                 matches.append({
                     "phrase": phrase,
                     "category": "overused",
@@ -228,13 +532,19 @@ class PlagiarismChecker:
                 })
         
         similarity_score = min((len(matches) / len(self.common_phrases)) * 100, 100)
+        if boilerplate is not None:
+            # The share of the resume copied from templates, if that is higher
+            similarity_score = max(similarity_score, boilerplate["boilerplate_fraction"] * 100)
         
-        return {
+        result = {
             "overall_score": round(similarity_score, 1),
             "matches": matches,
             "total_matches": len(matches),
             "recommendations": self._get_recommendations(similarity_score)
         }
+        if boilerplate is not None:
+            result["boilerplate"] = boilerplate
+        return result
     
     def _get_recommendations(self, score):
         """Get recommendations based on plagiarism score"""
@@ -255,42 +565,31 @@ class PlagiarismChecker:
 class ResumeImprover:
     """AI-powered resume improvement suggestions"""
     
-    def __init__(self):
+    # Bump when the scoring logic changes; edits to the rules file are
+    # picked up through its fingerprint
+    RULES_VERSION = 2
+    
+    def __init__(self, rules_path="public/models/improvement_rules.json"):
         self.improvement_categories = [
             "formatting", "content", "keywords", "achievements", "skills"
         ]
+        self.rules = load_rule_set(rules_path) or RuleSet({})
+        self.version = fingerprint(self.RULES_VERSION, self.improvement_categories, self.rules.version)
     
     def analyze_resume(self, text, domain="General"):
         """Analyze resume and provide improvement suggestions"""
         if not text:
             return {"error": "No text provided"}
         
-        suggestions = []
-        
-        # Check for quantifiable achievements
-        if not re.search(r'\d+%|\$\d+|\d+\s*(years?|months?)', text):
-            suggestions.append({
-                "category": "achievements",
-                "title": "Add Quantifiable Achievements",
-                "description": "Include specific numbers, percentages, or metrics to demonstrate your impact.",
-                "example": "Increased sales by 25% over 6 months",
-                "priority": "high"
-            })
-        
-        # Check for action verbs
-        action_verbs = ["achieved", "developed", "managed", "created", "improved", "led", "implemented"]
-        if not any(verb in text.lower() for verb in action_verbs):
-            suggestions.append({
-                "category": "content",
-                "title": "Use Strong Action Verbs",
-                "description": "Start bullet points with powerful action verbs to show initiative.",
-                "example": "Led a team of 5 developers to deliver project ahead of schedule",
-                "priority": "high"
-            })
-        
-        # Domain-specific suggestions
-        domain_suggestions = self._get_domain_suggestions(domain, text)
-        suggestions.extend(domain_suggestions)
+        return self.build_result(self.detect_signals(text), domain)
+    
+    def detect_signals(self, text):
+        """Return the rule match counts, keyed by (matcher, section), of one scan over the text"""
+        return self.rules.scan(text)
+    
+    def build_result(self, signals, domain="General"):
+        """Turn rule match counts into scored suggestions"""
+        suggestions = self.rules.evaluate(signals, domain)
         
         # Calculate overall score
         score = max(100 - (len(suggestions) * 15), 60)
@@ -300,27 +599,3 @@ class ResumeImprover:
             "suggestions": suggestions[:5],  # Limit to top 5 suggestions
             "categories_analyzed": self.improvement_categories
         }
-    
-    def _get_domain_suggestions(self, domain, text):
-        """Get domain-specific improvement suggestions"""
-        suggestions = []
-        text_lower = text.lower()
-        
-        if domain == "Software Engineering":
-            if "github" not in text_lower:
-                suggestions.append({
-                    "category": "skills",
-                    "title": "Add GitHub Profile",
-                    "description": "Include your GitHub profile to showcase your coding projects.",
-                    "priority": "medium"
-                })
-        elif domain == "Data Science":
-            if "python" not in text_lower and "r" not in text_lower:
-                suggestions.append({
-                    "category": "skills", 
-                    "title": "Highlight Programming Languages",
-                    "description": "Mention key programming languages like Python or R for data science roles.",
-                    "priority": "high"
-                })
-        
-        return suggestions
\ No newline at end of file
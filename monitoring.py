@@ -0,0 +1,384 @@
+"""
+Constant-memory monitoring of domain predictions for drift and quality.
+
+ResumeAnalyzer feeds every extraction and prediction into a
+PredictionMonitor. The monitor keeps a ring of time buckets; each bucket
+holds:
+
+- outcome counts: ok, fallback (models unavailable) and error
+- extraction successes and failures per file type
+- predicted domain counts
+- a fixed-resolution histogram of confidence, used as the quantile sketch
+- a count-min sketch of out-of-vocabulary terms, plus a bounded set of
+  heavy-hitter candidates
+
+Domains come from the classifier's label set and file types from the
+supported extensions, so no structure grows with traffic. Sketch arrays
+are allocated on first use, so building a monitor does not import
+numpy. The current window is the last window_seconds of buckets and the
+previous window is the one before it; snapshot() reports both, with the
+deltas between them. State is per worker process.
+"""
+import math
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+OUTCOMES = ("ok", "fallback", "error")
+EXTRACTION_TYPES = ("pdf", "docx", "doc", "txt")
+
+
+class QuantileSketch:
+    """
+    Counts of values in fixed-width bins over [low, high]. Quantiles are
+    exact to within one bin width, and sketches merge by adding counts
+    """
+
+    def __init__(self, low: float = 0.0, high: float = 100.0, resolution: float = 0.25):
+        self.low = low
+        self.resolution = resolution
+        self.bins = int(math.ceil((high - low) / resolution)) + 1
+        self.counts = None
+        self.total = 0.0
+
+    def _counts(self):
+        if self.counts is None:
+            import numpy as np
+
+            self.counts = np.zeros(self.bins, dtype=np.int64)
+        return self.counts
+
+    def add(self, value: float):
+        index = int((value - self.low) / self.resolution)
+        self._counts()[min(max(index, 0), self.bins - 1)] += 1
+        self.total += value
+
+    def merge(self, other: "QuantileSketch"):
+        if other.counts is not None:
+            counts = self._counts()
+            counts += other.counts
+        self.total += other.total
+
+    def reset(self):
+        if self.counts is not None:
+            self.counts[:] = 0
+        self.total = 0.0
+
+    @property
+    def count(self) -> int:
+        return int(self.counts.sum()) if self.counts is not None else 0
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the counts once allocated"""
+        return self.bins * 8
+
+    def quantile(self, q: float) -> Optional[float]:
+        import numpy as np
+
+        count = self.count
+        if not count:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.counts), q * count, side="left"))
+        return round(self.low + (index + 0.5) * self.resolution, 2)
+
+    def mean(self) -> Optional[float]:
+        count = self.count
+        return round(self.total / count, 2) if count else None
+
+
+class CountMinSketch:
+    """
+    Approximate term counts in depth x width counters (width a power of
+    two), never under-counting. The most frequent terms are tracked as a
+    bounded set of candidates whose estimates beat the smallest one kept
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4, candidates: int = 50, seed: int = 7):
+        if width & (width - 1):
+            raise ValueError("width must be a power of two")
+        self.width = width
+        self.depth = depth
+        self.seed = seed
+        self.table = None
+        self.max_candidates = candidates
+        self.candidates: Dict[str, int] = {}
+        self._floor = 0  # Smallest candidate estimate once the set is full
+
+    def _table(self):
+        if self.table is None:
+            import numpy as np
+
+            self.shift = np.uint64(64 - int(math.log2(self.width)))
+            # Odd multipliers for multiply-shift hashing, one row each
+            self.multipliers = np.random.default_rng(self.seed).integers(
+                1, 2 ** 63, size=(self.depth, 1), dtype=np.uint64) * 2 + 1
+            self.table = np.zeros((self.depth, self.width), dtype=np.int64)
+        return self.table
+
+    def _columns(self, terms: List[str]):
+        import numpy as np
+
+        # hash() is salted per process, which is fine for per-worker state
+        hashes = np.array([hash(term) for term in terms], dtype=np.int64).view(np.uint64)
+        return (self.multipliers * hashes) >> self.shift
+
+    def add(self, terms: Iterable[str]):
+        import numpy as np
+
+        counts = Counter(terms)
+        if not counts:
+            return
+        self._table()
+        unique = list(counts)
+        columns = self._columns(unique)
+        rows = np.arange(self.table.shape[0])[:, None]
+        np.add.at(self.table, (np.broadcast_to(rows, columns.shape), columns), np.array([counts[t] for t in unique]))
+        estimates = self.table[rows, columns].min(axis=0)
+
+        for index in np.flatnonzero(estimates > self._floor):
+            term, estimate = unique[index], int(estimates[index])
+            if term in self.candidates or len(self.candidates) < self.max_candidates:
+                self.candidates[term] = estimate
+            else:
+                smallest = min(self.candidates, key=self.candidates.get)
+                if estimate > self.candidates[smallest]:
+                    del self.candidates[smallest]
+                    self.candidates[term] = estimate
+            if len(self.candidates) >= self.max_candidates:
+                self._floor = min(self.candidates.values())
+
+    def estimate(self, terms: List[str]) -> List[int]:
+        import numpy as np
+
+        if not terms:
+            return []
+        if self.table is None:
+            return [0] * len(terms)
+        columns = self._columns(terms)
+        rows = np.arange(self.table.shape[0])[:, None]
+        return [int(e) for e in self.table[rows, columns].min(axis=0)]
+
+    def merge(self, other: "CountMinSketch"):
+        """Add another sketch's counts (same width, depth and seed)"""
+        if other.table is not None:
+            table = self._table()
+            table += other.table
+        for term in other.candidates:
+            self.candidates.setdefault(term, 0)
+
+    def top(self, k: int) -> List[Dict[str, Any]]:
+        terms = list(self.candidates)
+        ranked = sorted(zip(terms, self.estimate(terms)), key=lambda item: -item[1])
+        return [{"term": term, "count": count} for term, count in ranked[:k]]
+
+    def reset(self):
+        if self.table is not None:
+            self.table[:] = 0
+        self.candidates.clear()
+        self._floor = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the counters once allocated"""
+        return self.depth * self.width * 8
+
+
+class _Bucket:
+    """Everything recorded during one bucket_seconds interval"""
+
+    def __init__(self, cms_width: int, cms_depth: int, candidates: int):
+        self.index = None
+        self.outcomes: Counter = Counter()
+        self.domains: Counter = Counter()
+        self.extractions: Counter = Counter()
+        self.confidence = QuantileSketch()
+        self.oov = CountMinSketch(cms_width, cms_depth, candidates)
+        self.tokens = 0
+        self.oov_tokens = 0
+
+    def reset(self, index: int):
+        self.index = index
+        self.outcomes.clear()
+        self.domains.clear()
+        self.extractions.clear()
+        self.confidence.reset()
+        self.oov.reset()
+        self.tokens = self.oov_tokens = 0
+
+
+class PredictionMonitor:
+    """
+    Sliding-window view of prediction outcomes, domain mix, confidence and
+    out-of-vocabulary terms, with window-over-window deltas.
+
+    The current window is the latest buckets_per_window buckets (so it
+    slides in bucket_seconds steps) and the previous window the ones before.
+    Memory is fixed at 2 * buckets_per_window buckets.
+    """
+
+    def __init__(self, window_seconds: float = 3600.0, buckets_per_window: int = 12,
+                 top_terms: int = 20, cms_width: int = 2048, cms_depth: int = 4):
+        self.window_seconds = window_seconds
+        self.buckets_per_window = buckets_per_window
+        self.bucket_seconds = window_seconds / buckets_per_window
+        self.top_terms = top_terms
+        self._sketch_shape = (cms_width, cms_depth, top_terms * 2)
+        self._buckets = [_Bucket(*self._sketch_shape) for _ in range(2 * buckets_per_window)]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["PredictionMonitor"]:
+        """Build a monitor from PREDICTION_MONITOR_* environment variables; disabled with PREDICTION_MONITOR=0"""
+        if os.getenv("PREDICTION_MONITOR", "1") != "1":
+            return None
+        return cls(window_seconds=float(os.getenv("PREDICTION_MONITOR_WINDOW", "3600")),
+                   buckets_per_window=int(os.getenv("PREDICTION_MONITOR_BUCKETS", "12")))
+
+    def _bucket(self, now: Optional[float] = None) -> _Bucket:
+        index = int((now or time.time()) // self.bucket_seconds)
+        bucket = self._buckets[index % len(self._buckets)]
+        if bucket.index != index:
+            bucket.reset(index)
+        return bucket
+
+    def record_extraction(self, file_type: str, ok: bool):
+        file_type = file_type if file_type in EXTRACTION_TYPES else "unsupported"
+        with self._lock:
+            self._bucket().extractions[(file_type, ok)] += 1
+
+    def record_prediction(self, result: Dict[str, Any], fallback: bool = False,
+                          oov_terms: Iterable[str] = (), tokens: int = 0):
+        """
+        Count one predict_domain result. oov_terms are the resume's words
+        missing from the classifier's vocabulary, out of tokens words checked
+        """
+        outcome = "error" if "error" in result else "fallback" if fallback else "ok"
+        oov_terms = list(oov_terms)
+        with self._lock:
+            bucket = self._bucket()
+            bucket.outcomes[outcome] += 1
+            if outcome == "error":
+                return
+            bucket.domains[str(result.get("domain"))] += 1
+            bucket.confidence.add(float(result.get("confidence", 0.0)))
+            if tokens:
+                bucket.tokens += tokens
+                bucket.oov_tokens += len(oov_terms)
+                bucket.oov.add(oov_terms)
+
+    def _merged(self, first_index: int, last_index: int) -> _Bucket:
+        """One bucket summing the buckets with first_index <= index <= last_index"""
+        merged = _Bucket(*self._sketch_shape)
+        merged.index = first_index
+        for bucket in self._buckets:
+            if bucket.index is not None and first_index <= bucket.index <= last_index:
+                merged.outcomes.update(bucket.outcomes)
+                merged.domains.update(bucket.domains)
+                merged.extractions.update(bucket.extractions)
+                merged.confidence.merge(bucket.confidence)
+                merged.oov.merge(bucket.oov)
+                merged.tokens += bucket.tokens
+                merged.oov_tokens += bucket.oov_tokens
+        return merged
+
+    def _summary(self, window: _Bucket) -> Dict[str, Any]:
+        predictions = sum(window.outcomes.values())
+        extractions = sum(window.extractions.values())
+        classified = sum(window.domains.values())
+        by_type: Dict[str, Dict[str, int]] = {}
+        for (file_type, ok), count in window.extractions.items():
+            by_type.setdefault(file_type, {"ok": 0, "failed": 0})["ok" if ok else "failed"] += count
+
+        def rate(part, whole):
+            return round(part / whole, 4) if whole else None
+
+        return {
+            "start": window.index * self.bucket_seconds,
+            "predictions": predictions,
+            "outcomes": {outcome: window.outcomes[outcome] for outcome in OUTCOMES},
+            "fallback_rate": rate(window.outcomes["fallback"], predictions),
+            "error_rate": rate(window.outcomes["error"], predictions),
+            "extractions": by_type,
+            "extraction_failure_rate": rate(extractions - sum(c for (_, ok), c in window.extractions.items() if ok),
+                                            extractions),
+            "confidence": {
+                "mean": window.confidence.mean(),
+                "p10": window.confidence.quantile(0.1),
+                "p50": window.confidence.quantile(0.5),
+                "p90": window.confidence.quantile(0.9)
+            },
+            "domains": {domain: round(count / classified, 4) for domain, count in window.domains.most_common()},
+            "oov_rate": rate(window.oov_tokens, window.tokens),
+            "top_oov_terms": window.oov.top(self.top_terms)
+        }
+
+    @staticmethod
+    def _domain_shift(current: Counter, previous: Counter) -> Dict[str, Optional[float]]:
+        """Jensen-Shannon divergence (bits) and population stability index of the domain mix"""
+        if not current or not previous:
+            return {"js_divergence": None, "psi": None}
+        domains = set(current) | set(previous)
+        total_current, total_previous = sum(current.values()), sum(previous.values())
+        js = psi = 0.0
+        for domain in domains:
+            # Smoothed so a domain missing from one window stays finite
+            p = (current[domain] + 0.5) / (total_current + 0.5 * len(domains))
+            q = (previous[domain] + 0.5) / (total_previous + 0.5 * len(domains))
+            m = (p + q) / 2
+            js += 0.5 * (p * math.log2(p / m) + q * math.log2(q / m))
+            psi += (p - q) * math.log(p / q)
+        return {"js_divergence": round(js, 4), "psi": round(psi, 4)}
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        """Current and previous window summaries with the changes between them"""
+        now = now or time.time()
+        last = int(now // self.bucket_seconds)
+        with self._lock:
+            current = self._merged(last - self.buckets_per_window + 1, last)
+            previous = self._merged(last - 2 * self.buckets_per_window + 1, last - self.buckets_per_window)
+            current_summary, previous_summary = self._summary(current), self._summary(previous)
+            # Previous-window counts of the terms now on top, to spot new ones
+            top_terms = [entry["term"] for entry in current_summary["top_oov_terms"]]
+            previous_counts = previous.oov.estimate(top_terms)
+
+        def delta(*path):
+            a, b = current_summary, previous_summary
+            for key in path:
+                a, b = a[key], b[key]
+            return round(a - b, 4) if a is not None and b is not None else None
+
+        domains = set(current_summary["domains"]) | set(previous_summary["domains"])
+        domain_deltas = sorted(
+            ({"domain": domain,
+              "current": current_summary["domains"].get(domain, 0.0),
+              "previous": previous_summary["domains"].get(domain, 0.0),
+              "delta": round(current_summary["domains"].get(domain, 0.0)
+                             - previous_summary["domains"].get(domain, 0.0), 4)}
+             for domain in domains),
+            key=lambda entry: -abs(entry["delta"])
+        )
+        return {
+            "pid": os.getpid(),
+            "window_seconds": self.window_seconds,
+            "bucket_seconds": self.bucket_seconds,
+            "current": current_summary,
+            "previous": previous_summary,
+            "deltas": {
+                "predictions": current_summary["predictions"] - previous_summary["predictions"],
+                "fallback_rate": delta("fallback_rate"),
+                "error_rate": delta("error_rate"),
+                "extraction_failure_rate": delta("extraction_failure_rate"),
+                "confidence_mean": delta("confidence", "mean"),
+                "confidence_p10": delta("confidence", "p10"),
+                "confidence_p50": delta("confidence", "p50"),
+                "oov_rate": delta("oov_rate"),
+                "domain_shift": self._domain_shift(current.domains, previous.domains),
+                "domains": domain_deltas[:10],
+                "oov_terms": [{**entry, "previous": count, "delta": entry["count"] - count}
+                              for entry, count in zip(current_summary["top_oov_terms"], previous_counts)]
+            },
+            "memory_bytes": sum(b.oov.nbytes + b.confidence.nbytes for b in self._buckets)
+        }
@@ -0,0 +1,592 @@
+import asyncio
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import deadlines
+
+# Per-request context: a mutable info dict (so a file type set deep inside a
+# handler is visible to the middleware) and the stack of open stages
+_request_info: ContextVar[Optional[dict]] = ContextVar("request_info", default=None)
+_stage_stack: ContextVar[tuple] = ContextVar("stage_stack", default=())
+# The RequestProfiler's record for the request being handled, if any
+_request_record: ContextVar[Optional["RequestRecord"]] = ContextVar("request_record", default=None)
+
+MB = 1024 * 1024
+
+
+class _StageFrame:
+    """Bookkeeping for one open stage; peak_seen collects peaks of nested stages"""
+    __slots__ = ("name", "start_current", "peak_seen", "reported")
+
+    def __init__(self, name: str, start_current: int):
+        self.name = name
+        self.start_current = start_current
+        self.peak_seen = start_current
+        self.reported = False
+
+
+class MemoryProfiler:
+    """
+    Opt-in tracemalloc accounting for pipeline stages.
+
+    Records peak and net allocation per stage and file type, and keeps the
+    top allocating call sites for any stage whose peak crosses the threshold.
+    tracemalloc counters are process-wide, so numbers are exact when a worker
+    handles one request at a time and approximate under concurrency.
+    """
+
+    def __init__(self, enabled: bool = False, threshold_mb: float = 50.0,
+                 top_n: int = 15, max_reports: int = 20, frames: int = 10):
+        self.enabled = enabled
+        self.threshold_bytes = int(threshold_mb * MB)
+        self.top_n = top_n
+        self.frames = frames
+        self.reports = deque(maxlen=max_reports)
+        self._stats: Dict[tuple, Dict[str, float]] = {}
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    @classmethod
+    def from_env(cls) -> "MemoryProfiler":
+        """Build a profiler from MEMORY_PROFILE* environment variables"""
+        return cls(
+            enabled=os.getenv("MEMORY_PROFILE", "0") == "1",
+            threshold_mb=float(os.getenv("MEMORY_PROFILE_THRESHOLD_MB", "50")),
+            top_n=int(os.getenv("MEMORY_PROFILE_TOP_N", "15"))
+        )
+
+    def take_baseline(self):
+        """Snapshot steady-state memory (models loaded) to diff reports against"""
+        if self.enabled:
+            self._baseline = tracemalloc.take_snapshot()
+
+    @contextmanager
+    def request(self):
+        """Measure a whole request; stages inside it are grouped by its file type"""
+        token = _request_info.set({"file_type": "unknown"})
+        try:
+            with self.stage("request"):
+                yield
+        finally:
+            _request_info.reset(token)
+
+    @staticmethod
+    def set_file_type(file_type: str):
+        """Record the current request's file type once the upload is validated"""
+        info = _request_info.get()
+        if info is not None:
+            info["file_type"] = file_type
+
+    @staticmethod
+    def _file_type() -> str:
+        info = _request_info.get()
+        return info["file_type"] if info is not None else "unknown"
+
+    @contextmanager
+    def stage(self, name: str):
+        """Measure peak and net allocation of the enclosed block"""
+        if not self.enabled:
+            yield
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        stack = _stage_stack.get()
+        if stack:
+            # Preserve the enclosing stage's peak before resetting the counter
+            stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+        tracemalloc.reset_peak()
+
+        frame = _StageFrame(name, current)
+        token = _stage_stack.set(stack + (frame,))
+        try:
+            yield
+        finally:
+            end_current, end_peak = tracemalloc.get_traced_memory()
+            peak = max(frame.peak_seen, end_peak)
+            _stage_stack.reset(token)
+            if stack:
+                stack[-1].peak_seen = max(stack[-1].peak_seen, peak)
+
+            peak_alloc = peak - frame.start_current
+            self._record(name, peak_alloc, end_current - frame.start_current)
+
+            # Report the innermost offending stage once rather than every
+            # enclosing stage that inherits its peak
+            if peak_alloc >= self.threshold_bytes and not frame.reported:
+                self._report(name, peak_alloc)
+                frame.reported = True
+            if frame.reported:
+                for outer in stack:
+                    outer.reported = True
+
+    def _record(self, name: str, peak_alloc: int, net_alloc: int):
+        """Aggregate one stage measurement under (stage, file type)"""
+        key = (name, self._file_type())
+        with self._lock:
+            stats = self._stats.setdefault(key, {
+                "count": 0, "peak_total": 0, "peak_max": 0, "net_total": 0
+            })
+            stats["count"] += 1
+            stats["peak_total"] += peak_alloc
+            stats["peak_max"] = max(stats["peak_max"], peak_alloc)
+            stats["net_total"] += net_alloc
+
+    def _report(self, name: str, peak_alloc: int):
+        """Capture the top call sites holding memory as an over-threshold stage ends"""
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+        if self._baseline is not None:
+            top = snapshot.compare_to(self._baseline, "traceback")[:self.top_n]
+            sites = [self._format_site(stat.traceback, stat.size_diff, stat.count_diff) for stat in top]
+        else:
+            top = snapshot.statistics("traceback")[:self.top_n]
+            sites = [self._format_site(stat.traceback, stat.size, stat.count) for stat in top]
+
+        self.reports.append({
+            "timestamp": time.time(),
+            "stage": name,
+            "file_type": self._file_type(),
+            "peak_mb": round(peak_alloc / MB, 2),
+            "top_allocations": sites
+        })
+
+    @staticmethod
+    def _format_site(traceback, size: int, count: int) -> Dict[str, object]:
+        return {
+            "size_mb": round(size / MB, 3),
+            "blocks": count,
+            "traceback": [f"{frame.filename}:{frame.lineno}" for frame in traceback]
+        }
+
+    def summary(self) -> Dict[str, object]:
+        """Aggregate statistics per stage and file type plus recent reports"""
+        if not self.enabled:
+            return {"enabled": False}
+
+        with self._lock:
+            stages: List[Dict[str, object]] = [
+                {
+                    "stage": stage_name,
+                    "file_type": file_type,
+                    "count": stats["count"],
+                    "avg_peak_mb": round(stats["peak_total"] / stats["count"] / MB, 3),
+                    "max_peak_mb": round(stats["peak_max"] / MB, 3),
+                    "avg_net_mb": round(stats["net_total"] / stats["count"] / MB, 3)
+                }
+                for (stage_name, file_type), stats in sorted(self._stats.items())
+            ]
+
+        current, _ = tracemalloc.get_traced_memory()
+        return {
+            "enabled": True,
+            "threshold_mb": round(self.threshold_bytes / MB, 2),
+            "traced_memory_mb": round(current / MB, 2),
+            "stages": stages,
+            "reports": list(self.reports)
+        }
+
+
+class RequestRecord:
+    """Stage timings, upload details and collected profiles of one request"""
+    __slots__ = ("sampled", "replay", "stages", "info", "profiles", "lock")
+
+    def __init__(self, sampled: bool, replay: bool = False):
+        self.sampled = sampled
+        self.replay = replay
+        self.stages: Dict[str, float] = {}
+        self.info: Dict[str, Any] = {}
+        self.profiles: List[cProfile.Profile] = []
+        self.lock = threading.Lock()
+
+
+class ProfileStore:
+    """
+    Bounded on-disk ring buffer of request profiles. Each entry is a pstats
+    dump (<id>.prof, loadable with pstats or snakeviz) plus its metadata
+    (<id>.json); ids start with the timestamp, so the oldest entries are
+    deleted first once max_profiles is exceeded. Safe to share between
+    worker processes.
+    """
+
+    ID_PATTERN = re.compile(r"^[0-9]{13}-[0-9]+-[0-9]+$")
+
+    def __init__(self, directory: str, max_profiles: int = 200):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def save(self, metadata: Dict[str, Any], stats: Optional[pstats.Stats]) -> str:
+        with self._lock:
+            self._counter += 1
+            profile_id = f"{int(metadata['timestamp'] * 1000):013d}-{os.getpid()}-{self._counter}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        metadata = {"id": profile_id, **metadata, "has_profile": stats is not None}
+        if stats is not None:
+            tmp_path = self.directory / f".{profile_id}.prof.tmp"
+            stats.dump_stats(tmp_path)
+            os.replace(tmp_path, self.directory / f"{profile_id}.prof")
+        # The metadata lands last, so a listed entry always has its profile
+        tmp_path = self.directory / f".{profile_id}.json.tmp"
+        tmp_path.write_text(json.dumps(metadata, default=str))
+        os.replace(tmp_path, self.directory / f"{profile_id}.json")
+        self._prune()
+        return profile_id
+
+    def _ids(self) -> List[str]:
+        try:
+            return sorted(entry.name[:-5] for entry in os.scandir(self.directory)
+                          if entry.name.endswith(".json") and not entry.name.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def _prune(self):
+        ids = self._ids()
+        for profile_id in ids[:max(len(ids) - self.max_profiles, 0)]:
+            for suffix in (".json", ".prof"):
+                try:
+                    os.unlink(self.directory / f"{profile_id}{suffix}")
+                except FileNotFoundError:
+                    pass
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Newest first, without the per-function breakdown"""
+        entries = []
+        for profile_id in reversed(self._ids()):
+            metadata = self.get(profile_id)
+            if metadata is not None:
+                metadata.pop("top_functions", None)
+                entries.append(metadata)
+            if len(entries) >= limit:
+                break
+        return entries
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if not self.ID_PATTERN.match(profile_id):
+            return None
+        try:
+            return json.loads((self.directory / f"{profile_id}.json").read_text())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def profile_path(self, profile_id: str) -> Optional[Path]:
+        if not self.ID_PATTERN.match(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.prof"
+        return path if path.exists() else None
+
+
+class RequestProfiler:
+    """
+    Sampling cProfile capture for slow-request investigations.
+
+    Every request gets a RequestRecord holding its per-stage timings (a few
+    perf_counter calls). A sample_rate fraction of requests is profiled as
+    it runs: each outermost stage running in a worker thread is wrapped in
+    cProfile, since analyzers run via asyncio.to_thread and a profiler on
+    the event loop thread would miss them (and pick up other requests).
+    A request that exceeds threshold_ms without having been sampled is
+    replayed once in the background under the profiler with caches bypassed
+    (one replay at a time per worker), since it cannot be profiled after
+    the fact. A replay holds a heavy admission slot and is kept out of the
+    prediction monitor and feature store; when it cannot run (replay off,
+    body too large, another replay in flight, no slot free) the slow
+    request still gets its timings and upload details stored. Profiles
+    land in a ProfileStore together with the file type, size, page count
+    and stage timings of the original request.
+    """
+
+    def __init__(self, store: ProfileStore, enabled: bool = True, sample_rate: float = 0.01,
+                 threshold_ms: float = 2000.0, replay: bool = True,
+                 replay_max_bytes: int = 10 * MB, paths=("/api/",), top_functions: int = 25):
+        self.store = store
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.threshold = threshold_ms / 1000
+        self.replay = replay
+        self.replay_max_bytes = replay_max_bytes
+        self.paths = tuple(paths)
+        self.top_functions = top_functions
+        self._local = threading.local()
+        self._replaying = False
+        # Bumped from the event loop, executor threads and replays alike
+        self._counters_lock = threading.Lock()
+        self.counters = {"requests": 0, "sampled": 0, "slow": 0, "replayed": 0,
+                         "replays_skipped": 0, "stored": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls) -> "RequestProfiler":
+        """Build from SLOW_PROFILE_* environment variables; SLOW_PROFILE_ENABLED=0 disables it"""
+        env = os.getenv
+        return cls(
+            ProfileStore(env("SLOW_PROFILE_DIR", "cache/profiles"), int(env("SLOW_PROFILE_MAX", "200"))),
+            enabled=env("SLOW_PROFILE_ENABLED", "1") == "1",
+            sample_rate=float(env("SLOW_PROFILE_SAMPLE_RATE", "0.01")),
+            threshold_ms=float(env("SLOW_PROFILE_THRESHOLD_MS", "2000")),
+            replay=env("SLOW_PROFILE_REPLAY", "1") == "1",
+            paths=[p.strip() for p in env("SLOW_PROFILE_PATHS", "/api/").split(",") if p.strip()]
+        )
+
+    @staticmethod
+    def annotate(**info):
+        """Attach upload details (file type, size, pages) to the current request"""
+        record = _request_record.get()
+        if record is not None:
+            record.info.update(info)
+
+    @staticmethod
+    def replaying() -> bool:
+        """True while a slow request is being replayed; caches and telemetry must be bypassed"""
+        record = _request_record.get()
+        return record is not None and record.replay
+
+    @contextmanager
+    def stage(self, record: RequestRecord, name: str):
+        """Time a stage and profile it when the request is sampled"""
+        profile = None
+        if record.sampled and not getattr(self._local, "active", False) and not _in_event_loop():
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                self._local.active = True
+            except ValueError:
+                # Another profiler is active in this interpreter (Python 3.12+)
+                profile = None
+        start = time.perf_counter()
+        try:
+            with memory_profiler.stage(name):
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                self._local.active = False
+            with record.lock:
+                record.stages[name] = record.stages.get(name, 0.0) + elapsed
+                if profile is not None:
+                    record.profiles.append(profile)
+
+    def _metadata(self, scope, record: RequestRecord, status: int, elapsed: float,
+                  reason: str, original: Optional[RequestRecord] = None) -> Dict[str, Any]:
+        source = original or record
+        return {
+            "timestamp": time.time(),
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "reason": reason,
+            "elapsed_ms": round(elapsed * 1000, 2),
+            **source.info,
+            "stage_timings_ms": {k: round(v * 1000, 2) for k, v in source.stages.items()},
+            "replay_stage_timings_ms": ({k: round(v * 1000, 2) for k, v in record.stages.items()}
+                                        if original is not None else None)
+        }
+
+    def _stats(self, record: RequestRecord) -> Optional[pstats.Stats]:
+        if not record.profiles:
+            return None
+        stats = pstats.Stats(record.profiles[0])
+        for profile in record.profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def _top_functions(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        rows = sorted(stats.stats.items(), key=lambda item: -item[1][3])[:self.top_functions]
+        return [{
+            "function": f"{filename}:{line}({function})",
+            "calls": calls,
+            "total_ms": round(total * 1000, 2),
+            "cumulative_ms": round(cumulative * 1000, 2)
+        } for (filename, line, function), (_, calls, total, cumulative, _) in rows]
+
+    def count(self, name: str, amount: int = 1):
+        with self._counters_lock:
+            self.counters[name] += amount
+
+    def save(self, metadata: Dict[str, Any], record: RequestRecord):
+        """Write one profile to the store (runs in a worker thread)"""
+        try:
+            stats = self._stats(record)
+            if stats is not None:
+                metadata["top_functions"] = self._top_functions(stats)
+            self.store.save(metadata, stats)
+            self.count("stored")
+        except Exception as e:
+            self.count("errors")
+            print(f"❌ Error saving request profile: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._counters_lock:
+            counters = dict(self.counters)
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "threshold_ms": self.threshold * 1000,
+            "replay": self.replay,
+            **counters
+        }
+
+
+def _in_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class RequestProfilerMiddleware:
+    """ASGI middleware feeding a RequestProfiler; add it inside admission so replays are charged to it"""
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+        self._pending = set()
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if (scope["type"] != "http" or not profiler.enabled
+                or not scope["path"].startswith(profiler.paths)):
+            return await self.app(scope, receive, send)
+
+        profiler.count("requests")
+        record = RequestRecord(sampled=random.random() < profiler.sample_rate)
+        profiler.count("sampled", record.sampled)
+        # The body is kept (as references to the received chunks) so a slow
+        # request can be replayed; unsampled fast requests drop it on return
+        body: Optional[list] = [] if profiler.replay and not record.sampled else None
+        status = 500
+
+        async def recording_receive():
+            nonlocal body
+            message = await receive()
+            if body is not None and message["type"] == "http.request":
+                body.append(message)
+                if sum(len(m.get("body", b"")) for m in body) > profiler.replay_max_bytes:
+                    body = None
+            return message
+
+        async def recording_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        token = _request_record.set(record)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, recording_receive if body is not None else receive, recording_send)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_record.reset(token)
+
+        if record.sampled:
+            self._background(profiler.save, profiler._metadata(scope, record, status, elapsed, "sampled"), record)
+        elif elapsed >= profiler.threshold:
+            profiler.count("slow")
+            if body is None or profiler._replaying:
+                profiler.count("replays_skipped")
+                # Still keep the timings and upload details of the slow request
+                self._background(profiler.save, profiler._metadata(scope, record, status, elapsed, "slow"), record)
+            else:
+                profiler._replaying = True
+                task = asyncio.ensure_future(self._replay(scope, body, record, status, elapsed))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+
+    def _background(self, func, *args):
+        future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+
+    async def _replay(self, scope, body: list, original: RequestRecord, status: int, elapsed: float):
+        """Re-run a slow request under the profiler, discarding its response"""
+        # admission imports utils, which imports this module
+        from admission import ItemRejected, admit_background
+
+        profiler = self.profiler
+        record = RequestRecord(sampled=True, replay=True)
+        # Incremental revision state must not be touched by the replay
+        headers = [(k, v) for k, v in scope.get("headers", []) if k != b"x-document-id"]
+        replay_scope = {**scope, "headers": headers}
+        messages = iter(body)
+        finished = asyncio.Event()
+
+        async def replay_receive():
+            message = next(messages, None)
+            if message is not None:
+                return message
+            await finished.wait()
+            return {"type": "http.disconnect"}
+
+        async def discard(message):
+            pass
+
+        token = _request_record.set(record)
+        start = time.perf_counter()
+        try:
+            # Replays compete for the heavy lane like uploads do. The original
+            # request's deadline has already been spent
+            async with admit_background():
+                with deadlines.use(None):
+                    await self.app(replay_scope, replay_receive, discard)
+            profiler.count("replayed")
+            metadata = profiler._metadata(scope, record, status, elapsed, "slow_replay", original)
+            metadata["replay_elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            await asyncio.to_thread(profiler.save, metadata, record)
+        except ItemRejected:
+            profiler.count("replays_skipped")
+            metadata = profiler._metadata(scope, original, status, elapsed, "slow")
+            await asyncio.to_thread(profiler.save, metadata, original)
+        except Exception as e:
+            profiler.count("errors")
+            print(f"❌ Error replaying slow request: {e}")
+        finally:
+            finished.set()
+            _request_record.reset(token)
+            profiler._replaying = False
+
+
+memory_profiler = MemoryProfiler.from_env()
+request_profiler = RequestProfiler.from_env()
+
+
+def stage(name: str):
+    """
+    Instrument a pipeline stage; timing is skipped outside profiled requests.
+    Entering a stage is also a deadline check, and stages that finish are
+    recorded on the request's deadline
+    """
+    deadline = deadlines.current()
+    if deadline is not None:
+        deadline.check(name)
+    record = _request_record.get()
+    if record is None:
+        context = memory_profiler.stage(name)
+    else:
+        context = request_profiler.stage(record, name)
+    return context if deadline is None else _completing(deadline, name, context)
+
+
+@contextmanager
+def _completing(deadline, name: str, context):
+    with context:
+        yield
+    deadline.stage_completed(name)
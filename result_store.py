@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+def fingerprint(*parts: Any) -> str:
+    """Short stable hash of strings/bytes/JSON-serializable values, used as a version tag"""
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = json.dumps(part, sort_keys=True, default=str).encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()[:16]
+
+
+def file_fingerprint(*paths: str) -> str:
+    """Version tag derived from the contents of model/data files"""
+    parts = []
+    for path in paths:
+        try:
+            parts.append(Path(path).read_bytes())
+        except OSError:
+            parts.append(f"missing:{path}")
+    return fingerprint(*parts)
+
+
+def content_hash(file_content: bytes) -> str:
+    """SHA-256 of an uploaded file"""
+    return hashlib.sha256(file_content).hexdigest()
+
+
+class ResultStore:
+    """
+    Persistent cache of analysis results in SQLite.
+
+    Keys combine the upload's SHA-256, the analyzer name and the analyzer's
+    model/ruleset version, so results survive restarts and are invalidated
+    automatically when a model or ruleset changes. WAL mode lets many worker
+    processes read concurrently while one writes. Eviction is size-based LRU;
+    access times are refreshed at most once per touch_interval so reads
+    stay read-only in the common case.
+    """
+
+    busy_timeout = 5.0
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024,
+                 touch_interval: float = 300.0, evict_every: int = 200):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self.evict_every = evict_every
+        self._local = threading.local()
+        self._puts_since_evict = 0
+        self._lock = threading.Lock()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS results_last_access ON results (last_access)")
+
+    @classmethod
+    def from_env(cls) -> Optional["ResultStore"]:
+        """Build a store from RESULT_STORE_* environment variables; empty path disables it"""
+        path = os.getenv("RESULT_STORE_PATH", "cache/results.sqlite3")
+        if not path:
+            return None
+        try:
+            return cls(path, max_bytes=int(float(os.getenv("RESULT_STORE_MAX_MB", "512")) * 1024 * 1024))
+        except sqlite3.Error as e:
+            print(f"❌ Error opening result store: {e}")
+            return None
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread and process; SQLite connections must not be shared"""
+        conn = getattr(self._local, "conn", None)
+        # A connection inherited across fork (pre-fork workers) is never reused
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def make_key(file_hash: str, analyzer: str, version: str, *params: Any) -> str:
+        """Build a store key; params capture request options that change the result"""
+        return "|".join([file_hash, analyzer, version] + [str(p) for p in params])
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the stored values for whichever keys are present"""
+        keys = list(keys)
+        if not keys:
+            return {}
+
+        conn = self._connection()
+        placeholders = ",".join("?" * len(keys))
+        try:
+            rows = conn.execute(
+                f"SELECT key, value, last_access FROM results WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Result store read failed: {e}")
+            return {}
+
+        now = time.time()
+        stale = [key for key, _, last_access in rows if now - last_access > self.touch_interval]
+        if stale:
+            # Recency is best effort: skip the touch rather than wait out a busy writer
+            conn.execute("PRAGMA busy_timeout = 0")
+            try:
+                conn.executemany("UPDATE results SET last_access = ? WHERE key = ?",
+                                 [(now, key) for key in stale])
+            except sqlite3.Error:
+                pass
+            finally:
+                conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+
+        return {key: json.loads(value) for key, value, _ in rows}
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, Any]):
+        """Store results, evicting least recently used entries when over budget"""
+        if not items:
+            return
+
+        now = time.time()
+        rows = []
+        for key, value in items.items():
+            payload = json.dumps(value, default=str).encode("utf-8")
+            rows.append((key, payload, len(payload) + len(key), now))
+
+        conn = self._connection()
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                rows
+            )
+        except sqlite3.Error as e:
+            print(f"Result store write failed: {e}")
+            return
+
+        with self._lock:
+            self._puts_since_evict += len(rows)
+            due = self._puts_since_evict >= self.evict_every
+            if due:
+                self._puts_since_evict = 0
+        if due:
+            self.evict()
+
+    def put(self, key: str, value: Any):
+        self.put_many({key: value})
+
+    def evict(self):
+        """Delete least recently used entries until the store fits max_bytes"""
+        conn = self._connection()
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+
+            # Trim to 90% so eviction is not triggered again on the next write
+            excess = total - int(self.max_bytes * 0.9)
+            freed = 0
+            victims = []
+            cursor = conn.execute("SELECT key, size FROM results ORDER BY last_access")
+            for key, size in cursor:
+                victims.append((key,))
+                freed += size
+                if freed >= excess:
+                    break
+            cursor.close()
+            conn.executemany("DELETE FROM results WHERE key = ?", victims)
+        except sqlite3.Error as e:
+            print(f"Result store eviction failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connection()
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"path": self.path, "entries": count, "bytes": total, "max_bytes": self.max_bytes}
@@ -0,0 +1,341 @@
+"""
+Declarative resume improvement rules.
+
+Rules are loaded from a JSON file (public/models/improvement_rules.json) so
+new suggestions need no code changes. A rule has a matcher, a condition on
+how often it matched, and the suggestion shown when the condition holds:
+
+- "pattern" (a regular expression, case-insensitive unless
+  "case_sensitive" is true) or "keywords" (words and phrases matched on
+  whole tokens, ignoring case) and "case_sensitive_keywords" (e.g. "R")
+- "min_count" (default 1) and "max_count" (default none): the suggestion
+  is shown when the match count is outside this range. Keyword presence
+  is the default, "never mention X" is max_count 0, and "at least three
+  metrics" is min_count 3
+- "section": only count matches below a heading of that section, using
+  the heading names listed under "sections"
+- "domains": only apply to resumes classified into these domains
+- "category", "title", "description", "example" and "priority"
+  ("high", "medium" or "low")
+
+RuleSet compiles every rule together so a resume is tokenized and scanned
+once however many rules there are. Keywords go into one token-level trie.
+Patterns that start with \b and a literal word (e.g. \bpython\s+\d) are
+indexed by the word's first letters and only tried at word starts with that
+prefix. The remaining patterns share one lookahead alternation that finds
+the places where any of them matches; each is then tried there on its own,
+so every pattern counts its matches as re.finditer would, even where they
+overlap another pattern's. Rules with the same matcher share it.
+"""
+import bisect
+import json
+import re
+from collections import Counter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from result_store import fingerprint
+from skills import TOKEN_PATTERN, tokenize
+
+PRIORITIES = {"high": 0, "medium": 1, "low": 2}
+
+# A line holding only a few words, optionally ending in a colon
+HEADING_PATTERN = re.compile(r'^[ \t]*([A-Za-z][A-Za-z &/]{0,40}?)[ \t]*:?[ \t\r]*$', re.MULTILINE)
+
+# Positions where a pattern starting with \b and a word character can match
+WORD_START_PATTERN = re.compile(r'\b\w')
+# A leading \b followed by literal word characters, as in \bpython\s+\d
+LEADING_WORD_PATTERN = re.compile(r'\\b(\w+)')
+# Letters of a pattern's leading word used to index it
+ANCHOR_LENGTH = 3
+
+# Trie node key listing the matchers whose keyword ends at that node
+_END = None
+
+
+def _has_top_level_branch(pattern: str) -> bool:
+    """Whether pattern is an alternation outside any group, like \\bfoo|bar"""
+    depth = 0
+    in_class = False
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == "\\":
+            position += 1
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+            # A "]" right after "[" or "[^" is a literal member of the class
+            if pattern[position + 1:position + 2] == "^":
+                position += 1
+            if pattern[position + 1:position + 2] == "]":
+                position += 1
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+        position += 1
+    return False
+
+
+def _leading_word(pattern: str) -> str:
+    """The literal word every match starts with after a leading \\b, or "" if there is none"""
+    match = LEADING_WORD_PATTERN.match(pattern)
+    if not match or _has_top_level_branch(pattern):
+        return ""
+    word = match.group(1)
+    # A quantifier may drop the word's last character (\bpythons?)
+    if pattern[match.end():match.end() + 1] in ("*", "?", "{"):
+        word = word[:-1]
+    return word
+
+
+class RuleError(ValueError):
+    """The rules file is malformed"""
+
+
+class Rule:
+    """One compiled rule: which matcher it counts and when it fires"""
+
+    __slots__ = ("id", "matcher", "section", "min_count", "max_count", "suggestion")
+
+    def __init__(self, rule_id: str, matcher: int, section: Optional[str], min_count: int,
+                 max_count: Optional[int], suggestion: Dict[str, str]):
+        self.id = rule_id
+        self.matcher = matcher
+        self.section = section
+        self.min_count = min_count
+        self.max_count = max_count
+        self.suggestion = suggestion
+
+    def fires(self, count: int) -> bool:
+        return count < self.min_count or (self.max_count is not None and count > self.max_count)
+
+
+class RuleSet:
+    """
+    Rules compiled for single-pass evaluation.
+
+    scan() returns match counts keyed by (matcher, section) and evaluate()
+    turns such counts into suggestions for a domain.
+    """
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.version = fingerprint(spec)
+
+        self._sections: Dict[str, str] = {}
+        for section, headings in spec.get("sections", {}).items():
+            for heading in [section] + list(headings):
+                self._sections[" ".join(heading.lower().split())] = section
+
+        self._matchers: Dict[tuple, int] = {}
+        self._patterns: List[str] = []
+        self._unanchored: List[Tuple[re.Pattern, int]] = []
+        self._anchored: Dict[str, List[Tuple[re.Pattern, int]]] = {}
+        self._anchor_lengths: List[int] = []
+        self._trie: Dict = {}
+        self._case_sensitive_trie: Dict = {}
+
+        self.rules: List[Rule] = []
+        global_rules = []
+        domain_rules: Dict[str, List[Tuple[int, Rule]]] = {}
+        for index, entry in enumerate(spec.get("rules", [])):
+            rule = self._compile_rule(index, entry)
+            self.rules.append(rule)
+            if entry.get("domains"):
+                for domain in entry["domains"]:
+                    domain_rules.setdefault(domain, []).append((index, rule))
+            else:
+                global_rules.append((index, rule))
+
+        # Rules per domain in file order, so suggestions of equal priority keep it
+        self._global_rules = [rule for _, rule in global_rules]
+        self._domain_rules = {
+            domain: [rule for _, rule in sorted(global_rules + rules, key=lambda item: item[0])]
+            for domain, rules in domain_rules.items()
+        }
+        self.sectioned = any(rule.section for rule in self.rules)
+        self._anchor_lengths = sorted({len(anchor) for anchor in self._anchored})
+
+        try:
+            # Zero-width, so finditer reports every place where some pattern matches
+            self._regex = re.compile(f"(?=(?:{'|'.join(self._patterns)}))") if self._patterns else None
+        except re.error as e:
+            raise RuleError(f"Rule patterns do not combine: {e}") from e
+
+    def _compile_rule(self, index: int, entry: Dict[str, Any]) -> Rule:
+        rule_id = entry.get("id") or f"rule_{index}"
+        missing = [key for key in ("category", "title", "description", "example", "priority") if not entry.get(key)]
+        if missing:
+            raise RuleError(f"Rule {rule_id} is missing {', '.join(missing)}")
+        if entry["priority"] not in PRIORITIES:
+            raise RuleError(f"Rule {rule_id} has unknown priority {entry['priority']!r}")
+        section = entry.get("section")
+        if section is not None and section not in self._sections.values():
+            raise RuleError(f"Rule {rule_id} uses undefined section {section!r}")
+
+        if "pattern" in entry:
+            matcher = self._add_pattern(rule_id, entry["pattern"], bool(entry.get("case_sensitive", False)))
+        elif entry.get("keywords") or entry.get("case_sensitive_keywords"):
+            matcher = self._add_keywords(rule_id, entry.get("keywords", []),
+                                         entry.get("case_sensitive_keywords", []))
+        else:
+            raise RuleError(f"Rule {rule_id} needs a pattern or keywords")
+
+        return Rule(
+            rule_id, matcher, section,
+            min_count=int(entry.get("min_count", 1)),
+            max_count=None if entry.get("max_count") is None else int(entry["max_count"]),
+            suggestion={key: entry[key] for key in ("category", "title", "description", "example", "priority")}
+        )
+
+    def _add_pattern(self, rule_id: str, pattern: str, case_sensitive: bool) -> int:
+        key = ("pattern", pattern, case_sensitive)
+        if key in self._matchers:
+            return self._matchers[key]
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise RuleError(f"Rule {rule_id} has an invalid pattern: {e}") from e
+        if compiled.groupindex:
+            raise RuleError(f"Rule {rule_id}: named groups are not supported in patterns")
+        if compiled.match(""):
+            raise RuleError(f"Rule {rule_id}: pattern matches the empty string")
+
+        matcher = self._matchers[key] = len(self._matchers)
+        compiled = compiled if case_sensitive else re.compile(pattern, re.IGNORECASE)
+        word = _leading_word(pattern)
+        if word:
+            self._anchored.setdefault(word[:ANCHOR_LENGTH].lower(), []).append((compiled, matcher))
+        else:
+            self._patterns.append(f"(?:{pattern})" if case_sensitive else f"(?i:{pattern})")
+            self._unanchored.append((compiled, matcher))
+        return matcher
+
+    def _add_keywords(self, rule_id: str, keywords: List[str], case_sensitive_keywords: List[str]) -> int:
+        phrases = frozenset(tuple(t.lower() for t in tokenize(keyword)) for keyword in keywords) - {()}
+        exact_phrases = frozenset(tuple(tokenize(keyword)) for keyword in case_sensitive_keywords) - {()}
+        if not (phrases or exact_phrases):
+            raise RuleError(f"Rule {rule_id} has no usable keywords")
+        key = ("keywords", phrases, exact_phrases)
+        if key in self._matchers:
+            return self._matchers[key]
+
+        matcher = self._matchers[key] = len(self._matchers)
+        for trie, trie_phrases in ((self._trie, phrases), (self._case_sensitive_trie, exact_phrases)):
+            for phrase in trie_phrases:
+                node = trie
+                for token in phrase:
+                    node = node.setdefault(token, {})
+                node.setdefault(_END, []).append(matcher)
+        return matcher
+
+    @classmethod
+    def from_file(cls, path: str) -> "RuleSet":
+        with open(path, encoding="utf-8") as f:
+            try:
+                spec = json.load(f)
+            except json.JSONDecodeError as e:
+                raise RuleError(f"Invalid rules file {path}: {e}") from e
+        return cls(spec)
+
+    def _headings(self, text: str) -> Tuple[List[int], List[str]]:
+        """Start offsets and sections of the heading lines in text"""
+        starts, sections = [], []
+        for match in HEADING_PATTERN.finditer(text):
+            section = self._sections.get(" ".join(match.group(1).lower().split()))
+            if section is not None:
+                starts.append(match.start())
+                sections.append(section)
+        return starts, sections
+
+    def _matches(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """(start, end, matcher) of every pattern and keyword match in text"""
+        # Like finditer, a pattern's next match starts after its previous one
+        resume_at: Dict[int, int] = {}
+        if self._regex is not None:
+            for hit in self._regex.finditer(text):
+                start = hit.start()
+                for regex, matcher in self._unanchored:
+                    if start < resume_at.get(matcher, 0):
+                        continue
+                    match = regex.match(text, start)
+                    if match:
+                        resume_at[matcher] = match.end()
+                        yield start, match.end(), matcher
+
+        if self._anchored:
+            anchored = self._anchored
+            for word_start in WORD_START_PATTERN.finditer(text):
+                start = word_start.start()
+                for length in self._anchor_lengths:
+                    for regex, matcher in anchored.get(text[start:start + length].lower(), ()):
+                        if start < resume_at.get(matcher, 0):
+                            continue
+                        match = regex.match(text, start)
+                        if match:
+                            resume_at[matcher] = match.end()
+                            yield start, match.end(), matcher
+
+        if not (self._trie or self._case_sensitive_trie):
+            return
+        found = list(TOKEN_PATTERN.finditer(text))
+        tokens = [match.group() for match in found]
+        tries = []
+        if self._trie:
+            tries.append((self._trie, [token.lower() for token in tokens]))
+        if self._case_sensitive_trie:
+            tries.append((self._case_sensitive_trie, tokens))
+        for trie, words in tries:
+            # Most tokens start no keyword; filter them in one pass
+            for start in [i for i, word in enumerate(words) if word in trie]:
+                node = trie
+                position = start
+                while position < len(words):
+                    node = node.get(words[position])
+                    if node is None:
+                        break
+                    position += 1
+                    for matcher in node.get(_END, ()):
+                        yield found[start].start(), found[position - 1].end(), matcher
+
+    def scan(self, text: str) -> Counter:
+        """Match counts of every matcher in text, keyed by (matcher, section)"""
+        counts = Counter()
+        if not self.sectioned:
+            for _, _, matcher in self._matches(text):
+                counts[matcher, None] += 1
+            return counts
+
+        starts, sections = self._headings(text)
+        for start, _, matcher in self._matches(text):
+            index = bisect.bisect_right(starts, start) - 1
+            counts[matcher, sections[index] if index >= 0 else None] += 1
+        return counts
+
+    def evaluate(self, counts: Counter, domain: str = "General") -> List[Dict[str, str]]:
+        """Suggestions of the rules that fire for these counts, highest priority first"""
+        totals = Counter()
+        for (matcher, _), count in counts.items():
+            totals[matcher] += count
+
+        suggestions = []
+        for rule in self._domain_rules.get(domain, self._global_rules):
+            count = counts[rule.matcher, rule.section] if rule.section else totals[rule.matcher]
+            if rule.fires(count):
+                suggestions.append(dict(rule.suggestion))
+        suggestions.sort(key=lambda suggestion: PRIORITIES[suggestion["priority"]])
+        return suggestions
+
+
+def load_rule_set(path: str) -> Optional[RuleSet]:
+    """Load the improvement rules, returning None if the file is missing"""
+    try:
+        rule_set = RuleSet.from_file(path)
+        print(f"✅ Improvement rules loaded ({len(rule_set.rules)} rules)")
+        return rule_set
+    except FileNotFoundError as e:
+        print(f"❌ Error loading improvement rules: {e}")
+        return None
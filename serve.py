@@ -0,0 +1,224 @@
+"""
+Production launcher for the Resume Analyzer API.
+
+Loads the models once in a parent process, freezes the garbage collector so
+the loaded objects stay in shared copy-on-write pages, then forks uvicorn
+workers that all accept on one listening socket. Workers are recycled after
+a number of requests and drained gracefully on SIGTERM.
+
+Usage:
+    python serve.py --port 8000 --workers 4 --max-requests 5000
+"""
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+
+def default_worker_count() -> int:
+    """One worker per CPU available to this process (requests are CPU-bound)"""
+    try:
+        return max(len(os.sched_getaffinity(0)), 1)
+    except AttributeError:
+        return max(os.cpu_count() or 1, 1)
+
+
+def read_memory_stats(pid: int) -> Dict[str, int]:
+    """Return Rss/Pss/Shared/Private memory in KB for a process (Linux only)"""
+    stats = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    stats[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return {}
+
+    return {
+        "rss_kb": stats.get("Rss", 0),
+        "pss_kb": stats.get("Pss", 0),
+        "shared_kb": stats.get("Shared_Clean", 0) + stats.get("Shared_Dirty", 0),
+        "private_kb": stats.get("Private_Clean", 0) + stats.get("Private_Dirty", 0)
+    }
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Create the listening socket shared by every worker"""
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """Pre-fork supervisor that keeps a fixed pool of uvicorn workers alive"""
+
+    def __init__(self, app, sock: socket.socket, workers: int, max_requests: Optional[int],
+                 max_requests_jitter: int, graceful_timeout: int, log_level: str,
+                 report_memory: bool):
+        self.app = app
+        self.sock = sock
+        self.worker_count = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.report_memory = report_memory
+        self.workers: Dict[int, float] = {}
+        self.stopping = False
+        self.stop_deadline: Optional[float] = None
+
+    def spawn_worker(self):
+        """Fork one worker that serves the shared socket until recycled or stopped"""
+        pid = os.fork()
+        if pid:
+            self.workers[pid] = time.time()
+            return
+
+        # Child: restore default signal handling; uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        gc.enable()
+
+        import uvicorn
+
+        # Jitter keeps workers from all recycling at the same moment
+        limit = None
+        if self.max_requests:
+            limit = self.max_requests + random.randint(0, self.max_requests_jitter)
+
+        config = uvicorn.Config(
+            self.app,
+            log_level=self.log_level,
+            limit_max_requests=limit,
+            timeout_graceful_shutdown=self.graceful_timeout
+        )
+        server = uvicorn.Server(config)
+        exit_code = 0
+        try:
+            server.run(sockets=[self.sock])
+        except Exception as e:
+            print(f"❌ Worker {os.getpid()} crashed: {e}")
+            exit_code = 1
+        os._exit(exit_code)
+
+    def handle_stop(self, signum, frame):
+        """Begin a graceful drain: stop respawning and ask every worker to finish"""
+        if self.stopping:
+            return
+        print(f"🛑 Received signal {signum}, draining {len(self.workers)} workers...")
+        self.stopping = True
+        self.stop_deadline = time.time() + self.graceful_timeout + 5
+        for pid in list(self.workers):
+            self._signal_worker(pid, signal.SIGTERM)
+
+    def _signal_worker(self, pid: int, signum: int):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.workers.pop(pid, None)
+
+    def log_memory(self):
+        """Print per-worker memory, showing how much of each RSS is shared"""
+        for pid in self.workers:
+            stats = read_memory_stats(pid)
+            if stats:
+                print(f"📊 Worker {pid}: RSS {stats['rss_kb'] / 1024:.1f}MB, "
+                      f"PSS {stats['pss_kb'] / 1024:.1f}MB, "
+                      f"shared {stats['shared_kb'] / 1024:.1f}MB, "
+                      f"private {stats['private_kb'] / 1024:.1f}MB")
+
+    def run(self):
+        """Spawn the pool, respawn recycled workers and exit once drained"""
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+
+        for _ in range(self.worker_count):
+            self.spawn_worker()
+        print(f"🔥 Started {self.worker_count} workers: {sorted(self.workers)}")
+
+        next_memory_report = time.time() + 5
+        while self.workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                self.workers.pop(pid, None)
+                if not self.stopping:
+                    print(f"♻️  Worker {pid} exited (status {status}), starting replacement")
+                    self.spawn_worker()
+                continue
+
+            if self.stopping and time.time() > self.stop_deadline:
+                for pid in list(self.workers):
+                    print(f"⚠️  Worker {pid} did not drain in time, killing")
+                    self._signal_worker(pid, signal.SIGKILL)
+                self.stop_deadline = float("inf")
+
+            if self.report_memory and time.time() >= next_memory_report:
+                self.log_memory()
+                next_memory_report = time.time() + 60
+
+            time.sleep(0.2)
+
+        print("👋 All workers stopped")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the Resume Analyzer API in production mode")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="Number of workers (default: one per available CPU)")
+    parser.add_argument("--max-requests", type=int, default=5000,
+                        help="Recycle a worker after this many requests (0 disables)")
+    parser.add_argument("--max-requests-jitter", type=int, default=500)
+    parser.add_argument("--graceful-timeout", type=int, default=30,
+                        help="Seconds a worker may spend finishing in-flight requests on shutdown")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--report-memory", action="store_true",
+                        help="Log per-worker RSS/PSS/shared/private memory every minute")
+    return parser.parse_args()
+
+
+def run():
+    args = parse_args()
+    workers = args.workers or default_worker_count()
+
+    # Bind before loading models so a port conflict fails fast
+    sock = bind_socket(args.host, args.port, args.backlog)
+
+    # Load the models in the parent with the collector paused, then move every
+    # surviving object into the permanent generation so workers never touch
+    # (and thereby copy) their pages during collections
+    gc.disable()
+    import main
+    main.resume_analyzer.load_models()
+    gc.collect()
+    gc.freeze()
+
+    if args.report_memory:
+        stats = read_memory_stats(os.getpid())
+        if stats:
+            print(f"📊 Parent after model load: RSS {stats['rss_kb'] / 1024:.1f}MB")
+
+    Supervisor(
+        app=main.app,
+        sock=sock,
+        workers=workers,
+        max_requests=args.max_requests or None,
+        max_requests_jitter=args.max_requests_jitter if args.max_requests else 0,
+        graceful_timeout=args.graceful_timeout,
+        log_level=args.log_level,
+        report_memory=args.report_memory
+    ).run()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,53 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+import deadlines
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical work within one event loop.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await the same task and receive the same result object or
+    exception, so results must be treated as read-only. Every caller awaits
+    through asyncio.shield: cancelling one caller (a client disconnecting)
+    never cancels the shared work the others are waiting on. The work runs
+    under a SharedDeadline, so it is only abandoned once every caller's
+    deadline is. Nothing is cached once the task finishes.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, Tuple[asyncio.Task, deadlines.SharedDeadline]] = {}
+        self.stats = {"leaders": 0, "coalesced": 0, "errors": 0}
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args) -> Tuple[Any, bool]:
+        """Run func(*args) once per key at a time; returns (result, shared)"""
+        entry = self._in_flight.get(key)
+        shared = entry is not None
+        if shared:
+            self.stats["coalesced"] += 1
+            task, deadline = entry
+            deadline.join(deadlines.current())
+        else:
+            self.stats["leaders"] += 1
+            deadline = deadlines.SharedDeadline()
+            deadline.join(deadlines.current())
+            with deadlines.use(deadline):
+                task = asyncio.ensure_future(func(*args))
+            self._in_flight[key] = (task, deadline)
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        entry = self._in_flight.get(key)
+        if entry is not None and entry[0] is task:
+            del self._in_flight[key]
+        # Retrieve the exception so it is not reported as unhandled when
+        # every caller was cancelled before the work failed
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["errors"] += 1
+
+    def metrics(self) -> Dict[str, int]:
+        return {**self.stats, "in_flight": len(self._in_flight)}
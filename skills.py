@@ -0,0 +1,133 @@
+import csv
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Tokens keep in-word "+", "#" and "." so C++, C#, Node.js and .NET survive;
+# hyphens and slashes split, so "scikit-learn" also matches "scikit learn"
+TOKEN_PATTERN = re.compile(r'\.?[A-Za-z0-9+#]+(?:\.[A-Za-z0-9+#]+)*')
+
+# Trie node key marking the end of an alias; maps to the canonical skill name
+_END = None
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into skill-matching tokens, preserving original case"""
+    return TOKEN_PATTERN.findall(text)
+
+
+class SkillExtractor:
+    """
+    Extract canonical skills from resume text using a taxonomy of aliases.
+
+    Aliases are compiled into token-level tries, so a scan costs one pass
+    over the resume tokens (times the longest alias length), independent
+    of how many skills the taxonomy holds.
+    """
+
+    def __init__(self, taxonomy: Dict[str, Dict[str, List[str]]]):
+        """
+        taxonomy maps canonical skill -> {"aliases": [...], "case_sensitive": [...]}.
+        The canonical name is matched case-insensitively unless it is listed
+        as a case-sensitive alias (e.g. "Go", "R", "Excel").
+        """
+        self._trie: Dict = {}
+        self._case_sensitive_trie: Dict = {}
+        self.max_alias_tokens = 0
+        self.skill_count = len(taxonomy)
+
+        for skill, entry in taxonomy.items():
+            case_sensitive = entry.get("case_sensitive", [])
+            aliases = list(entry.get("aliases", []))
+            if skill not in case_sensitive:
+                aliases.append(skill)
+
+            for alias in aliases:
+                self._insert(self._trie, [t.lower() for t in tokenize(alias)], skill)
+            for alias in case_sensitive:
+                self._insert(self._case_sensitive_trie, tokenize(alias), skill)
+
+    def _insert(self, trie: Dict, tokens: List[str], skill: str):
+        """Add one alias token sequence to a trie"""
+        if not tokens:
+            return
+        node = trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node.setdefault(_END, skill)
+        self.max_alias_tokens = max(self.max_alias_tokens, len(tokens))
+
+    @classmethod
+    def from_csv(cls, path: str) -> "SkillExtractor":
+        """Load a taxonomy CSV with skill, aliases and case_sensitive_aliases columns"""
+        taxonomy = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                skill = row["skill"].strip()
+                if not skill:
+                    continue
+                entry = taxonomy.setdefault(skill, {"aliases": [], "case_sensitive": []})
+                entry["aliases"].extend(
+                    a.strip() for a in (row.get("aliases") or "").split("|") if a.strip()
+                )
+                entry["case_sensitive"].extend(
+                    a.strip() for a in (row.get("case_sensitive_aliases") or "").split("|") if a.strip()
+                )
+        return cls(taxonomy)
+
+    @staticmethod
+    def _longest_match(trie: Dict, tokens: List[str], start: int):
+        """Return (end index, skill) of the longest alias starting at start"""
+        node = trie
+        best = None
+        position = start
+        while position < len(tokens):
+            node = node.get(tokens[position])
+            if node is None:
+                break
+            position += 1
+            if _END in node:
+                best = (position, node[_END])
+        return best
+
+    def extract(self, text: str) -> List[Dict[str, object]]:
+        """Return canonical skills found in text with occurrence counts, most frequent first"""
+        if not text:
+            return []
+
+        tokens = tokenize(text)
+        lowered = [token.lower() for token in tokens]
+        counts: Counter = Counter()
+
+        position = 0
+        while position < len(tokens):
+            match = self._longest_match(self._trie, lowered, position)
+            exact = self._longest_match(self._case_sensitive_trie, tokens, position)
+            if exact and (not match or exact[0] > match[0]):
+                match = exact
+
+            if match:
+                position, skill = match
+                counts[skill] += 1
+            else:
+                position += 1
+
+        return [
+            {"skill": skill, "count": count}
+            for skill, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        ]
+
+    def extract_names(self, text: str) -> List[str]:
+        """Return only the canonical skill names, most frequent first"""
+        return [entry["skill"] for entry in self.extract(text)]
+
+
+def load_skill_extractor(path: str) -> Optional[SkillExtractor]:
+    """Load the skill taxonomy, returning None if the data file is missing"""
+    try:
+        extractor = SkillExtractor.from_csv(path)
+        print(f"✅ Skill taxonomy loaded ({extractor.skill_count} skills)")
+        return extractor
+    except FileNotFoundError as e:
+        print(f"❌ Error loading skill taxonomy: {e}")
+        return None
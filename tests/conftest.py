@@ -0,0 +1,80 @@
+import os
+import sys
+import uuid
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+SAMPLE_RESUME = """Jane Doe
+jane.doe@example.com | (555) 123-4567
+
+Summary
+Python developer with 6 years of experience building Django and Flask services.
+
+Work Experience
+Led a team of 4 engineers and reduced API latency by 40%.
+Developed REST APIs with Python, SQL and Docker on AWS.
+
+Education
+B.Sc. Computer Science, State University, 2016
+"""
+
+
+def make_pdf(pages) -> bytes:
+    """A minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append("<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """main imported once, with every on-disk store in a temporary directory"""
+    state = tmp_path_factory.mktemp("state")
+    os.environ.update({
+        "RESULT_STORE_PATH": str(state / "results.sqlite3"),
+        "SLOW_PROFILE_DIR": str(state / "profiles"),
+        "SLOW_PROFILE_ENABLED": "0",
+        "JOB_INDEX_PATH": str(state / "job_index"),
+        "BOILERPLATE_INDEX_PATH": str(state / "boilerplate.bloom"),
+        "FEATURE_STORE_PATH": "",
+        "ADMISSION_ENABLED": "0",
+        "PRELOAD_MODELS": "0",
+    })
+    os.chdir(ROOT)
+    import main
+    return main
+
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+    with TestClient(app_module.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def resume_text():
+    """A resume whose bytes are unique to the test, so stored results never leak between tests"""
+    return SAMPLE_RESUME + f"\nReference {uuid.uuid4().hex}\n"
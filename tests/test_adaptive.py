@@ -0,0 +1,104 @@
+import PyPDF2
+import pytest
+
+from conftest import make_pdf
+
+
+@pytest.fixture
+def analyzer(app_module, monkeypatch):
+    analyzer = app_module.resume_analyzer
+    monkeypatch.setattr(analyzer, "feature_store", None)
+    monkeypatch.setattr(analyzer, "monitor", None)
+    return analyzer
+
+
+@pytest.fixture
+def pages_read(monkeypatch):
+    """Count the PDF pages whose text is extracted"""
+    read = []
+    extract_text = PyPDF2.PageObject.extract_text
+
+    def counting_extract(page, *args, **kwargs):
+        text = extract_text(page, *args, **kwargs)
+        read.append(text)
+        return text
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", counting_extract)
+    return read
+
+
+def long_resume(resume_text, copies=8):
+    return "\n".join([resume_text] * copies)
+
+
+def test_confident_prefix_stops_early(analyzer, monkeypatch, resume_text):
+    monkeypatch.setattr(analyzer, "adaptive_tokens", 50)
+    monkeypatch.setattr(analyzer, "adaptive_margin", 0.0)
+    text = long_resume(resume_text)
+
+    result = analyzer.predict_domain(text.encode(), "resume.txt", adaptive=True)
+    adaptive = result["adaptive"]
+    assert adaptive["unit"] == "tokens"
+    assert adaptive["used"] == 50 and adaptive["steps"] == 1
+    assert adaptive["total"] == len(text.split())
+    assert adaptive["stopped_early"] and adaptive["fraction_used"] < 1
+
+
+def test_uncertain_prefix_doubles_until_the_end(analyzer, monkeypatch, resume_text):
+    monkeypatch.setattr(analyzer, "adaptive_tokens", 50)
+    monkeypatch.setattr(analyzer, "adaptive_margin", 101.0)
+    text = long_resume(resume_text)
+
+    result = analyzer.predict_domain(text.encode(), "resume.txt", adaptive=True)
+    full = analyzer.predict_domain(text.encode(), "resume.txt")
+    adaptive = result["adaptive"]
+    assert adaptive["used"] == adaptive["total"] and not adaptive["stopped_early"]
+    # 50, 100, 200, ... words, then whatever remains
+    assert adaptive["steps"] == len([n for n in (50, 100, 200, 400, 800, 1600) if n < adaptive["total"]]) + 1
+    assert (result["domain"], result["confidence"]) == (full["domain"], full["confidence"])
+
+
+def test_pdf_pages_are_only_extracted_as_needed(analyzer, monkeypatch, resume_text, pages_read):
+    monkeypatch.setattr(analyzer, "adaptive_pages", 2)
+    monkeypatch.setattr(analyzer, "adaptive_margin", 0.0)
+    pdf = make_pdf([" ".join(resume_text.split()[:80])] * 12)
+
+    result = analyzer.predict_domain(pdf, "resume.pdf", adaptive=True)
+    assert len(pages_read) == 2
+    assert result["adaptive"]["unit"] == "pages"
+    assert (result["adaptive"]["used"], result["adaptive"]["total"]) == (2, 12)
+    assert result["adaptive"]["pages_skipped"] == []
+
+
+def test_pdf_pages_are_closed_when_classification_fails(analyzer, monkeypatch, resume_text):
+    import models
+
+    closed, generators = [], []
+    iter_pdf_pages = models.iter_pdf_pages
+
+    def tracking_iter_pdf_pages(*args):
+        total, pages = iter_pdf_pages(*args)
+
+        def tracked():
+            try:
+                yield from pages
+            finally:
+                closed.append(True)
+                pages.close()
+
+        # Held here so only an explicit close, not garbage collection, ends it
+        generators.append(tracked())
+        return total, generators[-1]
+
+    monkeypatch.setattr(models, "iter_pdf_pages", tracking_iter_pdf_pages)
+    monkeypatch.setattr(analyzer, "adaptive_pages", 2)
+    monkeypatch.setattr(analyzer, "_predict_prefix", lambda raw, cleaned: {"error": "Prediction failed"})
+    pdf = make_pdf([" ".join(resume_text.split()[:80])] * 12)
+
+    assert analyzer.predict_domain(pdf, "resume.pdf", adaptive=True) == {"error": "Prediction failed"}
+    assert closed == [True]
+
+
+def test_unreadable_pdf_is_an_error(analyzer):
+    result = analyzer.predict_domain(b"%PDF-1.4 not really", "resume.pdf", adaptive=True)
+    assert result == {"error": "Could not extract text from file"}
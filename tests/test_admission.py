@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from admission import AdmissionControl, AdmissionMiddleware, Lane, TokenBucket
+
+
+def lane(name="heavy", limit=1, queue_timeout=1.0, max_queue=10, rate=100.0, burst=100.0):
+    return Lane(name, limit=limit, queue_timeout=queue_timeout, max_queue=max_queue, rate=rate, burst=burst)
+
+
+def scope(key=None, client="10.0.0.1", forwarded=None):
+    headers = []
+    if key is not None:
+        headers.append((b"x-api-key", key.encode()))
+    if forwarded is not None:
+        headers.append((b"x-forwarded-for", forwarded.encode()))
+    return {"type": "http", "headers": headers, "client": (client, 5000)}
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(rate=2, capacity=2, now=0)
+    assert bucket.take(0) == bucket.take(0) == 0
+    assert bucket.take(0) == pytest.approx(0.5)
+    assert bucket.take(0.5) == 0
+
+
+def test_lane_hands_slots_to_waiters_in_order():
+    async def scenario():
+        heavy = lane(limit=1)
+        assert await heavy.acquire() is None
+        order = []
+
+        async def waiter(name):
+            assert await heavy.acquire() is None
+            order.append(name)
+            heavy.release()
+
+        tasks = [asyncio.create_task(waiter(name)) for name in "abc"]
+        await asyncio.sleep(0)
+        heavy.release()
+        await asyncio.gather(*tasks)
+        return order, heavy
+
+    order, heavy = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert heavy.active == 0
+    assert heavy.counters["queued"] == 3
+
+
+def test_lane_sheds_on_timeout_and_full_queue():
+    async def scenario():
+        heavy = lane(limit=1, queue_timeout=0.05, max_queue=1)
+        await heavy.acquire()
+        queued = asyncio.create_task(heavy.acquire())
+        await asyncio.sleep(0)
+        full = await heavy.acquire()
+        return full, await queued, heavy
+
+    full, timed_out, heavy = asyncio.run(scenario())
+    assert (full, timed_out) == ("queue_full", "queue_timeout")
+    assert heavy.waiters == type(heavy.waiters)()
+    assert heavy.active == 1
+
+
+def test_lanes_by_method_and_exempt_paths():
+    assert AdmissionControl.lane_for("POST", "/api/analyze-resume") == "heavy"
+    assert AdmissionControl.lane_for("GET", "/api/companies/IT") == "light"
+    assert AdmissionControl.lane_for("GET", "/health") is None
+    assert AdmissionControl.lane_for("OPTIONS", "/api/analyze-resume") is None
+
+
+def test_only_configured_api_keys_identify_a_client():
+    control = AdmissionControl(lane(), lane("light"), api_keys=["team-a"])
+    assert control.client_id(scope(key="team-a")) == "key:team-a"
+    # Unknown keys fall back to the address, so rotating them cannot dodge limits
+    assert control.client_id(scope(key="random-1")) == "10.0.0.1"
+    assert control.client_id(scope(key="")) == "10.0.0.1"
+
+
+def test_forwarded_address_only_when_trusted():
+    assert AdmissionControl(lane(), lane("light")).client_id(scope(forwarded="1.2.3.4")) == "10.0.0.1"
+    trusting = AdmissionControl(lane(), lane("light"), trust_forwarded=True)
+    assert trusting.client_id(scope(forwarded="1.2.3.4, 10.0.0.2")) == "1.2.3.4"
+
+
+def test_client_buckets_are_bounded():
+    control = AdmissionControl(lane(), lane("light"), max_clients=2)
+    for client in ["a", "b", "c"]:
+        control.take_token(client, control.lanes["heavy"])
+    assert list(control._buckets) == [("b", "heavy"), ("c", "heavy")]
+
+
+def make_client(control):
+    async def upload(request):
+        return JSONResponse({"ok": True})
+
+    app = Starlette(routes=[Route("/api/upload", upload, methods=["POST"]),
+                            Route("/health", upload, methods=["POST"])])
+    app.add_middleware(AdmissionMiddleware, control=control)
+    return TestClient(app)
+
+
+def test_middleware_rate_limits_per_client():
+    control = AdmissionControl(lane(rate=0.001, burst=2), lane("light"), api_keys=["team-a"])
+    client = make_client(control)
+
+    assert [client.post("/api/upload").status_code for _ in range(3)] == [200, 200, 429]
+    limited = client.post("/api/upload", headers={"X-Api-Key": "made-up"})
+    assert limited.status_code == 429
+    assert int(limited.headers["retry-after"]) >= 1
+    assert limited.json()["error"]["code"] == "RATE_LIMITED"
+    # A configured key has its own bucket; exempt paths are never limited
+    assert client.post("/api/upload", headers={"X-Api-Key": "team-a"}).status_code == 200
+    assert client.post("/health").status_code == 200
+    assert control.lanes["heavy"].counters["rate_limited"] == 2
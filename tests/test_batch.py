@@ -0,0 +1,58 @@
+import json
+
+from fastapi.testclient import TestClient
+
+from admission import AdmissionControl, AdmissionMiddleware, Lane
+
+
+def batch(resume_text, count=3, bad=True):
+    files = [("files", (f"resume{i}.txt", f"{resume_text}\nCandidate {i}".encode(), "text/plain"))
+             for i in range(count)]
+    if bad:
+        files.append(("files", ("photo.png", b"\x89PNG", "image/png")))
+    return files
+
+
+def test_json_batch_lists_results_in_upload_order(client, resume_text):
+    response = client.post("/api/batch/analyze", files=batch(resume_text))
+    assert response.status_code == 200
+    body = response.json()
+
+    assert [record["index"] for record in body["results"]] == [0, 1, 2, 3]
+    assert [record["status"] for record in body["results"]] == ["ok", "ok", "ok", "error"]
+    assert body["results"][3]["status_code"] == 400
+    summary = body["summary"]
+    assert (summary["total"], summary["succeeded"], summary["failed"], summary["abandoned"]) == (4, 3, 1, 0)
+    assert sum(summary["domains"].values()) == 3
+
+
+def test_ndjson_batch_streams_one_line_per_file_then_a_summary(client, resume_text):
+    with client.stream("POST", "/api/batch/analyze", files=batch(resume_text),
+                       headers={"Accept": "application/x-ndjson"}) as response:
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [line["type"] for line in lines] == ["result"] * 4 + ["summary"]
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2, 3]
+    assert lines[-1]["succeeded"] == 3
+
+
+def test_batch_without_files_is_rejected(client):
+    assert client.post("/api/batch/analyze", data={"note": "empty"}).status_code == 400
+
+
+def test_each_batch_file_is_charged_to_the_heavy_lane(app_module, resume_text):
+    heavy = Lane("heavy", limit=2, queue_timeout=0.05, max_queue=10, rate=0.01, burst=3)
+    light = Lane("light", limit=4, queue_timeout=1, max_queue=10, rate=100, burst=100)
+    control = AdmissionControl(heavy, light)
+    with TestClient(AdmissionMiddleware(app_module.app, control)) as client:
+        body = client.post("/api/batch/analyze", files=batch(resume_text, count=5, bad=False)).json()
+
+    statuses = sorted((record["status"], record.get("status_code")) for record in body["results"])
+    # The burst covers three files; the rest cannot get a token within the queue timeout
+    assert statuses == [("error", 429), ("error", 429), ("ok", None), ("ok", None), ("ok", None)]
+    assert all(record["retry_after"] >= 1 for record in body["results"] if record["status"] == "error")
+    assert heavy.counters["admitted"] == 3
+    assert heavy.counters["rate_limited"] == 2
+    assert light.counters["admitted"] == 1
+    assert heavy.active == light.active == 0
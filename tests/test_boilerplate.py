@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+from boilerplate import (BoilerplateIndex, BoilerplateIndexError, build_index, filter_size,
+                         load_boilerplate_index, main, read_corpus)
+from models import PlagiarismChecker
+
+TEMPLATE = ("Dynamic and results oriented professional with a passion for delivering "
+            "innovative solutions in fast paced environments and a strong commitment to excellence")
+CORPUS = [TEMPLATE, "Responsible for managing day to day operations of the office and staff."]
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    path = str(tmp_path / "boilerplate.bloom")
+    build_index(lambda: CORPUS, path, ngram_size=5, fp_rate=0.001)
+    return path
+
+
+def random_words(rng, count):
+    return " ".join("".join(rng.choice("abcdefghij") for _ in range(6)) for _ in range(count))
+
+
+def test_filter_is_sized_for_the_target_rate():
+    bits, hashes = filter_size(1_000_000, 0.01)
+    assert 9_500_000 < bits < 9_700_000 and bits % 64 == 0
+    assert hashes == 7
+
+
+def test_false_positive_rate_stays_near_target(tmp_path):
+    rng = random.Random(7)
+    corpus = [random_words(rng, 5) for _ in range(5000)]
+    index = build_index(lambda: corpus, str(tmp_path / "fp.bloom"), ngram_size=5, fp_rate=0.01)
+    assert index.contains([text.encode() for text in corpus]).all()
+
+    probes = [random_words(rng, 5).encode() for _ in range(20000)]
+    assert index.contains(probes).mean() < 0.02
+    assert index.stats()["expected_fp_rate"] == pytest.approx(0.01, rel=0.1)
+
+
+def test_check_reports_copied_spans(index_path):
+    text = f"Jane Doe\n• {TEMPLATE.upper()}.\nBuilt a billing system in Go."
+    result = BoilerplateIndex(index_path).check(text)
+    assert result["total_spans"] == 1
+    [span] = result["spans"]
+    assert text[span["start"]:span["end"]] == span["text"] == TEMPLATE.upper()
+    assert span["words"] == len(TEMPLATE.split())
+    assert result["boilerplate_fraction"] == round(span["words"] / result["words"], 4)
+
+
+def test_isolated_hits_are_not_reported(index_path):
+    # Exactly one template 5-gram, surrounded by original text
+    text = "I wrote compilers, then delivering innovative solutions in fast, and later robots"
+    result = BoilerplateIndex(index_path).check(text)
+    assert result["spans"] == [] and result["boilerplate_words"] == 0
+    assert BoilerplateIndex(index_path).check(text, min_run=1)["total_spans"] == 1
+
+
+def test_rebuilds_get_a_new_version(tmp_path, index_path):
+    first = BoilerplateIndex(index_path)
+    second = build_index(lambda: CORPUS, index_path, ngram_size=5, fp_rate=0.001)
+    assert first.version != second.version
+    assert BoilerplateIndex(index_path).version == second.version
+
+
+def test_filter_is_mapped_on_first_lookup(index_path):
+    index = BoilerplateIndex(index_path)
+    assert index._filter is None
+    assert index.contains([b"innovative solutions in fast paced"]).all()
+    mapped = index._filter
+    assert mapped is not None and len(mapped) == index.bits // 8
+    index.check(TEMPLATE)
+    assert index._filter is mapped
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a filter" * 20)
+    with pytest.raises(BoilerplateIndexError):
+        BoilerplateIndex(str(path))
+    assert load_boilerplate_index(str(tmp_path / "missing.bloom")) is None
+
+
+def test_corpus_text_files_split_on_blank_lines(tmp_path):
+    (tmp_path / "samples").mkdir()
+    (tmp_path / "samples" / "a.txt").write_text("first block\nstill first\n\nsecond block\n")
+    (tmp_path / "samples" / "ignored.csv").write_text("x,y\n")
+    assert list(read_corpus([str(tmp_path / "samples")])) == ["first block\nstill first\n", "second block\n"]
+
+
+def test_cli_builds_an_index(tmp_path, capsys):
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("\n\n".join(CORPUS))
+    main(["build", str(corpus), "--index", str(tmp_path / "cli.bloom"), "--ngram", "4"])
+    assert BoilerplateIndex(str(tmp_path / "cli.bloom")).ngram_size == 4
+    assert '"ngram_size": 4' in capsys.readouterr().out
+
+
+def test_plagiarism_score_includes_boilerplate(index_path):
+    checker = PlagiarismChecker(boilerplate_path=index_path)
+    result = checker.check_plagiarism(f"{TEMPLATE}. Built a billing system.")
+    assert result["boilerplate"]["total_spans"] == 1
+    assert result["overall_score"] == round(result["boilerplate"]["boilerplate_fraction"] * 100, 1)
+    assert checker.version != PlagiarismChecker().version
@@ -0,0 +1,102 @@
+import csv
+import json
+
+import pytest
+
+import bulk_analyze
+from conftest import ROOT, SAMPLE_RESUME
+
+
+@pytest.fixture
+def resumes(tmp_path):
+    source = tmp_path / "resumes"
+    (source / "b").mkdir(parents=True)
+    for name in ["a1.txt", "b/b1.txt", "b/b2.txt"]:
+        (source / name).write_text(SAMPLE_RESUME + f"\nFile {name}\n")
+    (source / "empty.txt").write_text("")
+    (source / "notes.md").write_text("not a resume")
+    return source
+
+
+def run(source, output, *extra):
+    args = bulk_analyze.parse_args([str(source), "--output", str(output), "--workers", "1",
+                                    "--row-group", "2", *extra])
+    return bulk_analyze.run(args)
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture(autouse=True)
+def in_repo(monkeypatch, tmp_path):
+    monkeypatch.chdir(ROOT)
+    monkeypatch.setenv("BOILERPLATE_INDEX_PATH", str(tmp_path / "boilerplate.bloom"))
+
+
+def test_directory_walk_is_sorted_and_filtered(resumes):
+    paths = bulk_analyze.list_inputs(str(resumes), {"txt"})
+    assert [p[len(str(resumes)) + 1:] for p in paths] == ["a1.txt", "empty.txt", "b/b1.txt", "b/b2.txt"]
+
+
+def test_manifest_paths_are_relative_to_the_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# nightly\nresumes/a1.txt\n\n/abs/cv.pdf\n")
+    assert bulk_analyze.list_inputs(str(manifest), {"txt"}) == [str(tmp_path / "resumes/a1.txt"), "/abs/cv.pdf"]
+
+
+def test_checkpoint_drops_a_torn_last_line(tmp_path):
+    path = tmp_path / "run.checkpoint"
+    path.write_text(json.dumps({"paths": ["a"], "rows": 1, "offset": 10}) + "\n{\"paths\": [\"b")
+    checkpoint = bulk_analyze.Checkpoint(str(path))
+    assert checkpoint.done_paths() == {"a"}
+    checkpoint.append({"paths": ["c"], "rows": 1, "offset": 20})
+    assert bulk_analyze.Checkpoint(str(path)).done_paths() == {"a", "c"}
+
+
+def test_csv_run_writes_one_row_per_file(resumes, tmp_path):
+    output = tmp_path / "results.csv"
+    assert run(resumes, output) == 0
+
+    rows = {row["path"].rsplit("/", 1)[-1]: row for row in read_rows(output)}
+    assert set(rows) == {"a1.txt", "b1.txt", "b2.txt", "empty.txt"}
+    assert rows["a1.txt"]["status"] == "ok"
+    assert rows["a1.txt"]["email"] == "jane.doe@example.com"
+    assert "Python" in rows["a1.txt"]["skills"].split("|")
+    assert rows["empty.txt"]["status"] == "error"
+    # Row groups of two: two checkpoint entries
+    assert len(bulk_analyze.Checkpoint(str(output) + ".checkpoint").entries) == 2
+
+
+def test_resumed_run_skips_done_files_and_discards_unrecorded_output(resumes, tmp_path):
+    output = tmp_path / "results.csv"
+    run(resumes, output)
+    # A crash after writing rows but before checkpointing them
+    with open(output, "a", encoding="utf-8") as f:
+        f.write("half-written,row\n")
+    (resumes / "c1.txt").write_text(SAMPLE_RESUME)
+
+    run(resumes, output)
+    paths = [row["path"] for row in read_rows(output)]
+    assert len(paths) == len(set(paths)) == 5
+    assert paths[-1].endswith("c1.txt")
+
+
+def test_restart_ignores_the_checkpoint(resumes, tmp_path):
+    output = tmp_path / "results.csv"
+    run(resumes, output)
+    run(resumes, output, "--restart")
+    assert len(read_rows(output)) == 4
+
+
+def test_parquet_output_in_row_groups(resumes, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    output = tmp_path / "results_parquet"
+    run(resumes, output)
+
+    parts = sorted(p.name for p in output.glob("*.parquet"))
+    assert parts == ["part-00000.parquet", "part-00001.parquet"]
+    table = pq.read_table(output)
+    assert table.num_rows == 4
+    assert table.schema.field("confidence").type == "double"
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import deadlines
+from conftest import make_pdf
+from deadlines import (Deadline, DeadlineExceeded, DeadlineMiddleware, DeadlinePolicy,
+                       SharedDeadline)
+from extractors import extract_pdf_text
+from profiling import stage
+
+
+def http_scope(path="/api/analyze-resume", timeout=None):
+    headers = [(b"x-request-timeout", timeout.encode())] if timeout is not None else []
+    return {"type": "http", "method": "POST", "path": path, "headers": headers}
+
+
+def test_timeout_comes_from_the_header_or_the_path_default():
+    policy = DeadlinePolicy(default_timeout=30, max_timeout=60, path_timeouts={"/api/batch/": 600})
+    assert policy.timeout_for(http_scope()) == 30
+    assert policy.timeout_for(http_scope(timeout="5")) == 5
+    assert policy.timeout_for(http_scope(timeout="900")) == 60
+    assert policy.timeout_for(http_scope(timeout="soon")) == 30
+    assert policy.timeout_for(http_scope("/api/batch/analyze")) == 600
+    assert policy.timeout_for(http_scope("/health")) is None
+
+
+def test_stages_stop_once_the_deadline_passes():
+    deadline = Deadline(0.05)
+    with deadlines.use(deadline):
+        with stage("extract"):
+            pass
+        time.sleep(0.06)
+        with pytest.raises(DeadlineExceeded) as raised:
+            with stage("classify"):
+                pass
+    assert deadline.completed == ["extract"]
+    assert (deadline.reason, deadline.abandoned_stage) == ("expired", "classify")
+    assert raised.value.stage == "classify"
+
+
+def test_shared_work_runs_until_every_waiter_gives_up():
+    first, second = Deadline(30), Deadline(30)
+    shared = SharedDeadline()
+    shared.join(first)
+    shared.join(second)
+    first.cancel("disconnected")
+    shared.check("classify")
+    second.cancel("disconnected")
+    with pytest.raises(DeadlineExceeded):
+        shared.check("classify")
+
+    shared.join(None)
+    assert not shared.abandoned() and shared.remaining() is None
+
+
+def test_pdf_extraction_stops_between_pages(monkeypatch):
+    import PyPDF2
+
+    extract_text = PyPDF2.PageObject.extract_text
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text",
+                        lambda page, *a, **k: time.sleep(0.1) or extract_text(page, *a, **k))
+    deadline = Deadline(0.25)
+    with deadlines.use(deadline), pytest.raises(DeadlineExceeded) as raised:
+        extract_pdf_text(make_pdf([f"Page {n}" for n in range(10)]))
+    assert raised.value.stage == "pdf_pages"
+    assert "pdf_open" in deadline.completed
+
+
+def run_middleware(app, policy, messages, scope=None):
+    """Drive DeadlineMiddleware with the given receive messages; returns sent messages"""
+    sent = []
+
+    async def scenario():
+        queue = list(messages)
+
+        async def receive():
+            if queue:
+                return queue.pop(0)
+            await asyncio.sleep(3600)
+
+        async def send(message):
+            sent.append(message)
+
+        await DeadlineMiddleware(app, policy)(scope or http_scope(), receive, send)
+
+    asyncio.run(scenario())
+    return sent
+
+
+BODY = {"type": "http.request", "body": b"resume", "more_body": False}
+
+
+def test_expired_request_gets_a_504_with_its_completed_stages():
+    policy = DeadlinePolicy(grace=5)
+
+    def extract():
+        with stage("extract"):
+            pass
+
+    async def app(scope, receive, send):
+        await receive()
+        await asyncio.to_thread(extract)
+        await asyncio.sleep(0.1)
+        with stage("classify"):
+            pass
+
+    sent = run_middleware(app, policy, [BODY], http_scope(timeout="0.05"))
+    assert sent[0]["status"] == 504
+    body = json.loads(sent[1]["body"])
+    assert body["error"]["code"] == "DEADLINE_EXCEEDED"
+    assert (body["completed_stages"], body["abandoned_stage"]) == (["extract"], "classify")
+    assert policy.metrics()["expired"] == 1
+
+
+def test_disconnect_cancels_the_request():
+    policy = DeadlinePolicy()
+    started = time.monotonic()
+    cancelled = []
+
+    async def app(scope, receive, send):
+        await receive()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append(deadlines.current().reason)
+            raise
+
+    sent = run_middleware(app, policy, [BODY, {"type": "http.disconnect"}])
+    assert time.monotonic() - started < 5
+    assert cancelled == ["disconnected"] and sent == []
+    assert policy.counters["disconnected"] == 1
+
+
+def test_api_reports_abandoned_stages(client, app_module, monkeypatch, resume_text):
+    # Models load lazily; load them before the clock starts
+    assert client.post("/api/analyze-resume", files={"file": ("warm.txt", b"Python developer", "text/plain")}).status_code == 200
+    extract_skills = app_module.resume_analyzer.extract_skills
+    monkeypatch.setattr(app_module.resume_analyzer, "extract_skills",
+                        lambda text: time.sleep(0.4) or extract_skills(text))
+    expired = app_module.deadline_policy.counters["expired"]
+
+    response = client.post("/api/full-report", headers={"X-Request-Timeout": "0.2"},
+                           files={"file": ("resume.txt", resume_text.encode(), "text/plain")})
+    assert response.status_code == 504
+    body = response.json()
+    assert "skills" in body["completed_stages"]
+    assert body["abandoned_stage"] in ("improvement", "companies")
+    assert client.get("/admin/deadlines").json()["expired"] == expired + 1
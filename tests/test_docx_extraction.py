@@ -0,0 +1,58 @@
+import zipfile
+from io import BytesIO
+
+import pytest
+
+from extractors import DocxExtractionError, extract_docx_text
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+
+def make_docx(body: str, header: str = None) -> bytes:
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("word/document.xml", f"<w:document {W}><w:body>{body}</w:body></w:document>")
+        if header is not None:
+            archive.writestr("word/header1.xml", f"<w:hdr {W}>{header}</w:hdr>")
+    return buffer.getvalue()
+
+
+def paragraph(text: str) -> str:
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def corrupt_member(docx: bytes, name: str) -> bytes:
+    """Overwrite a member's deflate stream with an invalid block type"""
+    info = zipfile.ZipFile(BytesIO(docx)).getinfo(name)
+    data = bytearray(docx)
+    name_length = int.from_bytes(data[info.header_offset + 26:info.header_offset + 28], "little")
+    extra_length = int.from_bytes(data[info.header_offset + 28:info.header_offset + 30], "little")
+    start = info.header_offset + 30 + name_length + extra_length
+    data[start:start + info.compress_size] = b"\xff" * info.compress_size
+    return bytes(data)
+
+
+def test_extracts_paragraphs_tables_and_headers():
+    table = f"<w:tbl><w:tr><w:tc>{paragraph('Python')}</w:tc><w:tc>{paragraph('SQL')}</w:tc></w:tr></w:tbl>"
+    text = extract_docx_text(make_docx(paragraph("Jane Doe") + table, header=paragraph("Resume")))
+    assert text.index("Resume") < text.index("Jane Doe") < text.index("Python") < text.index("SQL")
+
+
+def test_corrupt_deflate_stream_raises_extraction_error():
+    docx = corrupt_member(make_docx(paragraph("Jane Doe " * 50)), "word/document.xml")
+    with pytest.raises(DocxExtractionError):
+        extract_docx_text(docx)
+
+
+def test_truncated_archive_raises_extraction_error():
+    docx = make_docx(paragraph("Jane Doe " * 50))
+    with pytest.raises(DocxExtractionError):
+        extract_docx_text(docx[:len(docx) // 2])
+
+
+def test_corrupt_docx_upload_is_rejected_cleanly(client):
+    docx = corrupt_member(make_docx(paragraph("Jane Doe " * 50)), "word/document.xml")
+    response = client.post("/api/analyze-resume", files={
+        "file": ("resume.docx", docx, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+    })
+    assert response.status_code == 422
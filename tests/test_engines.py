@@ -0,0 +1,120 @@
+import sys
+import types
+
+import pytest
+
+from conftest import SAMPLE_RESUME
+from engines import EmbeddingEngine, TfidfLogRegEngine, _with_margins, engine_from_env
+
+
+@pytest.fixture
+def tfidf():
+    return TfidfLogRegEngine()
+
+
+@pytest.fixture
+def broken_encoder(monkeypatch):
+    """torch and sentence-transformers that import fine but cannot load a model"""
+    torch = types.ModuleType("torch")
+    torch.set_num_threads = lambda threads: None
+    sentence_transformers = types.ModuleType("sentence_transformers")
+
+    class SentenceTransformer:
+        def __init__(self, name, device=None):
+            raise OSError(f"We couldn't connect to the hub to load {name}")
+
+    sentence_transformers.SentenceTransformer = SentenceTransformer
+    monkeypatch.setitem(sys.modules, "torch", torch)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", sentence_transformers)
+
+
+def test_margins_are_the_lead_over_the_runner_up():
+    [(label, confidence, margin)] = _with_margins(["a", "b", "c"], [[0.2, 0.5, 0.3]])
+    assert label == "b"
+    assert confidence == pytest.approx(50)
+    assert margin == pytest.approx(20)
+
+
+def test_tfidf_engine_predicts_with_margins(tfidf):
+    assert tfidf.load()
+    [(label, confidence, margin)] = tfidf.predict_margins([SAMPLE_RESUME.lower()])
+    assert (label, confidence) == tuple(tfidf.predict([SAMPLE_RESUME.lower()])[0])
+    assert 0 <= margin <= confidence
+
+
+def test_tfidf_engine_without_model_files_is_unavailable(tmp_path):
+    engine = TfidfLogRegEngine(str(tmp_path / "model.pkl"), str(tmp_path / "vectorizer.pkl"))
+    assert not engine.load()
+    assert engine.loaded
+
+
+def test_embedding_engine_falls_back_when_the_model_fails_to_load(broken_encoder, tfidf, capsys):
+    engine = EmbeddingEngine(model_name="missing/model", fallback=tfidf)
+    assert engine.load()
+    assert engine.load()
+
+    output = capsys.readouterr().out
+    assert output.count("failed to load") == 1
+    assert "falling back to the tfidf engine" in output
+    assert engine.delegate is tfidf and engine.uses_cleaned_text
+    assert engine.predict([SAMPLE_RESUME.lower()]) == tfidf.predict([SAMPLE_RESUME.lower()])
+
+
+def test_embedding_engine_falls_back_without_its_libraries(monkeypatch, tfidf):
+    monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+    engine = EmbeddingEngine(fallback=tfidf)
+    assert engine.load()
+    label, confidence, _ = engine.predict_margins([SAMPLE_RESUME.lower()])[0]
+    assert label
+
+
+def test_embedding_engine_without_fallback_is_unavailable(broken_encoder):
+    engine = EmbeddingEngine(model_name="missing/model")
+    assert not engine.load()
+    assert engine.delegate is None
+
+
+def test_env_selected_embedding_engine_carries_a_tfidf_fallback(monkeypatch):
+    monkeypatch.setenv("CLASSIFIER_ENGINE", "embedding")
+    engine = engine_from_env("public/models/domain_classifier.pkl", "public/models/tfidf_vectorizer.pkl")
+    assert isinstance(engine.fallback, TfidfLogRegEngine)
+    monkeypatch.setenv("CLASSIFIER_ENGINE", "bert")
+    with pytest.raises(ValueError):
+        engine_from_env("a", "b")
+
+
+def test_tfidf_engine_with_a_corrupt_model_is_unavailable(tmp_path, capsys):
+    (tmp_path / "model.pkl").write_bytes(b"\x80\x04truncated")
+    engine = TfidfLogRegEngine(str(tmp_path / "model.pkl"), "public/models/tfidf_vectorizer.pkl")
+    assert not engine.load()
+    assert engine.model is None and engine.vectorizer is None
+    assert "Error loading models" in capsys.readouterr().out
+
+
+def test_fallback_changes_the_engine_version(broken_encoder, tfidf):
+    engine = EmbeddingEngine(model_name="missing/model", fallback=tfidf)
+    version = engine.version
+    assert engine.load()
+    assert engine.version not in (version, tfidf.version)
+
+
+def test_fallback_results_are_stored_under_the_fallback_version(broken_encoder, tfidf, app_module,
+                                                                client, monkeypatch, resume_text):
+    from result_store import ResultStore, content_hash
+
+    analyzer = app_module.resume_analyzer
+    engine = EmbeddingEngine(model_name="missing/model", fallback=tfidf)
+    monkeypatch.setattr(analyzer, "engine", engine)
+    encoder_version = app_module.analyzer_version("classification")
+
+    content = resume_text.encode()
+    response = client.post("/api/analyze-resume", files={"file": ("resume.txt", content, "text/plain")})
+    assert response.status_code == 200
+
+    def stored(version):
+        key = ResultStore.make_key(content_hash(content), "classification", version)
+        return app_module.result_store.get_many([key])
+
+    assert app_module.analyzer_version("classification") != encoder_version
+    assert stored(app_module.analyzer_version("classification"))
+    assert not stored(encoder_version)
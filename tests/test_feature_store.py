@@ -0,0 +1,121 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from feature_store import FeatureStore, FeatureStoreError, main, train
+from result_store import file_fingerprint
+
+N_FEATURES = 50
+
+
+def random_rows(seed, count):
+    return sp.random(count, N_FEATURES, density=0.2, format="csr", random_state=seed, dtype=np.float32)
+
+
+def predictions(count, domains=("Data Science", "Software Engineering")):
+    return [(domains[i % len(domains)], 50.0 + i % 50) for i in range(count)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FeatureStore(str(tmp_path / "features"), flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def stored_matrix(store, feature_space="space"):
+    return sp.vstack([matrix for matrix, _ in store.iter_batches(feature_space, batch_rows=7)])
+
+
+def test_store_is_off_unless_configured(monkeypatch, tmp_path):
+    monkeypatch.delenv("FEATURE_STORE_PATH", raising=False)
+    assert FeatureStore.from_env() is None
+    monkeypatch.setenv("FEATURE_STORE_PATH", str(tmp_path))
+    assert FeatureStore.from_env().path == tmp_path
+
+
+def test_appended_rows_stream_back_in_order(store):
+    vectors = random_rows(0, 30)
+    store.append(vectors[:12], predictions(12), "v1", "space")
+    store.append(vectors[12:], predictions(18), "v1", "space")
+    store.close()
+
+    assert (stored_matrix(store) != vectors).nnz == 0
+    metadata = [row for _, rows in store.iter_batches("space") for row in rows]
+    assert [row["domain"] for row in metadata] == [d for d, _ in predictions(12) + predictions(18)]
+    assert store.stats()["rows"] == 30 and store.stats()["open_segments"] == 0
+    with pytest.raises(FeatureStoreError):
+        next(store.iter_batches("other space"))
+
+
+def test_compaction_merges_segments_without_changing_rows(store):
+    vectors = random_rows(1, 20)
+    store.segment_rows = 4
+    store.compact_segments = 1000
+    store.append(vectors, predictions(20), "v1", "space")
+    store.close()
+    assert store.stats()["segments"] == 5
+
+    result = store.compact(target_rows=10)
+    # 4 + 4 rows, 4 + 4 rows, and the last segment on its own
+    assert (result["segments_written"], result["segments_merged"]) == (2, 4)
+    assert store.stats()["segments"] == 3
+    assert (stored_matrix(store) != vectors).nnz == 0
+
+
+def test_compaction_runs_beside_the_writer(store, monkeypatch):
+    store.segment_rows = 1
+    store.compact_segments = 2
+    release = threading.Event()
+    compactions = []
+
+    def slow_compact(*args, **kwargs):
+        compactions.append(threading.current_thread().name)
+        release.wait(10)
+
+    monkeypatch.setattr(store, "compact", slow_compact)
+    vectors = random_rows(2, 6)
+    store.append(vectors[:3], predictions(3), "v1", "space")
+    deadline = time.time() + 5
+    while not compactions and time.time() < deadline:
+        time.sleep(0.01)
+    # The writer keeps committing rows while a compaction is in progress
+    store.append(vectors[3:], predictions(3), "v1", "space")
+    while store.counters["written"] < 6 and time.time() < deadline:
+        time.sleep(0.01)
+    assert compactions == ["feature-store-compactor"]
+    assert store.counters["written"] == 6
+    release.set()
+
+
+@pytest.fixture
+def trained_store(store, tmp_path):
+    vectorizer = tmp_path / "vectorizer.pkl"
+    vectorizer.write_bytes(b"stand-in vectorizer")
+    vectors = random_rows(3, 40)
+    store.append(vectors, predictions(40), "v1", file_fingerprint(str(vectorizer)))
+    store.close()
+    return store, str(vectorizer)
+
+
+def test_training_on_predictions_must_be_acknowledged(trained_store, tmp_path):
+    store, vectorizer = trained_store
+    with pytest.raises(FeatureStoreError, match="pseudo_labels"):
+        train(store, vectorizer, str(tmp_path / "model.pkl"))
+    with pytest.raises(ValueError, match="epochs"):
+        train(store, vectorizer, str(tmp_path / "model.pkl"), epochs=0, pseudo_labels=True)
+    with pytest.raises(SystemExit):
+        main(["train", "--path", str(store.path), "--vectorizer", vectorizer, "--output", str(tmp_path / "m.pkl")])
+
+
+def test_training_streams_the_stored_rows(trained_store, tmp_path):
+    import joblib
+
+    store, vectorizer = trained_store
+    result = train(store, vectorizer, str(tmp_path / "model.pkl"), min_confidence=60,
+                   epochs=2, batch_rows=8, pseudo_labels=True)
+    assert result["rows"] == sum(confidence >= 60 for _, confidence in predictions(40))
+    assert list(joblib.load(tmp_path / "model.pkl").classes_) == ["Data Science", "Software Engineering"]
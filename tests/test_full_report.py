@@ -0,0 +1,24 @@
+def test_full_report_runs_every_analyzer_on_one_extraction(client, app_module, resume_text, monkeypatch):
+    calls = []
+    extract_text = app_module.resume_analyzer.extract_text
+
+    def counting_extract(file_content, filename):
+        calls.append(filename)
+        return extract_text(file_content, filename)
+
+    monkeypatch.setattr(app_module.resume_analyzer, "extract_text", counting_extract)
+    response = client.post("/api/full-report", files={"file": ("resume.txt", resume_text.encode(), "text/plain")})
+
+    assert response.status_code == 200
+    report = response.json()
+    assert calls == ["resume.txt"]
+    assert report["classification"]["domain"]
+    assert "suggestions" in report["improvement"]
+    assert "overall_score" in report["plagiarism"]
+    assert report["contact_info"]["email"] == "jane.doe@example.com"
+    assert {"classification", "improvement", "plagiarism", "text_fields"} <= set(report["stage_timings"])
+
+
+def test_full_report_rejects_unreadable_upload(client):
+    response = client.post("/api/full-report", files={"file": ("resume.txt", b"   ", "text/plain")})
+    assert response.status_code in (400, 422)
@@ -0,0 +1,93 @@
+import pytest
+
+from incremental import IncrementalAnalyzer
+from models import ResumeImprover
+from rules import RuleSet
+
+REVISIONS = [
+    "",
+    "Led a team of 6 engineers and reduced API latency by 45%.",
+    "Skills\nPython, SQL, Docker, Kubernetes\nMachine learning with scikit-learn and TensorFlow",
+    "\n\nVolunteer\nTaught Python to high school students\n",
+]
+
+
+@pytest.fixture
+def incremental(app_module):
+    return IncrementalAnalyzer(app_module.resume_analyzer, app_module.plagiarism_checker,
+                               app_module.resume_improver)
+
+
+def revisions(base):
+    """Successive edits: append, rewrite a line, reorder, delete"""
+    texts = [base]
+    for addition in REVISIONS[1:]:
+        texts.append(texts[-1] + "\n" + addition)
+    lines = texts[-1].split("\n")
+    texts.append("\n".join(lines[:3] + ["Python developer with 7 years of experience."] + lines[4:]))
+    texts.append("\n".join(reversed(texts[-1].split("\n"))))
+    texts.append("\n".join(texts[-1].split("\n")[::2]))
+    return texts
+
+
+def test_classification_matches_a_full_recompute(app_module, incremental, resume_text):
+    analyzer = app_module.resume_analyzer
+    for text in revisions(resume_text):
+        assert incremental.classify("doc", text) == analyzer.predict_domain_from_text(text)
+
+
+def test_vector_matches_the_vectorizer(app_module, incremental, resume_text):
+    analyzer = app_module.resume_analyzer
+    for text in revisions(resume_text):
+        incremental.classify("doc", text)
+        document = incremental._document("doc")
+        expected = analyzer.vectorizer.transform([analyzer.clean_text(text)])
+        actual = incremental._tfidf_vector(dict(document.term_counts))
+        assert (actual != expected).nnz == 0
+
+
+def test_plagiarism_and_improvement_match_a_full_recompute(app_module, incremental, resume_text):
+    for text in revisions(resume_text):
+        assert incremental.check_plagiarism("doc", text) == app_module.plagiarism_checker.check_plagiarism(text)
+        assert incremental.analyze_resume("doc", text, "Data Science") == \
+            app_module.resume_improver.analyze_resume(text, "Data Science")
+
+
+def test_rule_matches_spanning_several_long_lines(app_module, resume_text):
+    improver = ResumeImprover()
+    improver.rules = RuleSet({"rules": [{
+        "id": "team_size",
+        "pattern": r"led\s+a\s+team[\s\S]{0,200}?\bengineers\b",
+        "min_count": 0, "max_count": 0,
+        "category": "content", "title": "t", "description": "d", "example": "e", "priority": "high"
+    }]})
+    incremental = IncrementalAnalyzer(app_module.resume_analyzer, app_module.plagiarism_checker, improver)
+    text = resume_text.replace("Led a team of 4 engineers",
+                               "Led a team\nof highly motivated and extremely capable\n4 software engineers")
+
+    assert len(incremental.analyze_resume("doc", resume_text)["suggestions"]) == 1
+    # The match now spans three lines and more than 32 characters on each side
+    assert incremental.analyze_resume("doc", text) == improver.analyze_resume(text)
+    assert len(improver.analyze_resume(text)["suggestions"]) == 1
+
+
+def test_only_changed_paragraphs_are_recomputed(incremental, resume_text):
+    incremental.classify("doc", resume_text)
+    first = incremental.revision_info("doc")
+    assert first["paragraphs_recomputed"] == len(set(resume_text.split("\n")))
+
+    edited = resume_text.replace("reduced API latency by 40%", "reduced API latency by 55%")
+    incremental.classify("doc", edited)
+    info = incremental.revision_info("doc")
+    assert info["revision"] == 2
+    assert info["paragraphs_recomputed"] == 1
+    assert info["paragraphs_reused"] == info["paragraphs_total"] - 1
+
+
+def test_documents_are_evicted_least_recently_revised_first(app_module):
+    incremental = IncrementalAnalyzer(app_module.resume_analyzer, app_module.plagiarism_checker,
+                                      app_module.resume_improver, max_documents=2)
+    for document_id in ["a", "b", "a", "c"]:
+        incremental.check_plagiarism(document_id, f"Resume {document_id}")
+    assert incremental.revision_info("b") is None
+    assert incremental.revision_info("a") is not None
@@ -0,0 +1,122 @@
+import json
+
+import numpy as np
+import pytest
+
+from job_matcher import JobIndex, JobIndexError, read_postings
+
+POSTINGS = [
+    {"id": 1, "title": "Backend Engineer", "description": "Python Django REST APIs SQL Docker AWS microservices"},
+    {"id": 2, "title": "Data Scientist", "description": "machine learning statistics python pandas models"},
+    {"id": 3, "title": "Nurse", "description": "patient care hospital clinical nursing medication"},
+    {"id": 4, "title": "Accountant", "description": "accounting ledger audit tax reconciliation excel"},
+    {"id": 5, "title": "Teacher", "description": "classroom curriculum students lesson planning"},
+]
+
+
+@pytest.fixture
+def index(app_module, tmp_path):
+    index = JobIndex(str(tmp_path / "jobs"), app_module.resume_analyzer)
+    index.add(POSTINGS, replace=True)
+    return index
+
+
+def test_top_k_matches_brute_force_cosine(index, resume_text):
+    [matches] = index.search([resume_text], top_k=3)
+    matrix = index.vectorize([p["description"] for p in POSTINGS]).toarray()
+    scores = matrix @ index.vectorize([resume_text]).toarray()[0]
+    expected = [POSTINGS[i]["title"] for i in np.argsort(-scores)[:3] if scores[i] > 0]
+
+    assert [match["title"] for match in matches] == expected
+    assert matches[0]["title"] == "Backend Engineer"
+    assert matches[0]["score"] == pytest.approx(scores.max(), abs=1e-4)
+    assert [m["score"] for m in matches] == sorted((m["score"] for m in matches), reverse=True)
+
+
+def test_batch_search_scores_each_resume(index, resume_text):
+    results = index.search([resume_text, "hospital patient care and medication rounds"], top_k=1)
+    assert [matches[0]["title"] for matches in results] == ["Backend Engineer", "Nurse"]
+
+
+def test_added_postings_are_indexed_without_revectorizing_the_rest(index, monkeypatch):
+    vectorized = []
+    vectorize = index.vectorize
+    monkeypatch.setattr(index, "vectorize", lambda texts: vectorized.append(list(texts)) or vectorize(texts))
+
+    stats = index.add([{"id": 6, "title": "ML Engineer", "description": "pytorch deep learning python"}])
+    assert vectorized == [["pytorch deep learning python"]]
+    assert len(stats["segments"]) == 2
+    assert stats["postings"] == 6
+
+
+def test_reindexed_posting_supersedes_the_old_row_until_compaction(index):
+    index.add([{"id": 3, "title": "ICU Nurse", "description": "intensive care unit patient care hospital"}])
+    titles = [m["title"] for m in index.search(["patient care in a hospital"], top_k=5)[0]]
+    assert "ICU Nurse" in titles and "Nurse" not in titles
+    assert index.stats()["postings"] == 5
+
+    stats = index.compact()
+    assert [(s["rows"], s["live"]) for s in stats["segments"]] == [(5, 5)]
+    assert [m["title"] for m in index.search(["patient care in a hospital"], top_k=5)[0]][0] == "ICU Nurse"
+
+
+def test_other_processes_see_new_segments(app_module, index):
+    reader = JobIndex(str(index.path), app_module.resume_analyzer)
+    assert reader.stats()["postings"] == 5
+    index.add([{"id": 7, "title": "Marketing Lead", "description": "sales marketing food brands"}])
+    assert reader.search(["sales and marketing"], top_k=1)[0][0]["title"] == "Marketing Lead"
+
+
+def test_compacted_segments_stay_readable_for_the_grace_period(app_module, index):
+    index.add([{"id": 7, "title": "Marketing Lead", "description": "sales marketing food brands"}])
+    old = json.loads((index.path / "manifest.json").read_text())
+    index.compact()
+
+    # A reader that read the manifest just before the swap can still map it
+    reader = JobIndex(str(index.path), app_module.resume_analyzer)
+    reader._load(old)
+    assert reader.stats()["postings"] == 6
+    assert sorted(json.loads((index.path / "manifest.json").read_text())["retired"]) == old["segments"]
+
+    index.retire_seconds = 0
+    index.add([{"id": 8, "title": "Chef", "description": "kitchen cooking menu"}])
+    assert not any((index.path / name).exists() for name in old["segments"])
+
+
+def test_reader_rereads_the_manifest_when_a_segment_is_gone(app_module, index, monkeypatch):
+    index.retire_seconds = 0
+    old = json.loads((index.path / "manifest.json").read_text())
+    index.add([{"id": 7, "title": "Marketing Lead", "description": "sales marketing food brands"}])
+    index.compact()
+    assert not (index.path / old["segments"][0]).exists()
+
+    reader = JobIndex(str(index.path), app_module.resume_analyzer)
+    manifests = [old]
+    read_manifest = reader._read_manifest
+    monkeypatch.setattr(reader, "_read_manifest", lambda: manifests.pop() if manifests else read_manifest())
+    assert reader.search(["sales and marketing"], top_k=1)[0][0]["title"] == "Marketing Lead"
+
+
+def test_index_from_another_vectorizer_is_rejected(index):
+    manifest_path = index.path / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest_path.write_text(json.dumps({**manifest, "vectorizer": "other"}))
+    with pytest.raises(JobIndexError):
+        index.search(["python"])
+
+
+def test_postings_files_need_ids(tmp_path):
+    path = tmp_path / "postings.csv"
+    path.write_text("id,description\n1,python\n,missing id\n")
+    with pytest.raises(ValueError, match="1 postings have no id"):
+        read_postings(str(path))
+
+
+def test_api_matches_against_the_configured_index(client, app_module, resume_text):
+    app_module.job_index.add(POSTINGS, replace=True)
+    response = client.post("/api/jobs/match?top_k=2", files={"file": ("resume.txt", resume_text.encode(), "text/plain")})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_postings"] == 5
+    assert len(body["matches"]) <= 2
+    assert body["matches"][0]["title"] == "Backend Engineer"
@@ -0,0 +1,67 @@
+import tracemalloc
+
+import pytest
+
+from profiling import MB, MemoryProfiler
+
+
+@pytest.fixture
+def profiler():
+    was_tracing = tracemalloc.is_tracing()
+    yield MemoryProfiler(enabled=True, threshold_mb=4, top_n=5)
+    if not was_tracing:
+        tracemalloc.stop()
+
+
+def stats_for(profiler, stage, file_type="unknown"):
+    return next(s for s in profiler.summary()["stages"]
+                if s["stage"] == stage and s["file_type"] == file_type)
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = MemoryProfiler(enabled=False)
+    with profiler.request(), profiler.stage("classification"):
+        bytearray(MB)
+    assert profiler.summary() == {"enabled": False}
+
+
+def test_stage_records_peak_and_net_allocation(profiler):
+    kept = []
+    with profiler.stage("extraction"):
+        bytearray(2 * MB)
+        kept.append(bytearray(MB))
+
+    stats = stats_for(profiler, "extraction")
+    assert stats["count"] == 1
+    assert stats["max_peak_mb"] >= 2
+    assert 0.9 <= stats["avg_net_mb"] < 2
+
+
+def test_nested_peak_is_inherited_by_the_enclosing_stage(profiler):
+    with profiler.stage("outer"):
+        with profiler.stage("inner"):
+            bytearray(3 * MB)
+        bytearray(MB // 2)
+
+    assert stats_for(profiler, "inner")["max_peak_mb"] >= 3
+    assert stats_for(profiler, "outer")["max_peak_mb"] >= 3
+
+
+def test_only_the_innermost_offending_stage_is_reported(profiler):
+    with profiler.stage("outer"), profiler.stage("inner"):
+        bytearray(6 * MB)
+
+    reports = profiler.summary()["reports"]
+    assert [report["stage"] for report in reports] == ["inner"]
+    assert reports[0]["peak_mb"] >= 4
+    assert len(reports[0]["top_allocations"]) <= 5
+
+
+def test_stages_are_grouped_by_request_file_type(profiler):
+    with profiler.request():
+        MemoryProfiler.set_file_type("pdf")
+        with profiler.stage("extraction"):
+            bytearray(MB)
+
+    assert stats_for(profiler, "extraction", "pdf")["count"] == 1
+    assert stats_for(profiler, "request", "pdf")["count"] == 1
@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+import pytest
+
+import monitoring
+from monitoring import CountMinSketch, PredictionMonitor, QuantileSketch
+
+
+def test_quantiles_are_within_one_bin():
+    rng = random.Random(1)
+    values = [rng.uniform(0, 100) for _ in range(5000)]
+    first, second = QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        (first if i % 2 else second).add(value)
+    first.merge(second)
+
+    assert first.count == len(values)
+    for q in (0.1, 0.5, 0.9):
+        assert abs(first.quantile(q) - np.quantile(values, q)) <= first.resolution
+    assert first.mean() == pytest.approx(np.mean(values), abs=0.01)
+
+
+def test_count_min_never_undercounts_and_finds_heavy_hitters():
+    rng = random.Random(2)
+    sketch = CountMinSketch(width=64, depth=4, candidates=5)
+    heavy = {f"heavy{i}": 200 - 30 * i for i in range(3)}
+    stream = [term for term, count in heavy.items() for _ in range(count)]
+    stream += [f"rare{rng.randrange(1000)}" for _ in range(2000)]
+    rng.shuffle(stream)
+    for start in range(0, len(stream), 50):
+        sketch.add(stream[start:start + 50])
+
+    counts = {term: stream.count(term) for term in set(stream)}
+    terms = list(counts)
+    assert all(estimate >= counts[t] for t, estimate in zip(terms, sketch.estimate(terms)))
+    assert [entry["term"] for entry in sketch.top(3)] == list(heavy)
+
+
+def test_sketches_allocate_on_first_use():
+    quantiles, counts = QuantileSketch(), CountMinSketch()
+    assert quantiles.counts is None and counts.table is None
+    assert quantiles.quantile(0.5) is None and quantiles.count == 0
+    assert counts.estimate(["python"]) == [0] and counts.top(5) == []
+
+    quantiles.merge(QuantileSketch())
+    counts.merge(CountMinSketch())
+    assert quantiles.counts is None and counts.table is None
+    counts.add(["python"])
+    assert counts.table.nbytes == counts.nbytes
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(monitoring.time, "time", lambda: now[0])
+    return now
+
+
+def test_windows_report_shifts_between_them(clock):
+    monitor = PredictionMonitor(window_seconds=60, buckets_per_window=6)
+    for _ in range(20):
+        monitor.record_prediction({"domain": "Data Science", "confidence": 90.0}, tokens=10, oov_terms=["kaggle"])
+    monitor.record_extraction("pdf", True)
+
+    clock[0] += 60
+    for _ in range(10):
+        monitor.record_prediction({"domain": "Marketing", "confidence": 40.0}, tokens=10,
+                                  oov_terms=["tiktok", "tiktok"])
+    monitor.record_prediction({"domain": "Marketing", "confidence": 0.0}, fallback=True)
+    monitor.record_prediction({"error": "No valid text found after processing"})
+    monitor.record_extraction("docx", False)
+
+    snapshot = monitor.snapshot()
+    current, previous, deltas = snapshot["current"], snapshot["previous"], snapshot["deltas"]
+    assert previous["domains"] == {"Data Science": 1.0}
+    assert current["outcomes"] == {"ok": 10, "fallback": 1, "error": 1}
+    assert current["extraction_failure_rate"] == 1.0 and previous["extraction_failure_rate"] == 0.0
+    assert current["top_oov_terms"][0] == {"term": "tiktok", "count": 20}
+    assert deltas["predictions"] == 12 - 20
+    assert deltas["confidence_p50"] < -40
+    assert deltas["domain_shift"]["js_divergence"] > 0.5
+    assert deltas["oov_terms"][0] == {"term": "tiktok", "count": 20, "previous": 0, "delta": 20}
+
+    # Both windows slide out after two more window lengths
+    clock[0] += 120
+    assert monitor.snapshot()["current"]["predictions"] == monitor.snapshot()["previous"]["predictions"] == 0
+
+
+def test_memory_is_fixed_however_much_traffic_arrives(clock):
+    monitor = PredictionMonitor(window_seconds=60, buckets_per_window=6)
+    memory = monitor.snapshot()["memory_bytes"]
+    for i in range(5000):
+        clock[0] += 0.1
+        monitor.record_prediction({"domain": f"Domain {i % 7}", "confidence": i % 100},
+                                  tokens=5, oov_terms=[f"term{i}"])
+    assert monitor.snapshot()["memory_bytes"] == memory
+    assert len(monitor._buckets) == 12
+    assert all(len(b.oov.candidates) <= monitor.top_terms * 2 for b in monitor._buckets)
+
+
+def test_monitoring_endpoint(client):
+    body = client.get("/admin/monitoring").json()
+    assert body["enabled"] is True
+    assert {"current", "previous", "deltas"} <= set(body)
@@ -0,0 +1,70 @@
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import PyPDF2
+import pytest
+
+from conftest import make_pdf
+from extractors import extract_pdf_text, iter_pdf_pages
+
+PAGES = [f"Page {n} Python Django" for n in range(1, 7)]
+
+
+@pytest.fixture
+def slow_page_three(monkeypatch):
+    """Make extracting page 3 hang far past any page timeout"""
+    extract_text = PyPDF2.PageObject.extract_text
+
+    def slow_extract(page, *args, **kwargs):
+        text = extract_text(page, *args, **kwargs)
+        if "Page 3" in text:
+            time.sleep(30)
+        return text
+
+    monkeypatch.setattr(PyPDF2.PageObject, "extract_text", slow_extract)
+
+
+def test_serial_extraction_keeps_page_order():
+    result = extract_pdf_text(make_pdf(PAGES))
+    assert result["pages_total"] == result["pages_extracted"] == 6
+    assert result["text"].split(" Python Django ")[:3] == ["Page 1", "Page 2", "Page 3"]
+
+
+def test_sharded_extraction_matches_serial():
+    pdf = make_pdf(PAGES)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        sharded = extract_pdf_text(pdf, executor=executor, workers=2, min_pages_per_shard=2)
+    assert sharded == extract_pdf_text(pdf)
+
+
+def test_serial_extraction_times_out_a_slow_page(slow_page_three):
+    started = time.time()
+    result = extract_pdf_text(make_pdf(PAGES), page_timeout=0.2)
+    assert time.time() - started < 5
+    assert result["pages_skipped"] == [{"page": 3, "reason": "page_timeout"}]
+    assert result["pages_extracted"] == 5
+
+
+def test_lazy_pages_time_out_a_slow_page(slow_page_three):
+    total, pages = iter_pdf_pages(make_pdf(PAGES), page_timeout=0.2)
+    skipped = [record for _, record in pages if record]
+    assert total == 6
+    assert skipped == [{"page": 3, "reason": "page_timeout"}]
+
+
+def test_sharded_extraction_times_out_a_slow_page(slow_page_three):
+    # The pool forks after the patch, so workers hang on page 3 too
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        result = extract_pdf_text(make_pdf(PAGES), executor=executor, workers=2,
+                                  page_timeout=0.2, min_pages_per_shard=2)
+    assert result["pages_skipped"] == [{"page": 3, "reason": "page_timeout"}]
+    assert result["pages_extracted"] == 5
+
+
+def test_serial_extraction_off_the_main_thread_still_works():
+    results = []
+    thread = threading.Thread(target=lambda: results.append(extract_pdf_text(make_pdf(PAGES))))
+    thread.start()
+    thread.join()
+    assert results[0]["pages_extracted"] == 6
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from starlette.testclient import TestClient
+
+from admission import AdmissionControl, AdmissionMiddleware, Lane
+from profiling import (ProfileStore, RequestProfiler, RequestProfilerMiddleware, RequestRecord,
+                       _request_record)
+
+
+class Recorder:
+    """Stands in for the prediction monitor and the feature store"""
+
+    def __init__(self):
+        self.calls = []
+
+    def record_prediction(self, *args):
+        self.calls.append("prediction")
+
+    def record_extraction(self, *args):
+        self.calls.append("extraction")
+
+    def append(self, *args):
+        self.calls.append("features")
+
+    def __bool__(self):
+        return True
+
+
+def admission(max_queue=10):
+    lane = dict(queue_timeout=1.0, max_queue=max_queue, rate=100.0, burst=100.0)
+    return AdmissionControl(Lane("heavy", limit=1, **lane), Lane("light", limit=1, **lane))
+
+
+def profiled_app(profiler, control, handle):
+    """A raw ASGI upload endpoint behind the profiler and admission, as in main"""
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while (await receive())["type"] != "lifespan.shutdown":
+                await send({"type": "lifespan.startup.complete"})
+            return await send({"type": "lifespan.shutdown.complete"})
+        while (await receive()).get("more_body"):
+            pass
+        await handle(profiler.replaying())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return AdmissionMiddleware(RequestProfilerMiddleware(app, profiler), control)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_replay_is_on_by_default(monkeypatch, tmp_path):
+    monkeypatch.setenv("SLOW_PROFILE_DIR", str(tmp_path))
+    monkeypatch.delenv("SLOW_PROFILE_REPLAY", raising=False)
+    assert RequestProfiler.from_env().replay is True
+    monkeypatch.setenv("SLOW_PROFILE_REPLAY", "0")
+    assert RequestProfiler.from_env().replay is False
+
+
+def test_counters_are_exact_across_threads(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)))
+
+    def bump():
+        for _ in range(10000):
+            profiler.count("stored")
+
+    threads = [threading.Thread(target=bump) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert profiler.metrics()["stored"] == 80000
+
+
+def test_slow_request_without_replay_keeps_its_timings(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), sample_rate=0, threshold_ms=10, replay=False)
+    runs = []
+
+    async def handle(replaying):
+        runs.append(replaying)
+        await asyncio.sleep(0.05)
+
+    with TestClient(profiled_app(profiler, admission(), handle)) as client:
+        assert client.post("/api/analyze-resume", content=b"resume").status_code == 200
+        assert wait_for(lambda: profiler.counters["stored"] == 1)
+    assert runs == [False]
+    assert profiler.store.list()[0]["reason"] == "slow"
+
+
+def test_replay_holds_a_heavy_slot(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), sample_rate=0, threshold_ms=10)
+    control = admission()
+    heavy = control.lanes["heavy"]
+    runs = []
+
+    async def handle(replaying):
+        runs.append((replaying, heavy.active))
+        await asyncio.sleep(0.05)
+
+    with TestClient(profiled_app(profiler, control, handle)) as client:
+        assert client.post("/api/analyze-resume", content=b"resume").status_code == 200
+        assert wait_for(lambda: profiler.counters["stored"] == 1)
+    assert runs == [(False, 1), (True, 1)]
+    assert heavy.counters["admitted"] == 2
+    assert heavy.active == 0
+    assert profiler.counters["replayed"] == 1
+    assert profiler.store.list()[0]["reason"] == "slow_replay"
+
+
+def test_shed_replay_still_keeps_the_slow_timings(tmp_path):
+    profiler = RequestProfiler(ProfileStore(str(tmp_path)), sample_rate=0, threshold_ms=10)
+    control = admission(max_queue=0)
+    heavy = control.lanes["heavy"]
+    runs = []
+
+    async def handle(replaying):
+        runs.append(replaying)
+        await asyncio.sleep(0.05)
+        # Another upload takes the slot as soon as this one frees it
+        heavy.limit = 0
+
+    with TestClient(profiled_app(profiler, control, handle)) as client:
+        assert client.post("/api/analyze-resume", content=b"resume").status_code == 200
+        assert wait_for(lambda: profiler.counters["stored"] == 1)
+    assert runs == [False]
+    assert profiler.counters["replays_skipped"] == 1
+    assert profiler.store.list()[0]["reason"] == "slow"
+
+
+@pytest.mark.parametrize("adaptive", [False, True])
+@pytest.mark.parametrize("replay, expected", [
+    (False, ["extraction", "features", "prediction"]),
+    (True, [])
+])
+def test_replays_are_not_counted_twice(app_module, monkeypatch, resume_text, replay, expected, adaptive):
+    analyzer = app_module.resume_analyzer
+    recorder = Recorder()
+    monkeypatch.setattr(analyzer, "monitor", recorder)
+    monkeypatch.setattr(analyzer, "feature_store", recorder)
+
+    token = _request_record.set(RequestRecord(sampled=True, replay=replay))
+    try:
+        result = analyzer.predict_domain(resume_text.encode(), "resume.txt", adaptive=adaptive)
+    finally:
+        _request_record.reset(token)
+    assert "error" not in result
+    assert recorder.calls == expected
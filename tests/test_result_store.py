@@ -0,0 +1,126 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+from result_store import ResultStore, content_hash, file_fingerprint, fingerprint
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(str(tmp_path / "results.sqlite3"))
+
+
+def test_key_carries_hash_analyzer_version_and_params():
+    key = ResultStore.make_key("abc", "classification", "v1", 5, "en")
+    assert key == "abc|classification|v1|5|en"
+    assert key != ResultStore.make_key("abc", "classification", "v2", 5, "en")
+
+
+def test_fingerprint_is_stable_and_order_sensitive():
+    assert fingerprint("model", 3) == fingerprint("model", 3)
+    assert fingerprint("model", 3) != fingerprint(3, "model")
+    assert fingerprint({"b": 1, "a": 2}) == fingerprint({"a": 2, "b": 1})
+
+
+def test_file_fingerprint_follows_file_contents(tmp_path):
+    path = tmp_path / "model.pkl"
+    path.write_bytes(b"one")
+    before = file_fingerprint(str(path))
+    path.write_bytes(b"two")
+    assert file_fingerprint(str(path)) != before
+    assert file_fingerprint(str(tmp_path / "missing.pkl")) == file_fingerprint(str(tmp_path / "missing.pkl"))
+
+
+def test_round_trip_and_version_miss(store):
+    file_hash = content_hash(b"resume")
+    store.put(ResultStore.make_key(file_hash, "classification", "v1"), {"domain": "Data Science"})
+
+    assert store.get(ResultStore.make_key(file_hash, "classification", "v1")) == {"domain": "Data Science"}
+    # A retrained model gets a new version, so the old result is never served
+    assert store.get(ResultStore.make_key(file_hash, "classification", "v2")) is None
+
+
+def test_get_many_returns_only_present_keys(store):
+    store.put_many({"a": 1, "b": [2]})
+    assert store.get_many(["a", "b", "c"]) == {"a": 1, "b": [2]}
+    assert store.get_many([]) == {}
+
+
+def test_reads_skip_the_recency_touch_while_a_writer_holds_the_lock(tmp_path):
+    store = ResultStore(str(tmp_path / "results.sqlite3"), touch_interval=0)
+    store.put("key", {"score": 7})
+    writer = sqlite3.connect(store.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        start = time.monotonic()
+        assert store.get("key") == {"score": 7}
+        # Without the short timeout the touch would wait out busy_timeout
+        assert time.monotonic() - start < 1.0
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+    assert store.get("key") == {"score": 7}
+
+
+def test_api_looks_up_stored_results_off_the_event_loop(client, app_module, monkeypatch, resume_text):
+    on_loop = []
+    get_many = app_module.result_store.get_many
+
+    def recording_get_many(keys):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return get_many(keys)
+
+    monkeypatch.setattr(app_module.result_store, "get_many", recording_get_many)
+    files = {"file": ("resume.txt", resume_text.encode(), "text/plain")}
+    assert client.post("/api/analyze-resume", files=files).status_code == 200
+    assert on_loop and not any(on_loop)
+
+
+def test_results_survive_reopening(store):
+    store.put("key", {"score": 7})
+    assert ResultStore(store.path).get("key") == {"score": 7}
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    payload = "x" * 1000
+    entry = len(json.dumps(payload)) + len("k0")
+    store = ResultStore(str(tmp_path / "results.sqlite3"), max_bytes=entry * 4,
+                        touch_interval=0, evict_every=1)
+    for key in ["k0", "k1", "k2", "k3"]:
+        store.put(key, payload)
+        time.sleep(0.01)
+    store.get("k0")
+    time.sleep(0.01)
+    store.put("k4", payload)
+
+    # Over budget, the store trims to 90%: the two least recently used go
+    assert sorted(store.get_many(["k0", "k1", "k2", "k3", "k4"])) == ["k0", "k3", "k4"]
+    assert store.stats()["bytes"] <= entry * 4
+
+
+def test_api_serves_repeat_uploads_from_the_store(client, resume_text):
+    files = {"file": ("resume.txt", resume_text.encode(), "text/plain")}
+    first = client.post("/api/full-report", files=files).json()
+    second = client.post("/api/full-report", files=files).json()
+
+    assert first["cached_stages"] == []
+    assert {"classification", "improvement", "plagiarism", "text_fields"} <= set(second["cached_stages"])
+    assert second["classification"] == first["classification"]
+    assert "extraction" not in second["stage_timings"]
+
+
+def test_api_recomputes_when_an_analyzer_version_changes(client, app_module, resume_text, monkeypatch):
+    files = {"file": ("resume.txt", resume_text.encode(), "text/plain")}
+    client.post("/api/full-report", files=files)
+    monkeypatch.setitem(app_module.ANALYZER_VERSIONS, "plagiarism", "retrained")
+
+    second = client.post("/api/full-report", files=files).json()
+    assert "plagiarism" not in second["cached_stages"]
+    assert "classification" in second["cached_stages"]
@@ -0,0 +1,102 @@
+import re
+from collections import Counter
+
+import pytest
+
+from conftest import ROOT, SAMPLE_RESUME
+from rules import RuleError, RuleSet, load_rule_set
+
+
+def rule(rule_id, **matcher):
+    return {"id": rule_id, "category": "content", "title": rule_id, "description": rule_id,
+            "example": rule_id, "priority": "medium", **matcher}
+
+
+def counts_by_rule(rule_set, text):
+    totals = Counter()
+    for (matcher, _), count in rule_set.scan(text).items():
+        totals[matcher] += count
+    return {r.id: totals[r.matcher] for r in rule_set.rules}
+
+
+PATTERNS = {
+    "growth": r"grew \w+ by \d+%",
+    "metrics": r"\d+%",
+    "yearly": r"\d+% in a year",
+    "money": r"\$\d+",
+    "python_version": r"\bpython\s*\d",
+    "plural": r"\bteams?\b",
+    "either": r"\bled|managed",
+    "github": "github",
+    "acronym": r"\bAWS\b"
+}
+
+
+def test_overlapping_patterns_each_count_their_matches():
+    rule_set = RuleSet({"rules": [rule(name, pattern=PATTERNS[name]) for name in ("growth", "metrics", "yearly")]})
+    counts = counts_by_rule(rule_set, "Grew revenue by 40% in a year.")
+    assert counts == {"growth": 1, "metrics": 1, "yearly": 1}
+
+
+@pytest.mark.parametrize("text", [
+    SAMPLE_RESUME,
+    "Grew sales by 12% and grew churn by 3%, 4% 5%. Led teams, managed a team of 4; python3, Python 3.11",
+    "github.com/dev GitHub AWS aws Managed $100 $2000 team teams teamwork"
+])
+def test_counts_match_finditer_per_pattern(text):
+    spec = {"rules": [rule(name, pattern=pattern, case_sensitive=name == "acronym")
+                      for name, pattern in PATTERNS.items()]}
+    expected = {name: len(re.findall(pattern, text, 0 if name == "acronym" else re.IGNORECASE))
+                for name, pattern in PATTERNS.items()}
+    assert counts_by_rule(RuleSet(spec), text) == expected
+
+
+def test_keywords_match_whole_tokens_and_phrases():
+    rule_set = RuleSet({"rules": [
+        rule("ml", keywords=["machine learning", "Deep Learning"]),
+        rule("r", case_sensitive_keywords=["R"])
+    ]})
+    text = "Machine learning in R; deep learning. machinery, r, Rust"
+    assert counts_by_rule(rule_set, text) == {"ml": 2, "r": 1}
+
+
+def test_section_rules_count_below_their_heading():
+    spec = {"sections": {"experience": ["work experience"], "skills": []},
+            "rules": [rule("metrics", pattern=r"\d+%", section="experience", min_count=2)]}
+    rule_set = RuleSet(spec)
+    text = "Summary\nImproved things by 10%\n\nWork Experience:\nCut costs 20%\nSkills\nPython 100%\n"
+    counts = rule_set.scan(text)
+    assert counts[rule_set.rules[0].matcher, "experience"] == 1
+    assert [s["title"] for s in rule_set.evaluate(counts)] == ["metrics"]
+
+
+def test_rules_fire_outside_their_count_range_by_priority():
+    spec = {"rules": [
+        rule("verbs", keywords=["led"]),
+        {**rule("no_objective", keywords=["objective"], max_count=0), "priority": "high"},
+        {**rule("github", pattern="github", domains=["Software Engineering"]), "priority": "low"}
+    ]}
+    rule_set = RuleSet(spec)
+    counts = rule_set.scan("Objective: get a job")
+    assert [s["title"] for s in rule_set.evaluate(counts)] == ["no_objective", "verbs"]
+    assert [s["title"] for s in rule_set.evaluate(counts, "Software Engineering")] == \
+        ["no_objective", "verbs", "github"]
+
+
+@pytest.mark.parametrize("entry, message", [
+    (rule("bad", pattern="("), "invalid pattern"),
+    (rule("empty", pattern="x*"), "empty string"),
+    (rule("named", pattern="(?P<n>x)"), "named groups"),
+    (rule("none"), "needs a pattern or keywords"),
+    ({**rule("prio", keywords=["x"]), "priority": "urgent"}, "unknown priority"),
+    (rule("section", keywords=["x"], section="hobbies"), "undefined section")
+])
+def test_malformed_rules_are_rejected(entry, message):
+    with pytest.raises(RuleError, match=message):
+        RuleSet({"rules": [entry]})
+
+
+def test_bundled_rules_load():
+    rule_set = load_rule_set(str(ROOT / "public/models/improvement_rules.json"))
+    assert rule_set is not None and rule_set.rules
+    assert rule_set.evaluate(rule_set.scan(SAMPLE_RESUME), "Software Engineering") is not None
@@ -0,0 +1,68 @@
+import os
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+import serve
+from conftest import ROOT
+
+SUPERVISOR = textwrap.dedent("""
+    import os, sys
+    import serve
+
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": str(os.getpid()).encode()})
+
+    sock = serve.bind_socket("127.0.0.1", 0, 64)
+    print(sock.getsockname()[1], flush=True)
+    serve.Supervisor(app, sock, workers=1, max_requests=2, max_requests_jitter=0,
+                     graceful_timeout=5, log_level="warning", report_memory=False).run()
+""")
+
+
+def get(port: int) -> str:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=10) as response:
+        return response.read().decode()
+
+
+def test_default_worker_count_is_positive():
+    assert serve.default_worker_count() >= 1
+
+
+def test_memory_stats_for_this_process():
+    stats = serve.read_memory_stats(os.getpid())
+    if stats:
+        assert stats["rss_kb"] > 0
+        assert stats["shared_kb"] + stats["private_kb"] <= stats["rss_kb"] + 1
+
+
+def test_memory_stats_for_missing_process_are_empty():
+    assert serve.read_memory_stats(2 ** 22 + 1) == {}
+
+
+def test_workers_are_recycled_and_drained_on_sigterm():
+    process = subprocess.Popen([sys.executable, "-c", SUPERVISOR], cwd=ROOT,
+                               stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(process.stdout.readline())
+        first = get(port)
+        get(port)
+        # max_requests=2: the worker exits on its next tick and a fresh one takes over
+        deadline = time.time() + 10
+        while get(port) == first:
+            assert time.time() < deadline, "worker was not recycled"
+            time.sleep(0.1)
+
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
+        assert "All workers stopped" in process.stdout.read()
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
@@ -0,0 +1,114 @@
+import asyncio
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_run():
+    calls = []
+
+    async def work(value):
+        calls.append(value)
+        await asyncio.sleep(0.05)
+        return {"value": value}
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(flight.do("k", work, 1), flight.do("k", work, 2),
+                                       flight.do("other", work, 3))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert calls == [1, 3]
+    assert [shared for _, shared in results] == [False, True, False]
+    assert results[0][0] is results[1][0]
+    assert flight.metrics() == {"leaders": 2, "coalesced": 1, "errors": 0, "in_flight": 0}
+
+
+def test_errors_reach_every_caller():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("broken upload")
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flight.stats["errors"] == 1
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+def test_nothing_is_cached_after_completion():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        flight = SingleFlight()
+        return [await flight.do("k", work), await flight.do("k", work)]
+
+    assert asyncio.run(scenario()) == [(1, False), (2, False)]
+
+
+def run_concurrently(app_module, uploads):
+    """Run a slow analyzer for several (content, filename, document_id) uploads at once"""
+    calls = []
+
+    def slow_analyzer(text):
+        calls.append(text)
+        time.sleep(0.1)
+        return {"length": len(text)}
+
+    async def scenario():
+        analyses = [app_module.UploadAnalysis(content, filename, document_id=document_id)
+                    for content, filename, document_id in uploads]
+        await asyncio.gather(*(analysis.run("text_fields", slow_analyzer) for analysis in analyses))
+        return analyses
+
+    return calls, asyncio.run(scenario())
+
+
+@pytest.fixture
+def upload(resume_text):
+    return resume_text.encode()
+
+
+def test_identical_uploads_coalesce(app_module, upload):
+    calls, analyses = run_concurrently(app_module, [(upload, "resume.txt", None)] * 2)
+    assert len(calls) == 1
+    # Store lookups run in worker threads, so either request may lead
+    assert sorted(analysis.coalesced_stages for analysis in analyses) == [[], ["text_fields"]]
+
+
+def test_uploads_of_other_documents_or_filenames_do_not_coalesce(app_module, upload):
+    calls, analyses = run_concurrently(app_module, [
+        (upload, "resume.txt", "doc-a"),
+        (upload, "resume.txt", "doc-b"),
+        (upload, "cv.txt", "doc-a"),
+    ])
+    assert len(calls) == 3
+    assert all(analysis.coalesced_stages == [] for analysis in analyses)
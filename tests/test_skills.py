@@ -0,0 +1,41 @@
+import pytest
+
+from skills import SkillExtractor, tokenize
+
+TAXONOMY = "public/models/skill_taxonomy.csv"
+
+
+@pytest.fixture(scope="module")
+def extractor():
+    return SkillExtractor.from_csv(TAXONOMY)
+
+
+def test_tokens_keep_language_punctuation():
+    assert tokenize("C++, C#, Node.js and .NET") == ["C++", "C#", "Node.js", "and", ".NET"]
+
+
+def test_longest_alias_wins(extractor):
+    assert extractor.extract_names("Built services with Spring Boot") == ["Spring Boot"]
+    assert extractor.extract_names("Trained models with scikit learn and sklearn") == ["scikit-learn"]
+
+
+def test_counts_are_case_insensitive_for_technical_names(extractor):
+    assert extractor.extract("python, Python and PYTHON") == [{"skill": "Python", "count": 3}]
+
+
+@pytest.mark.parametrize("sentence", [
+    "I react well under pressure.",
+    "Ready to go the extra mile with a swift turnaround.",
+    "Worked the spring season as a pandas keeper.",
+    "Enjoy a bash with friends, chef at heart.",
+    "Kept the jest light while we tried to excel at rust removal.",
+    "Took the torch from the oracle in the rails yard.",
+])
+def test_ordinary_words_are_not_skills(extractor, sentence):
+    assert extractor.extract_names(sentence) == []
+
+
+def test_capitalised_and_technical_forms_still_match(extractor):
+    names = extractor.extract_names("React, reactjs, Go, golang, Pandas and Rails")
+    assert set(names) == {"React", "Go", "Pandas", "Ruby on Rails"}
+    assert extractor.extract("React and reactjs")[0]["count"] == 2
@@ -0,0 +1,50 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from conftest import ROOT
+
+# Modules that must stay out of `import main` so a fresh worker starts fast
+HEAVY_MODULES = ["numpy", "sklearn", "joblib", "scipy", "pandas", "nltk", "docx", "PyPDF2", "torch",
+                 "sentence_transformers"]
+
+IMPORT_MAIN = textwrap.dedent("""
+    import json, socket, sys
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("network access during import")
+
+    socket.socket.connect = no_network
+    socket.create_connection = no_network
+
+    import main
+    loaded = sorted({name.split(".")[0] for name in sys.modules})
+    print(json.dumps({"loaded": loaded, "models_loaded": main.resume_analyzer.models_loaded,
+                      "stop_words": len(main.resume_analyzer.stop_words)}))
+""")
+
+
+def import_main(tmp_path) -> dict:
+    env = dict(os.environ, RESULT_STORE_PATH="", FEATURE_STORE_PATH="", SLOW_PROFILE_ENABLED="0",
+               ADMISSION_ENABLED="0", PRELOAD_MODELS="0", JOB_INDEX_PATH=str(tmp_path / "jobs"),
+               BOILERPLATE_INDEX_PATH=str(tmp_path / "boilerplate.bloom"))
+    output = subprocess.run([sys.executable, "-c", IMPORT_MAIN], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_main_skips_heavy_modules_and_network(tmp_path):
+    result = import_main(tmp_path)
+    assert [name for name in HEAVY_MODULES if name in result["loaded"]] == []
+    assert not result["models_loaded"]
+    # Stopwords come from the bundled list, not an NLTK download
+    assert result["stop_words"] > 100
+
+
+def test_models_load_on_first_use(app_module, resume_text):
+    analyzer = app_module.resume_analyzer
+    result = analyzer.predict_domain_from_text(resume_text)
+    assert analyzer.models_loaded
+    assert result["domain"]
@@ -3,11 +3,16 @@ import os
 import mimetypes
 from pathlib import Path
 from typing import Dict, List, Optional, Union
-import pandas as pd
-import numpy as np
 from datetime import datetime
 import json
 
+try:
+    import orjson  # Optional: faster serialization for streamed NDJSON responses
+except ImportError:
+    orjson = None
+
+from profiling import stage
+
 class FileHandler:
     """Utility class for handling file operations"""
     
@@ -24,7 +29,12 @@ class FileHandler:
     @staticmethod
     def validate_file(filename: str, file_content: bytes) -> Dict[str, Union[bool, str]]:
         """Validate uploaded file"""
-        
+        with stage("validate"):
+            return FileHandler._validate(filename, file_content)
+    
+    @staticmethod
+    def _validate(filename: str, file_content: bytes) -> Dict[str, Union[bool, str]]:
+        """Size, extension and emptiness checks behind validate_file"""
         # Check file size
         if len(file_content) > FileHandler.MAX_FILE_SIZE:
             return {
@@ -57,6 +67,9 @@ class FileHandler:
 class TextProcessor:
     """Utility class for text processing operations"""
     
+    # Bump when any extractor changes so stored results are recomputed
+    VERSION = 1
+    
     @staticmethod
     def extract_contact_info(text: str) -> Dict[str, Optional[str]]:
         """Extract contact information from resume text"""
@@ -247,6 +260,22 @@ class ResponseFormatter:
                 "analysis_details": analysis_details or {}
             }
         }
+    
+    @staticmethod
+    def _json_default(value):
+        """Serialize numpy scalars (model outputs) and anything else as text"""
+        if hasattr(value, "item"):
+            return value.item()
+        return str(value)
+    
+    @staticmethod
+    def to_json_line(record: Dict) -> bytes:
+        """Serialize one record as a newline-terminated NDJSON line"""
+        if orjson is not None:
+            return orjson.dumps(record, default=ResponseFormatter._json_default,
+                                option=orjson.OPT_APPEND_NEWLINE)
+        return (json.dumps(record, default=ResponseFormatter._json_default,
+                           separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
 
 class CompanyMatcher:
     """Utility class for matching resumes to companies"""
@@ -315,8 +344,9 @@ class CompanyMatcher:
     
     def get_matching_companies(self, domain: str, skills: List[str] = None) -> List[Dict]:
         """Get companies that match the domain and skills"""
-        companies = self.company_database.get(domain, [])
-        
+        # Copy entries so per-request scores never leak into the shared database
+        companies = [dict(company) for company in self.company_database.get(domain, [])]
+
         if skills:
             # Score companies based on skill matches
             for company in companies: